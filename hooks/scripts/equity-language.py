@@ -4,14 +4,19 @@ Equity Language Check Hook
 Flags deficit-based language and suggests asset-based alternatives
 
 This hook runs after Edit/Write operations to provide guidance
-on using justice-centered, asset-based language.
+on using justice-centered, asset-based language. Given the hook
+payload, it scans the edited file, and after an Edit it rescans only the
+changed region (see incremental.py).
 """
 
 import sys
 import re
 import os
+from bisect import bisect_left, bisect_right
 from pathlib import Path
 
+import incremental
+
 # Deficit terms and their asset-based alternatives
 DEFICIT_TERMS = {
     # Student descriptors
@@ -146,38 +151,181 @@ ASSET_TERMS = [
 ]
 
 
-def check_content(content: str) -> list:
-    """Check content for deficit language."""
+# Every deficit and asset term as one named-group alternation. The
+# alternation sits in a lookahead so each position is tried on its own:
+# terms that overlap (e.g. "achievement gap closing") are all found, as
+# with one scan per term.
+_TERM_GROUPS = {f'd{i}': info for i, info in enumerate(DEFICIT_TERMS.values())}
+_ASSET_GROUPS = {f'a{i}' for i in range(len(ASSET_TERMS))}
+COMBINED_PATTERN = re.compile(
+    '(?=' + '|'.join(
+        [f'(?P<d{i}>{pattern})' for i, pattern in enumerate(DEFICIT_TERMS)]
+        + [f'(?P<a{i}>{re.escape(term)})' for i, term in enumerate(ASSET_TERMS)]
+    ) + ')',
+    re.IGNORECASE
+)
+DEFICIT_PATTERN = re.compile(
+    '(?=' + '|'.join(f'(?P<d{i}>{pattern})' for i, pattern in enumerate(DEFICIT_TERMS)) + ')',
+    re.IGNORECASE
+)
+
+# Literal prefilter: every deficit pattern starts with a word boundary and
+# a literal word, so a match can only start where one of those words
+# starts a word. Each word gets a literal-first pattern (the boundary is
+# checked behind it, so the regex engine can skip ahead by literal search)
+# run over the lowercased text, and the deficit alternation is only tried
+# at the positions found. None when some pattern has no leading literal,
+# which falls back to the full combined pass.
+_PREFIXES = [re.match(r'\\b([A-Za-z]+)', pattern) for pattern in DEFICIT_TERMS]
+if all(_PREFIXES):
+    _WORDS = {m.group(1).lower() for m in _PREFIXES}
+    # A word that extends another would find the same positions twice
+    _WORDS = sorted(w for w in _WORDS if not any(w != v and w.startswith(v) for v in _WORDS))
+    PREFIX_PATTERNS = [re.compile(f'{word}(?<!\\w{word})') for word in _WORDS]
+else:
+    PREFIX_PATTERNS = None
+_ASSET_LITERALS = [term.lower() for term in ASSET_TERMS]
+
+# Asset counts are updated from the edit window alone only when no term
+# can overlap itself (as "aa" does in "aaa"), so counts of disjoint
+# stretches of text add up
+_COUNTS_SPLIT = not any(term[:k] == term[-k:] for term in _ASSET_LITERALS for k in range(1, len(term)))
+
+HOOK_NAME = 'equity-language'
+RULES = incremental.rules_fingerprint(DEFICIT_TERMS, ASSET_TERMS)
+
+
+def line_index(content: str) -> list:
+    """Offsets of every newline, for bisecting a position to its line."""
+    return [match.start() for match in re.finditer('\n', content)]
+
+
+def prefix_hits(content: str, lowered: str, offset: int = 0) -> list:
+    """
+    Deficit term matches starting in `lowered`, the lowercased text of
+    content from `offset` on (or a whole-line stretch of it).
+    """
+    hits = []
+    for prefix in PREFIX_PATTERNS:
+        for candidate in prefix.finditer(lowered):
+            start = offset + candidate.start()
+            match = DEFICIT_PATTERN.match(content, start)
+            if match:
+                group = match.lastgroup
+                hits.append((int(group[1:]), start, match.end(group), group))
+    return hits
+
+
+def find_terms(content: str) -> tuple:
+    """
+    Every deficit term match as (table index, start, end, group), and the
+    count of each asset term.
+    """
+    if PREFIX_PATTERNS is not None and incremental.case_aligned(content):
+        lowered = content.lower()
+        return prefix_hits(content, lowered), [lowered.count(term) for term in _ASSET_LITERALS]
+
+    # Case mapping changed the text length: one full pass instead
+    hits = []
+    asset_counts = [0] * len(ASSET_TERMS)
+    for match in COMBINED_PATTERN.finditer(content):
+        group = match.lastgroup
+        if group in _ASSET_GROUPS:
+            asset_counts[int(group[1:])] += 1
+        else:
+            hits.append((int(group[1:]), match.start(group), match.end(group), group))
+    return hits, asset_counts
+
+
+def rescan_window(content: str, window, state: dict):
+    """
+    find_terms() for content that is the cached content with one edit,
+    from the cached matches and the edit window; None when the cache or
+    the text does not allow it.
+    """
+    text = content[window.start:window.new_end]
+    lowered = text.lower()
+    if (PREFIX_PATTERNS is None or not _COUNTS_SPLIT or state.get('counts') is None
+            or len(lowered) != len(text) or not incremental.case_aligned(content)):
+        return None
+
+    delta = window.new_end - window.old_end
+    hits = [tuple(hit) for hit in state['hits'] if hit[1] < window.start]
+    hits += prefix_hits(content, lowered, window.start)
+    hits += [(i, start + delta, end + delta, group) for i, start, end, group in state['hits']
+             if start >= window.old_end]
+
+    # Terms starting in the window, whether or not they end in it
+    tail = content[window.new_end:window.new_end + max(map(len, _ASSET_LITERALS)) - 1].lower()
+    old_text, new_text = window.old_text.lower() + tail, lowered + tail
+    asset_counts = [count - old_text.count(term) + new_text.count(term)
+                    for count, term in zip(state['counts'], _ASSET_LITERALS)]
+    return hits, asset_counts
+
+
+def findings_from(content: str, hits: list) -> list:
+    """
+    Findings for deficit term matches, ordered like the DEFICIT_TERMS
+    table, then by position.
+    """
     findings = []
-
-    for pattern, info in DEFICIT_TERMS.items():
-        for match in re.finditer(pattern, content, re.IGNORECASE):
-            # Get line number and context
-            line_num = content[:match.start()].count('\n') + 1
-            line_start = content.rfind('\n', 0, match.start()) + 1
-            line_end = content.find('\n', match.end())
-            if line_end == -1:
-                line_end = len(content)
-            line_context = content[line_start:line_end].strip()
-
-            findings.append({
-                'term': info['term'],
-                'found': match.group(),
-                'alternative': info['alternative'],
-                'context': info['context'],
-                'line': line_num,
-                'line_text': line_context[:80] + '...' if len(line_context) > 80 else line_context
-            })
+    newlines = line_index(content) if hits else []
+    for _, start, end, group in sorted(hits):
+        info = _TERM_GROUPS[group]
+        # Get line number and context
+        line = bisect_right(newlines, start)
+        line_start = newlines[line - 1] + 1 if line else 0
+        after = bisect_left(newlines, end)
+        line_end = newlines[after] if after < len(newlines) else len(content)
+        line_context = content[line_start:line_end].strip()
+
+        findings.append({
+            'term': info['term'],
+            'found': content[start:end],
+            'alternative': info['alternative'],
+            'context': info['context'],
+            'line': line + 1,
+            'line_text': line_context[:80] + '...' if len(line_context) > 80 else line_context
+        })
 
     return findings
 
 
+def scan(content: str) -> tuple:
+    """
+    One pass over the content: (deficit findings, asset term count).
+
+    Findings are ordered like the DEFICIT_TERMS table, then by position.
+    """
+    hits, asset_counts = find_terms(content)
+    return findings_from(content, hits), sum(asset_counts)
+
+
+def scan_file(content: str, filepath: str, payload: dict) -> tuple:
+    """
+    scan() of a file after the tool in the hook payload changed it,
+    rescanning only the edit window when the file's cached state allows,
+    and caching the new state.
+    """
+    state = incremental.load_state(HOOK_NAME, filepath, RULES)
+    edit = incremental.locate_edit(content, payload, state)
+    terms = rescan_window(content, incremental.edit_window(content, edit), state) if edit else None
+    hits, asset_counts = terms or find_terms(content)
+
+    aligned = PREFIX_PATTERNS is not None and incremental.case_aligned(content)
+    incremental.save_state(HOOK_NAME, filepath, RULES, content,
+                           {'hits': hits, 'counts': asset_counts if aligned else None})
+    return findings_from(content, hits), sum(asset_counts)
+
+
+def check_content(content: str) -> list:
+    """Check content for deficit language."""
+    return scan(content)[0]
+
+
 def count_asset_terms(content: str) -> int:
     """Count asset-based terms already in use."""
-    count = 0
-    for term in ASSET_TERMS:
-        count += len(re.findall(re.escape(term), content, re.IGNORECASE))
-    return count
+    return scan(content)[1]
 
 
 def format_report(findings: list, asset_count: int, filepath: str = '') -> str:
@@ -247,12 +395,20 @@ def main():
         else:
             sys.exit(0)
 
+        # A hook payload names the edited file: scan the file itself
+        payload = incremental.read_payload(content)
+        if payload:
+            filepath = payload['tool_input'].get('file_path') or ''
+            if not os.path.isfile(filepath):
+                sys.exit(0)
+            with open(filepath, 'r', errors='ignore') as f:
+                content = f.read()
+
         if not content:
             sys.exit(0)
 
         # Check content
-        findings = check_content(content)
-        asset_count = count_asset_terms(content)
+        findings, asset_count = scan_file(content, filepath, payload) if payload else scan(content)
 
         if findings:
             report = format_report(findings, asset_count, filepath)
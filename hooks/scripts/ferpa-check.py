@@ -4,15 +4,38 @@ FERPA Compliance Check Hook
 Scans for potential student PII before file writes
 
 This hook runs before Edit/Write operations to catch potential
-FERPA violations before they're written to files.
+FERPA violations before they're written to files. Given the hook payload
+on stdin, it checks the text being written (a Write's content, or the
+new text of an Edit) under the payload's file path.
+
+Tabular content (CSV, TSV, JSON lines, or an XLSX workbook) is checked
+by column instead of by cell: each column is classified from its header
+and a bounded sample of its values (SSN, student ID, date of birth,
+name, IEP/504 flags), and findings are reported per column with the
+number of rows they cover. The critical patterns (SSN, medical and
+immigration details, student names) are still searched for over the
+whole content in one linear scan, so a value far past the sampled rows
+is caught too.
+
+A workbook is binary and never part of the edit, and before a write the
+one on disk is the previous version. It is only checked when the hook
+is run on a saved file (no piped content); otherwise the report says
+the check was skipped.
 """
 
 import sys
 import re
 import os
+import io
+import csv
 import json
+from bisect import bisect_left
+from datetime import date
+from itertools import islice
 from pathlib import Path
 
+import incremental
+
 # Patterns that might indicate student PII
 PII_PATTERNS = [
     # Direct identifiers
@@ -56,6 +79,42 @@ SENSITIVE_FILE_PATTERNS = [
     r'medical', r'health', r'contact', r'emergency',
 ]
 
+# Tabular formats by file extension (content without one is sniffed)
+TABLE_EXTENSIONS = {
+    '.csv': ',', '.tsv': '\t', '.tab': '\t',
+    '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.xlsx': 'xlsx',
+}
+
+# Rows sampled per table to classify columns
+SAMPLE_ROWS = 200
+
+# Share of sampled values that must fit a column class
+VALUE_SHARE = 0.8
+
+# Ages a date-of-birth column of students falls in
+STUDENT_AGES = (2, 25)
+
+# Column classes: (description, severity, header pattern, value pattern).
+# Headers are lowercased with punctuation turned into spaces; a value
+# pattern must match whole values, and None means header only (date of
+# birth values are checked by is_birth_date).
+COLUMN_CLASSES = [
+    ('Social Security Number', 'critical', r'\bssn\b|social ?security', r'\d{3}-\d{2}-\d{4}'),
+    ('Student ID', 'high',
+     r'\b(?:student|stu|state|local|sis|district) ?(?:id|number|num|no)\b|\b(?:sasid|lasid|ssid|studentid)\b',
+     r'\d{9}|[A-Z]{2}\d{7,8}'),
+    ('Date of birth', 'high', r'\bdob\b|\bbirth ?(?:date|day)\b|\bdate of birth\b', None),
+    ('Student name', 'critical',
+     r'\b(?:first|last|middle|full|given|family|preferred|student) ?name\b|^name$|\bsurname\b', None),
+    ('Special education / 504 flag', 'high',
+     r'\b(?:iep|504|sped|special ?ed(?:ucation)?|disabilit(?:y|ies))\b', None),
+]
+
+SEVERITY_RANK = {'critical': 0, 'high': 1, 'medium': 2}
+
+# Whole-value dates: US month/day/year or ISO year-month-day
+DATE_PATTERN = re.compile(r'\d{1,2}[/-]\d{1,2}[/-](\d{4}|\d{2})|(\d{4})-\d{2}-\d{2}(?:[T ].*)?')
+
 # Safe patterns (false positives to ignore)
 SAFE_PATTERNS = [
     r'student\s*=\s*\{\}',  # Empty student object
@@ -68,6 +127,27 @@ SAFE_PATTERNS = [
 ]
 
 
+# Compiled once. Python's re runs one alternation of all the patterns
+# slower than a pass per pattern, so each keeps its own regex. For ASCII
+# text, the lowercased content is matched against lowercased patterns,
+# which is the same as IGNORECASE but lets the engine search for leading
+# literals directly.
+PII_REGEXES = [re.compile(pattern, re.IGNORECASE) for pattern, _, _ in PII_PATTERNS]
+ASCII_REGEXES = [
+    re.compile(re.sub(r'\\.|[A-Z]', lambda m: m.group().lower() if len(m.group()) == 1 else m.group(), pattern))
+    for pattern, _, _ in PII_PATTERNS
+]
+SAFE_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in SAFE_PATTERNS), re.IGNORECASE)
+
+# Patterns searched over the whole of a table, not just the sampled rows
+CRITICAL_PATTERNS = [i for i, (_, _, severity) in enumerate(PII_PATTERNS) if severity == 'critical']
+
+
+def line_index(content: str) -> list:
+    """Offsets of every newline, for bisecting a position to its line."""
+    return [match.start() for match in re.finditer('\n', content)]
+
+
 def is_safe_context(content: str, match_start: int, match_end: int) -> bool:
     """Check if match is in a safe context (code, comment, etc.)."""
     # Get surrounding context
@@ -77,38 +157,293 @@ def is_safe_context(content: str, match_start: int, match_end: int) -> bool:
         line_end = len(content)
     line = content[line_start:line_end]
 
-    return any(re.search(pattern, line, re.IGNORECASE) for pattern in SAFE_PATTERNS)
+    return SAFE_PATTERN.search(line) is not None
+
 
+def find_matches(content: str, patterns: list = None) -> list:
+    """
+    Every PII match as (pattern index, start, end), by pattern then
+    position, for all patterns or the given pattern indexes.
+    """
+    if content.isascii():
+        text, regexes = content.lower(), ASCII_REGEXES
+    else:
+        text, regexes = content, PII_REGEXES
+    return [(i, match.start(), match.end())
+            for i in (range(len(regexes)) if patterns is None else patterns)
+            for match in regexes[i].finditer(text)]
 
-def check_content(content: str, filepath: str = '') -> tuple:
-    """Check content for potential PII patterns."""
+
+def check_content(content: str, filepath: str = '', patterns: list = None) -> tuple:
+    """Check content for potential PII patterns (all, or the given pattern indexes)."""
     issues = []
     severity_counts = {'critical': 0, 'high': 0, 'medium': 0}
 
     # Check file path for sensitivity indicators
-    is_sensitive_file = any(
-        re.search(pattern, filepath.lower())
-        for pattern in SENSITIVE_FILE_PATTERNS
-    )
-
-    for pattern, description, severity in PII_PATTERNS:
-        for match in re.finditer(pattern, content, re.IGNORECASE):
-            # Skip if in safe context
-            if is_safe_context(content, match.start(), match.end()):
-                continue
+    is_sensitive_file = is_sensitive_path(filepath)
+
+    matches = find_matches(content, patterns)
+    newlines = line_index(content) if matches else []
+    safe_lines = {}
+
+    for i, start, end in matches:
+        _, description, severity = PII_PATTERNS[i]
+        # Lines the match touches; each line's safe-context verdict is computed once
+        first_line = bisect_left(newlines, start)
+        last_line = bisect_left(newlines, end)
+        lines = (first_line, last_line)
+        if lines not in safe_lines:
+            safe_lines[lines] = is_safe_context(content, start, end)
+        if safe_lines[lines]:
+            continue
+
+        text = content[start:end]
+        issues.append({
+            'pattern': description,
+            'severity': severity,
+            'line': first_line + 1,
+            'match': text[:50] + '...' if len(text) > 50 else text
+        })
+        severity_counts[severity] += 1
+
+    return issues, is_sensitive_file, severity_counts
+
+
+def is_sensitive_path(filepath: str) -> bool:
+    """Check file path for sensitivity indicators."""
+    return any(re.search(pattern, filepath.lower()) for pattern in SENSITIVE_FILE_PATTERNS)
 
-            # Get line number
-            line_num = content[:match.start()].count('\n') + 1
+
+def cell_text(value) -> str:
+    """A sampled cell as stripped text (empty for missing values)."""
+    return '' if value is None else str(value).strip()
+
+
+def sniff_delimiter(content: str):
+    """
+    A tab or comma when every sampled line splits on it into the same
+    number of fields (at least three, so prose with a comma per line is
+    not taken for a table).
+    """
+    lines = [line for line in islice(io.StringIO(content), SAMPLE_ROWS + 1) if line.strip()]
+    if len(lines) < 3:
+        return None
+    for delimiter in ('\t', ','):
+        widths = {len(row) for row in csv.reader(lines, delimiter=delimiter)}
+        if len(widths) == 1 and widths.pop() >= 3:
+            return delimiter
+    return None
+
+
+def looks_like_jsonl(content: str) -> bool:
+    """True when the first lines are each one JSON object."""
+    lines = [line for line in islice(io.StringIO(content), 3) if line.strip()]
+    try:
+        return len(lines) >= 2 and all(isinstance(json.loads(line), dict) for line in lines)
+    except ValueError:
+        return False
+
+
+def line_count(content: str) -> int:
+    """Lines in the content, counting a last line without a newline."""
+    return content.count('\n') + (not content.endswith('\n'))
+
+
+def delimited_table(content: str, delimiter: str, name: str = '') -> dict:
+    """Header, sampled rows and row count of CSV/TSV content."""
+    rows = list(islice(csv.reader(io.StringIO(content), delimiter=delimiter), SAMPLE_ROWS + 1))
+    if not rows:
+        return None
+    # A first row holding IDs or dates rather than names gets numbered columns
+    has_header = not any(DATE_PATTERN.fullmatch(cell.strip()) or cell.strip().replace('-', '').isdigit()
+                         for cell in rows[0])
+    if has_header:
+        header, rows = rows[0], rows[1:SAMPLE_ROWS + 1]
+    else:
+        header, rows = [f"column {i + 1}" for i in range(len(rows[0]))], rows[:SAMPLE_ROWS]
+    total = line_count(content) - has_header
+    return {'name': name, 'header': header, 'sample': rows, 'rows': max(total, len(rows))}
+
+
+def jsonl_table(content: str, name: str = '') -> dict:
+    """Keys, sampled records and record count of JSON-lines content."""
+    header, sample = {}, []
+    for line in islice((line for line in io.StringIO(content) if line.strip()), SAMPLE_ROWS):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            header.update(dict.fromkeys(record))
+            sample.append(record)
+    header = list(header)
+    rows = [[record.get(key) for key in header] for record in sample]
+    return {'name': name, 'header': header, 'sample': rows, 'rows': max(line_count(content), len(rows))}
+
+
+def xlsx_tables(filepath: str) -> list:
+    """One table per worksheet, read in read-only mode (needs openpyxl)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        return []
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    tables = []
+    for sheet in workbook.worksheets:
+        rows = list(sheet.iter_rows(max_row=SAMPLE_ROWS + 1, values_only=True))
+        if not rows:
+            continue
+        header = [cell_text(cell) or f"column {i + 1}" for i, cell in enumerate(rows[0])]
+        # Sheets saved without their dimensions report no row count
+        total = sheet.max_row - 1 if sheet.max_row else None
+        tables.append({'name': sheet.title, 'header': header, 'sample': rows[1:], 'rows': total})
+    workbook.close()
+    return tables
+
+
+def read_tables(content: str, filepath: str = '') -> list:
+    """
+    Tables in text content, or an empty list when it is not tabular.
+    Workbooks are binary and are read with xlsx_tables instead.
+    """
+    kind = TABLE_EXTENSIONS.get(Path(filepath).suffix.lower()) if filepath else None
+    if kind == 'xlsx':
+        return []
+    if kind is None:
+        if looks_like_jsonl(content):
+            kind = 'jsonl'
+        else:
+            kind = sniff_delimiter(content)
+    if kind == 'jsonl':
+        table = jsonl_table(content)
+    elif kind:
+        table = delimited_table(content, kind)
+    else:
+        return []
+    return [table] if table and table['header'] else []
+
+
+def is_birth_date(value: str) -> bool:
+    """A date whose year puts the person at school age today."""
+    match = DATE_PATTERN.fullmatch(value)
+    if not match:
+        return False
+    year = int(match.group(1) or match.group(2))
+    if year < 100:
+        year += 2000 if year <= date.today().year % 100 else 1900
+    age = date.today().year - year
+    return STUDENT_AGES[0] <= age <= STUDENT_AGES[1]
+
+
+def classify_column(header: str, values: list):
+    """
+    The column class of one column as (description, severity, basis,
+    matching values), or None. `values` are the non-empty sampled values.
+    """
+    name = re.sub(r'[^a-z0-9]+', ' ', header.lower()).strip()
+    for description, severity, header_pattern, value_pattern in COLUMN_CLASSES:
+        by_header = re.search(header_pattern, name) is not None
+        # Dates count only when the year puts the person at school age
+        if description == 'Date of birth':
+            matching = sum(map(is_birth_date, values))
+        elif value_pattern:
+            matching = sum(1 for value in values if re.fullmatch(value_pattern, value, re.IGNORECASE))
+        else:
+            matching = 0
+        by_values = bool(values) and matching >= VALUE_SHARE * len(values)
+        if by_header or by_values:
+            basis = ' + '.join(part for part, found in (('header', by_header), ('values', by_values)) if found)
+            return description, severity, basis, matching if by_values else len(values)
+
+    # Otherwise, the free-text patterns over the header and the sampled values
+    flagged = []
+    for i, regex in enumerate(PII_REGEXES):
+        in_header = regex.search(header) is not None
+        hits = sum(1 for value in values if regex.search(value))
+        if in_header or hits:
+            flagged.append((SEVERITY_RANK[PII_PATTERNS[i][2]], -hits, i, in_header))
+    if not flagged:
+        return None
+    _, hits, i, in_header = min(flagged)
+    _, description, severity = PII_PATTERNS[i]
+    return description, severity, 'header' if in_header else 'values', -hits or len(values)
+
+
+def check_table(tables: list, filepath: str = '') -> tuple:
+    """
+    Check tables column by column.
+
+    Returns the same (issues, is_sensitive_file, severity_counts) as
+    check_content, with one issue per flagged column.
+    """
+    issues = []
+    severity_counts = {'critical': 0, 'high': 0, 'medium': 0}
+
+    for table in tables:
+        sample, total = table['sample'], table['rows']
+        for position, header in enumerate(table['header']):
+            values = [cell_text(row[position]) for row in sample if position < len(row)]
+            values = [value for value in values if value]
+            found = classify_column(header, values)
+            if not found:
+                continue
+            description, severity, basis, matching = found
+            if total is None:
+                rows, estimated = matching, False
+            else:
+                rows = min(round(total * matching / len(sample)) if sample else total, total)
+                estimated = len(sample) < total
 
             issues.append({
                 'pattern': description,
                 'severity': severity,
-                'line': line_num,
-                'match': match.group()[:50] + '...' if len(match.group()) > 50 else match.group()
+                'column': f"{table['name']}!{header}" if table['name'] else header,
+                'position': position + 1,
+                'rows': rows,
+                'estimated': estimated,
+                'more': total is None and len(sample) == SAMPLE_ROWS,
+                'basis': basis,
+                'sampled': len(sample),
             })
             severity_counts[severity] += 1
 
-    return issues, is_sensitive_file, severity_counts
+    return issues, is_sensitive_path(filepath), severity_counts
+
+
+def check_tabular(content: str, tables: list, filepath: str = '') -> tuple:
+    """
+    Check text tables by column, and the whole content for the critical
+    patterns a flagged column does not already report. A match inside a
+    flagged column's header is that column's finding, not another one.
+    """
+    issues, is_sensitive, severity_counts = check_table(tables, filepath)
+    reported = {issue['pattern'] for issue in issues}
+    headers = [issue['column'].lower() for issue in issues]
+    patterns = [i for i in CRITICAL_PATTERNS if PII_PATTERNS[i][1] not in reported]
+    text_issues, _, _ = check_content(content, filepath, patterns)
+    text_issues = [issue for issue in text_issues
+                   if not any(issue['match'].lower() in header for header in headers)]
+    for issue in text_issues:
+        severity_counts[issue['severity']] += 1
+    return issues + text_issues, is_sensitive, severity_counts
+
+
+def payload_content(tool_input: dict) -> str:
+    """The text a Write puts in the file, or the new text of an Edit's (or MultiEdit's) edits."""
+    if isinstance(tool_input.get('content'), str):
+        return tool_input['content']
+    edits = tool_input.get('edits') if isinstance(tool_input.get('edits'), list) else [tool_input]
+    return '\n'.join(edit['new_string'] for edit in edits
+                     if isinstance(edit, dict) and isinstance(edit.get('new_string'), str))
+
+
+def format_issue(issue: dict) -> str:
+    """One report line: the line of a text match, or a flagged column."""
+    if 'column' not in issue:
+        return f"  Line {issue['line']}: {issue['pattern']}"
+    rows = f"{'~' if issue['estimated'] else ''}{issue['rows']:,}{'+' if issue['more'] else ''} rows"
+    return (f"  Column {issue['position']} '{issue['column']}': {issue['pattern']} "
+            f"({rows}; {issue['basis']}, {issue['sampled']:,} rows sampled)")
 
 
 def format_report(issues: list, filepath: str, severity_counts: dict) -> str:
@@ -141,7 +476,7 @@ def format_report(issues: list, filepath: str, severity_counts: dict) -> str:
         if sev_issues:
             lines.append(f"\n{severity.upper()} SEVERITY:")
             for issue in sev_issues[:5]:  # Limit to 5 per severity
-                lines.append(f"  Line {issue['line']}: {issue['pattern']}")
+                lines.append(format_issue(issue))
             if len(sev_issues) > 5:
                 lines.append(f"  ... and {len(sev_issues) - 5} more")
 
@@ -163,20 +498,52 @@ def main():
     filepath = os.environ.get('CLAUDE_FILE_PATH', '')
 
     try:
-        # Read from stdin or file
-        if not sys.stdin.isatty():
-            content = sys.stdin.read()
-        elif filepath and os.path.exists(filepath):
-            with open(filepath, 'r', errors='ignore') as f:
-                content = f.read()
-        else:
-            sys.exit(0)
+        piped = None if sys.stdin.isatty() else sys.stdin.read()
+
+        # A hook payload names the file and carries the text about to be written
+        payload = incremental.read_payload(piped)
+        if payload:
+            filepath = payload['tool_input'].get('file_path') or filepath
+            piped = payload_content(payload['tool_input'])
+
+        # Workbooks are binary: only a saved one (no piped content) can be read
+        if filepath.lower().endswith('.xlsx'):
+            skipped = None
+            if piped is not None:
+                skipped = 'the new workbook content is not available before it is written'
+            elif not os.path.exists(filepath):
+                sys.exit(0)
+            else:
+                try:
+                    tables = xlsx_tables(filepath)
+                except Exception as e:
+                    tables, skipped = [], f"the workbook could not be read ({e})"
+                if not tables and not skipped:
+                    skipped = 'no worksheets were read (empty workbook, or openpyxl not installed)'
+            if skipped:
+                print(f"FERPA check skipped for {Path(filepath).name}: {skipped}", file=sys.stderr)
+                sys.exit(0)
+            issues, is_sensitive, severity_counts = check_table(tables, filepath)
 
-        if not content:
-            sys.exit(0)
-
-        # Check content
-        issues, is_sensitive, severity_counts = check_content(content, filepath)
+        else:
+            # Read from stdin or file
+            if piped is not None:
+                content = piped
+            elif filepath and os.path.exists(filepath):
+                with open(filepath, 'r', errors='ignore') as f:
+                    content = f.read()
+            else:
+                sys.exit(0)
+
+            if content == '':
+                sys.exit(0)
+
+            # Check tables by column (plus the critical patterns over every row), anything else as text
+            tables = read_tables(content, filepath)
+            if tables:
+                issues, is_sensitive, severity_counts = check_tabular(content, tables, filepath)
+            else:
+                issues, is_sensitive, severity_counts = check_content(content, filepath)
 
         if issues:
             report = format_report(issues, filepath, severity_counts)
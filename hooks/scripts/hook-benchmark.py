@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Hook Scanner Benchmark
+Times the content checks of the PII and language hooks as documents grow
+
+Each case builds seeded documents at doubling sizes and times the hook's
+check in-process (median of --repeat runs), so the numbers cover the
+scanning itself rather than interpreter start-up. The time per 1,000
+lines should stay flat as the document grows; a check that rescans the
+text for every match shows up as a per-line cost that doubles with the
+size.
+
+Cases:
+    ferpa-roster    ferpa-check.py on a roster export: one student per
+                    line with a 9-digit ID, name, and program flags
+    ferpa-table     ferpa-check.py column mode on the same roster export
+                    (sampled, so time per line falls as it grows)
+    ferpa-notes     ferpa-check.py on prose with code and comment lines
+    equity-prose    equity-language.py on grant narrative prose
+
+With --latency it instead measures what an edit waits for: each
+PostToolUse/PreToolUse hook is run as a process on a typical edit-sized
+document, started directly, through hook-client.py with the server off
+(APEX_HOOK_SERVER unset), and through hook-client.py with a hook server
+running on a temporary socket.
+
+Usage:
+    python hook-benchmark.py                         # every case, 1k to 64k lines
+    python hook-benchmark.py --cases ferpa-roster --lines 2000,200000
+    python hook-benchmark.py --latency --runs 50
+"""
+
+import argparse
+import importlib.util
+import random
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+DEFAULT_LINES = [1000, 4000, 16000, 64000]
+DEFAULT_REPEAT = 3
+DEFAULT_RUNS = 20
+
+# Hooks run on every edit, and the lines of document each gets for --latency
+LATENCY_HOOKS = ['ferpa-check', 'pedagogy-check', 'equity-language']
+LATENCY_LINES = 200
+
+NOTE_WORDS = (
+    'the team reviewed attendance and course data for each school and will share '
+    'findings with families at the spring meeting while teachers plan next steps'
+).split()
+
+CODE_LINES = [
+    '# load the student roster before grouping',
+    'def summarize_student(record):',
+    'class Student:',
+    '    student.id = row[0]',
+]
+
+
+def load_hook(name: str):
+    """Import a hook script (hyphenated file name) as a module."""
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), SCRIPTS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def roster(lines: int, rng: random.Random) -> str:
+    """A roster export: ID, name, grade and program flags on every line."""
+    rows = ['student_id,name,grade,programs']
+    for i in range(lines - 1):
+        flags = rng.choice(['IEP', '504 plan', 'free lunch', 'ELL', ''])
+        rows.append(f"{rng.randint(100000000, 999999999)},Student {rng.choice(['Ana', 'Lee'])} "
+                    f"{rng.choice(['Diaz', 'Park'])},{rng.randint(3, 8)},{flags}")
+    return '\n'.join(rows)
+
+
+def notes(lines: int, rng: random.Random) -> str:
+    """Meeting notes with occasional IDs, code and comment lines."""
+    rows = []
+    for _ in range(lines):
+        if rng.random() < 0.1:
+            rows.append(rng.choice(CODE_LINES))
+        elif rng.random() < 0.05:
+            rows.append(f"follow up on {rng.randint(100000000, 999999999)} re: behavior plan")
+        else:
+            rows.append(' '.join(rng.choice(NOTE_WORDS) for _ in range(12)))
+    return '\n'.join(rows)
+
+
+def prose(lines: int, rng: random.Random) -> str:
+    """Grant narrative paragraphs with a sprinkling of deficit terms."""
+    terms = ['at-risk', 'low-income', 'achievement gap', 'culturally responsive', 'asset-based']
+    rows = []
+    for _ in range(lines):
+        words = [rng.choice(NOTE_WORDS) for _ in range(14)]
+        if rng.random() < 0.05:
+            words[rng.randrange(len(words))] = rng.choice(terms)
+        rows.append(' '.join(words))
+    return '\n'.join(rows)
+
+
+CASES = {
+    'ferpa-roster': ('ferpa-check', roster, lambda hook, text: hook.check_content(text, 'roster.csv')),
+    'ferpa-table': ('ferpa-check', roster,
+                    lambda hook, text: hook.check_table(hook.read_tables(text, 'roster.csv'), 'roster.csv')),
+    'ferpa-notes': ('ferpa-check', notes, lambda hook, text: hook.check_content(text, 'notes.md')),
+    'equity-prose': ('equity-language', prose, lambda hook, text: hook.scan(text)),
+}
+
+
+def time_case(case: str, sizes: list, repeat: int, seed: int) -> list:
+    """(lines, bytes, median seconds) for each document size."""
+    hook_name, build, check = CASES[case]
+    hook = load_hook(hook_name)
+    results = []
+    for lines in sizes:
+        text = build(lines, random.Random(seed))
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            check(hook, text)
+            times.append(time.perf_counter() - start)
+        results.append((lines, len(text), statistics.median(times)))
+    return results
+
+
+def format_results(case: str, results: list) -> str:
+    """One row per size, with the time per 1,000 lines and its growth."""
+    lines = [f"\n{case}", f"  {'lines':>9}  {'bytes':>12}  {'seconds':>9}  {'ms/1k lines':>12}  {'vs first':>9}"]
+    base = None
+    for count, size, seconds in results:
+        per_k = seconds / count * 1000 * 1000
+        base = base or per_k
+        lines.append(f"  {count:>9,}  {size:>12,}  {seconds:>9.3f}  {per_k:>12.2f}  {per_k / base:>8.2f}x")
+    return '\n'.join(lines)
+
+
+def edit_document(lines: int, rng: random.Random) -> str:
+    """A PD session plan of the size an edit typically writes."""
+    opening = ('Professional development session agenda. Participants will try a hands-on '
+               'opening activity, then debrief in small groups before the framework.')
+    return opening + '\n' + prose(lines, rng)
+
+
+def time_process(command: list, text: str, env: dict, runs: int) -> list:
+    """Wall-clock milliseconds of `runs` runs of a command fed `text` on stdin."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, input=text, env=env, capture_output=True, text=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def measure_latency(runs: int, seed: int) -> str:
+    """Median and 90th-percentile hook latency, direct vs. through the client."""
+    text = edit_document(LATENCY_LINES, random.Random(seed))
+    python = sys.executable
+    client = str(SCRIPTS_DIR / 'hook-client.py')
+    server = str(SCRIPTS_DIR / 'hook-server.py')
+
+    with tempfile.TemporaryDirectory() as folder:
+        env = dict(os.environ, APEX_HOOK_SOCKET=os.path.join(folder, 'hooks.sock'), CLAUDE_FILE_PATH='plan.md')
+        env.pop('APEX_HOOK_SERVER', None)
+        results = {}
+        for hook in LATENCY_HOOKS:
+            results[hook, 'direct'] = time_process([python, str(SCRIPTS_DIR / f"{hook}.py")], text, env, runs)
+            results[hook, 'client, no server'] = time_process([python, client, hook], text, env, runs)
+        env['APEX_HOOK_SERVER'] = '1'
+        subprocess.run([python, server, 'start'], env=env, capture_output=True, check=True)
+        try:
+            for hook in LATENCY_HOOKS:
+                time_process([python, client, hook], text, env, 1)  # first request loads the hook
+                results[hook, 'client + server'] = time_process([python, client, hook], text, env, runs)
+        finally:
+            subprocess.run([python, server, 'stop'], env=env, capture_output=True)
+
+    lines = [f"\nHook latency ({runs} runs, {len(text):,}-byte document)",
+             f"  {'hook':<17}{'mode':<20}{'median ms':>10}{'p90 ms':>9}"]
+    for (hook, mode), times in results.items():
+        times.sort()
+        lines.append(f"  {hook:<17}{mode:<20}{statistics.median(times):>10.1f}"
+                     f"{times[int(0.9 * (len(times) - 1))]:>9.1f}")
+    per_edit = {mode: sum(statistics.median(results[hook, mode]) for hook in LATENCY_HOOKS)
+                for mode in ('direct', 'client, no server', 'client + server')}
+    lines.append('  per edit (all three hooks): ' +
+                 ', '.join(f"{mode} {ms:.0f} ms" for mode, ms in per_edit.items()))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time the hook content scanners on growing documents',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  Every case at the default sizes:
+    python hook-benchmark.py
+
+  One case, larger documents, more repeats:
+    python hook-benchmark.py --cases ferpa-roster --lines 10000,100000,1000000 --repeat 5
+
+  Per-edit latency with and without the hook server:
+    python hook-benchmark.py --latency
+        """
+    )
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help=f"Comma-separated cases (default: all of {', '.join(CASES)})")
+    parser.add_argument('--lines', default=','.join(map(str, DEFAULT_LINES)),
+                        help='Comma-separated document sizes in lines')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'Runs per size; the median is reported (default {DEFAULT_REPEAT})')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated documents')
+    parser.add_argument('--latency', action='store_true',
+                        help='Measure hook process latency, direct vs. through the hook server')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS,
+                        help=f'Process runs per hook and mode with --latency (default {DEFAULT_RUNS})')
+
+    args = parser.parse_args()
+    if args.latency:
+        print(measure_latency(max(args.runs, 1), args.seed))
+        return
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        print(f"Error: Unknown cases: {', '.join(unknown)} (choose from {', '.join(CASES)})")
+        sys.exit(1)
+    try:
+        sizes = [int(value) for value in args.lines.split(',')]
+    except ValueError:
+        print(f"Error: --lines must be comma-separated integers, got '{args.lines}'")
+        sys.exit(1)
+
+    for case in cases:
+        print(format_results(case, time_case(case, sizes, max(args.repeat, 1), args.seed)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
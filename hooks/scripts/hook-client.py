@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Hook Client
+Runs a Python hook through the resident hook server, or in-process
+
+    python3 hook-client.py ferpa-check
+
+forwards this process's stdin, working directory and the hooks' own
+environment variables (CLAUDE_* and APEX_*) to the hook server
+(hook-server.py) over its unix socket, then relays the hook's stdout,
+stderr and exit code, so the hook runs without paying for imports and
+pattern compilation each time.
+
+The server is only tried when APEX_HOOK_SERVER=1; otherwise the hook
+script runs in this process straight away, exactly as if it had been
+started directly. The socket lives in a directory only the user can
+enter, and the client connects only to a socket the user owns. When no
+server is listening the hook runs here instead. Once a request has been
+sent it never does, because the server may already have run the hook:
+a missing or broken reply is reported as a hook error.
+
+The client is on the path of every edit, so it imports only C modules
+(the `socket` and `json` wrappers alone would double its start-up).
+Messages are lists of strings, each sent as `<byte length>:<UTF-8>`.
+"""
+
+import _socket
+import os
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds to wait for the server's reply
+REPLY_TIMEOUT = 30.0
+
+# Environment variables forwarded to the server (the hooks read only these)
+FORWARDED_ENV = ('CLAUDE_', 'APEX_')
+
+
+class ServerUnavailable(OSError):
+    """No server of this user could be connected to; the hook can run here."""
+
+
+def socket_path() -> str:
+    """
+    The server's socket: $APEX_HOOK_SOCKET, or hooks.sock in a per-user
+    apex-hooks-<uid> directory of the runtime or temp directory.
+    """
+    if os.environ.get('APEX_HOOK_SOCKET'):
+        return os.environ['APEX_HOOK_SOCKET']
+    base = os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp'
+    return os.path.join(base, f"apex-hooks-{os.getuid()}", 'hooks.sock')
+
+
+def forwarded_env() -> dict:
+    """The environment variables the hooks read."""
+    return {name: value for name, value in os.environ.items() if name.startswith(FORWARDED_ENV)}
+
+
+def encode(fields: list) -> bytes:
+    """Length-prefixed fields: b'<length>:<bytes>' for each string."""
+    data = [field.encode('utf-8', 'surrogateescape') for field in fields]
+    return b''.join(b'%d:%s' % (len(item), item) for item in data)
+
+
+def decode(data: bytes) -> list:
+    """The strings of an encoded message; raises ValueError when malformed."""
+    fields, pos = [], 0
+    while pos < len(data):
+        colon = data.index(b':', pos)
+        start = colon + 1
+        end = start + int(data[pos:colon])
+        if end > len(data):
+            raise ValueError('truncated message')
+        fields.append(data[start:end].decode('utf-8', 'surrogateescape'))
+        pos = end
+    return fields
+
+
+def connect(timeout: float) -> _socket.socket:
+    """
+    A connection to the server, or ServerUnavailable when there is none
+    or the socket is not owned by this user.
+    """
+    path = socket_path()
+    conn = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        if os.stat(path).st_uid != os.getuid():
+            raise ServerUnavailable(f"{path} is owned by another user")
+        conn.settimeout(timeout)
+        conn.connect(path)
+    except OSError as e:
+        conn.close()
+        raise e if isinstance(e, ServerUnavailable) else ServerUnavailable(str(e))
+    return conn
+
+
+def request(fields: list, timeout: float = REPLY_TIMEOUT) -> list:
+    """
+    Send one request to the server and return its reply. Raises
+    ServerUnavailable when no connection could be made, and OSError or
+    ValueError when the reply is missing or malformed.
+    """
+    conn = connect(timeout)
+    try:
+        conn.sendall(encode(fields))
+        conn.shutdown(_socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        conn.close()
+    if not chunks:
+        raise ConnectionError('hook server closed the connection without a reply')
+    return decode(b''.join(chunks))
+
+
+def run_local(hook: str, stdin_text):
+    """Run the hook script in this process (exits with the hook's exit code)."""
+    if stdin_text is not None:
+        import io
+        sys.stdin = io.StringIO(stdin_text)
+    path = os.path.join(SCRIPTS_DIR, f"{hook}.py")
+    sys.argv = [path]
+    with open(path) as f:
+        code = compile(f.read(), path, 'exec')
+    exec(code, {'__name__': '__main__', '__file__': path})
+    sys.exit(0)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: hook-client.py <hook name, e.g. ferpa-check>", file=sys.stderr)
+        sys.exit(2)
+    hook = sys.argv[1]
+
+    # A terminal on stdin means no piped content; the hook then reads the file itself
+    stdin_text = None if sys.stdin.isatty() else sys.stdin.read()
+
+    if os.environ.get('APEX_HOOK_SERVER') != '1':
+        run_local(hook, stdin_text)
+
+    # hook, cwd, whether stdin was piped, stdin, then environment names and values
+    fields = [hook, os.getcwd(), '0' if stdin_text is None else '1', stdin_text or '']
+    for name, value in forwarded_env().items():
+        fields += [name, value]
+    try:
+        code, stdout, stderr = request(fields)
+        code = int(code)
+    except ServerUnavailable:
+        run_local(hook, stdin_text)
+    except (OSError, ValueError) as e:
+        # The server may have run the hook already, so it is not run again here
+        print(f"{hook}: no valid reply from the hook server ({e or type(e).__name__})", file=sys.stderr)
+        sys.exit(1)
+
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Hook Server
+Keeps the Python hooks loaded between edits
+
+Every Edit/Write starts ferpa-check.py before the tool runs and
+pedagogy-check.py and equity-language.py after it. Started directly,
+each pays for interpreter start-up, imports and pattern compilation on
+every edit. This optional server loads each hook once (and again only
+when its script changes) and runs it on request from hook-client.py.
+hooks.json calls the client instead of the hook scripts only when
+APEX_HOOK_SERVER=1, so nothing changes until the server is enabled.
+
+Requests are handled one at a time: the hook's main() runs with the
+client's stdin, CLAUDE_* and APEX_* environment variables and working
+directory swapped in, and its stdout, stderr and exit code are sent
+back. The default socket is created readable by the current user only,
+in a directory only they can enter, and the server exits after --idle
+seconds without a request. session-init.sh starts it, and the client
+uses it, when APEX_HOOK_SERVER=1 is set.
+
+Usage:
+    python3 hook-server.py start        # in the background
+    python3 hook-server.py status
+    python3 hook-server.py stop
+    python3 hook-server.py run          # in the foreground (Ctrl-C to stop)
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import socketserver
+import subprocess
+import sys
+import time
+import traceback
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# Seconds without a request before the server exits
+DEFAULT_IDLE = 4 * 3600
+
+# Seconds a client has to send its request
+REQUEST_TIMEOUT = 10.0
+
+# Seconds `start` waits for the socket to appear
+START_TIMEOUT = 5.0
+
+
+def load_script(name: str):
+    """Import a hook script (hyphenated file name) as a module."""
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), SCRIPTS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+client = load_script('hook-client')
+
+
+class TerminalInput(io.StringIO):
+    """Stands in for a client stdin that was a terminal (no piped content)."""
+
+    def isatty(self):
+        return True
+
+
+class HookRunner:
+    """Loaded hook modules, reloaded when their script changes."""
+
+    def __init__(self):
+        self.hooks = {}
+        self.served = 0
+        self.started = time.time()
+
+    def hook(self, name: str):
+        """The loaded module for a hook name, loading or reloading it as needed."""
+        path = SCRIPTS_DIR / f"{name}.py"
+        if not name.replace('-', '').isalnum() or not path.is_file():
+            raise ValueError(f"Unknown hook: {name}")
+        mtime = path.stat().st_mtime_ns
+        loaded = self.hooks.get(name)
+        if not loaded or loaded[1] != mtime:
+            self.hooks[name] = (load_script(name), mtime)
+        return self.hooks[name][0]
+
+    def run(self, hook: str, cwd: str, piped: bool, stdin_text: str, env: dict) -> list:
+        """
+        Run one hook with the client's stdin, cwd and CLAUDE_*/APEX_* env
+        swapped in: [code, stdout, stderr].
+        """
+        self.served += 1
+        try:
+            module = self.hook(hook)
+        except ValueError as e:
+            return ['1', '', f"Error: {e}\n"]
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        saved = (sys.stdin, sys.argv, dict(os.environ), os.getcwd())
+        code = 0
+        try:
+            sys.stdin = io.StringIO(stdin_text) if piped else TerminalInput()
+            sys.argv = [str(SCRIPTS_DIR / f"{hook}.py")]
+            for name in [name for name in os.environ if name.startswith(client.FORWARDED_ENV)]:
+                del os.environ[name]
+            os.environ.update((name, value) for name, value in env.items()
+                              if name.startswith(client.FORWARDED_ENV))
+            os.chdir(cwd or saved[3])
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    module.main()
+                except SystemExit as e:
+                    if isinstance(e.code, str):
+                        print(e.code, file=sys.stderr)
+                    code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            stderr.write(traceback.format_exc())
+            code = 1
+        finally:
+            sys.stdin, sys.argv = saved[0], saved[1]
+            os.environ.clear()
+            os.environ.update(saved[2])
+            os.chdir(saved[3])
+        return [str(code), stdout.getvalue(), stderr.getvalue()]
+
+    def status(self) -> list:
+        """Process id, seconds up, requests served, and the hooks loaded (comma-separated)."""
+        return [str(os.getpid()), f"{time.time() - self.started:.0f}", str(self.served), ','.join(sorted(self.hooks))]
+
+
+class HookRequestHandler(socketserver.StreamRequestHandler):
+    """
+    One request per connection, read to EOF, and one reply, both encoded
+    as by hook-client.py. A request is [hook, cwd, piped, stdin, env
+    name, env value, ...], or ['@status'] / ['@stop'].
+    """
+
+    # A client that stops sending must not hold up the next request
+    timeout = REQUEST_TIMEOUT
+
+    def handle(self):
+        try:
+            fields = client.decode(self.rfile.read())
+        except (OSError, ValueError):
+            return
+        if fields == ['@status']:
+            reply = self.server.runner.status()
+        elif fields == ['@stop']:
+            self.server.stopping = True
+            reply = [str(os.getpid())]
+        elif len(fields) >= 4 and len(fields) % 2 == 0:
+            hook, cwd, piped, stdin_text = fields[:4]
+            env = dict(zip(fields[4::2], fields[5::2]))
+            reply = self.server.runner.run(hook, cwd, piped == '1', stdin_text, env)
+        else:
+            return
+        self.wfile.write(client.encode(reply))
+
+
+class HookServer(socketserver.UnixStreamServer):
+    """Serves requests one at a time until stopped or idle."""
+
+    def __init__(self, path: str, idle: float):
+        self.runner = HookRunner()
+        self.stopping = False
+        self.timeout = idle
+        previous = os.umask(0o177)
+        try:
+            super().__init__(path, HookRequestHandler)
+        finally:
+            os.umask(previous)
+
+    def handle_timeout(self):
+        self.stopping = True
+
+
+def private_dir(path: str):
+    """Create the default socket directory 0700, refusing one another user owns."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by another user")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+
+def prepare_socket(path: str):
+    """Make the default socket's directory private, or exit when it cannot be."""
+    if os.environ.get('APEX_HOOK_SOCKET'):
+        return
+    try:
+        private_dir(os.path.dirname(path))
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+def is_running() -> bool:
+    """True when a server answers on the socket."""
+    try:
+        client.request(['@status'], timeout=2.0)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def serve(idle: float):
+    """Serve in the foreground until stopped, idle, or interrupted."""
+    path = client.socket_path()
+    if is_running():
+        print(f"Hook server already running on {path}")
+        return
+    prepare_socket(path)
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)  # left by a server that did not shut down cleanly
+    server = HookServer(path, idle)
+    print(f"Hook server listening on {path} (pid {os.getpid()})", flush=True)
+    try:
+        while not server.stopping:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+
+
+def start(idle: float):
+    """Start the server as a detached process and wait for its socket."""
+    path = client.socket_path()
+    if is_running():
+        print(f"Hook server already running on {path}")
+        return
+    prepare_socket(path)
+    subprocess.Popen([sys.executable, __file__, 'run', '--idle', str(idle)],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+    deadline = time.time() + START_TIMEOUT
+    while time.time() < deadline:
+        if is_running():
+            print(f"Hook server started on {path}")
+            return
+        time.sleep(0.05)
+    print(f"Error: Hook server did not start on {path}")
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Resident server that keeps the Python hooks loaded',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  Start in the background (with APEX_HOOK_SERVER=1, hooks.json routes
+  hooks through hook-client.py and session-init.sh starts the server):
+    APEX_HOOK_SERVER=1 python3 hook-server.py start
+
+  Check what it has served, then stop it:
+    python3 hook-server.py status
+    python3 hook-server.py stop
+
+  Use another socket (the client reads the same variable):
+    APEX_HOOK_SOCKET=/tmp/my-hooks.sock python3 hook-server.py start
+        """
+    )
+    parser.add_argument('command', choices=['start', 'stop', 'status', 'run'],
+                        help='start in the background, stop, show status, or run in the foreground')
+    parser.add_argument('--idle', type=float, default=DEFAULT_IDLE,
+                        help=f'Exit after this many seconds without a request (default {DEFAULT_IDLE})')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        serve(args.idle)
+    elif args.command == 'start':
+        start(args.idle)
+    else:
+        try:
+            reply = client.request([f"@{args.command}"], timeout=5.0)
+        except (OSError, ValueError):
+            print(f"Hook server not running ({client.socket_path()})")
+            sys.exit(1 if args.command == 'status' else 0)
+        if args.command == 'status':
+            pid, uptime, served, hooks = reply
+            print(f"Hook server pid {pid}: up {uptime}s, {served} requests, "
+                  f"hooks loaded: {hooks.replace(',', ', ') or 'none'}")
+        else:
+            print(f"Hook server stopped (pid {reply[0]})")
+
+
+if __name__ == "__main__":
+    main()
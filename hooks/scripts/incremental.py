@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Incremental Scan State
+Lets the PostToolUse hooks rescan only the part of a file an Edit changed
+
+For an Edit, the hook payload carries the file path and the replaced
+text (old_string, new_string), and the edited file is on disk. Each hook
+keeps, per file, the SHA-256 of the content it last scanned and the
+positions of every rule match in it. The edit is located by finding
+new_string in the file and checking that putting old_string back gives
+the cached digest. The hook then rescans a window around the edit (whole
+lines, with at least MARGIN_WORDS words on each side) and keeps the
+cached matches outside it, shifted past the edit. No rule pattern spans
+that many words, so no match outside the window can read the edited
+text, and the result is the same as a full rescan.
+
+The cache holds digests and match offsets, never document text. When
+anything does not line up (no cache for the file, the file changed
+outside the hooks, the rules changed, a deletion or replace_all edit, or
+too many places the edit could be), the hook does a full scan, which
+refreshes the cache.
+
+Usage:
+    import incremental
+
+    payload = incremental.read_payload(stdin_text)
+    state = incremental.load_state('pedagogy-check', path, RULES)
+    edit = incremental.locate_edit(content, payload, state)
+    if edit:
+        window = incremental.edit_window(content, edit)
+        spans = incremental.update_matches(regex, state['spans'][key], content, window)
+    incremental.save_state('pedagogy-check', path, RULES, content, {'spans': ...})
+"""
+
+import hashlib
+import json
+import os
+import re
+from bisect import bisect_left
+from collections import namedtuple
+
+# Words kept on each side of an edit: more than any rule pattern spans
+MARGIN_WORDS = 16
+
+# Places new_string may occur before the edit is not worth locating
+MAX_CANDIDATES = 8
+
+# Characters searched at a time when counting words back from an edit
+LOOKAROUND_CHARS = 2048
+
+WORD = re.compile(r'\S+')
+
+# The text rescanned around an edit: [start, new_end) in the new content,
+# which was [start, old_end) holding old_text before the edit. Matches
+# starting in the window end before `horizon`.
+Window = namedtuple('Window', 'start old_end new_end old_text horizon')
+
+
+def read_payload(text: str):
+    """The hook payload when stdin is one (a JSON object with tool_input), else None."""
+    if not text or not text.lstrip().startswith('{'):
+        return None
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(payload, dict) and isinstance(payload.get('tool_input'), dict):
+        return payload
+    return None
+
+
+def cache_dir() -> str:
+    """Where scan state is kept: $APEX_HOOK_CACHE, or apex-hooks in the user cache directory."""
+    if os.environ.get('APEX_HOOK_CACHE'):
+        return os.environ['APEX_HOOK_CACHE']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'apex-hooks')
+
+
+def rules_fingerprint(*tables) -> str:
+    """A digest of a hook's rule tables, so cached state from other rules is ignored."""
+    return hashlib.sha256(repr(tables).encode()).hexdigest()[:16]
+
+
+def case_aligned(text: str) -> bool:
+    """True when lowercasing keeps every offset, so matches in text.lower() line up with text."""
+    return text.isascii() or len(text.lower()) == len(text)
+
+
+def digest(text: str) -> str:
+    """SHA-256 of the text."""
+    return hashlib.sha256(text.encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+def state_path(hook: str, filepath: str) -> str:
+    key = hashlib.sha256(f"{hook}\0{os.path.abspath(filepath)}".encode()).hexdigest()[:24]
+    return os.path.join(cache_dir(), f"{key}.json")
+
+
+def load_state(hook: str, filepath: str, rules: str):
+    """The cached state for a file, or None when missing or from other rules."""
+    try:
+        with open(state_path(hook, filepath)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get('rules') == rules else None
+
+
+def save_state(hook: str, filepath: str, rules: str, content: str, state: dict):
+    """Cache the state of a file's scan (written atomically, readable by the user only)."""
+    path = state_path(hook, filepath)
+    temp = f"{path}.tmp-{os.getpid()}"
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with open(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            json.dump(dict(state, rules=rules, digest=digest(content)), f, separators=(',', ':'))
+        os.replace(temp, path)
+    except OSError:
+        pass  # without a cache the next edit is scanned in full
+
+
+def locate_edit(content: str, payload: dict, state: dict):
+    """
+    The edit as (start, old end, new end, old text) when the file is the
+    cached content with one Edit applied, else None.
+    """
+    if not state or not payload or payload.get('tool_name') != 'Edit':
+        return None
+    tool_input = payload['tool_input']
+    old, new = tool_input.get('old_string'), tool_input.get('new_string')
+    if not isinstance(old, str) or not isinstance(new, str) or not new or tool_input.get('replace_all'):
+        return None
+
+    starts = []
+    pos = content.find(new)
+    while pos != -1 and len(starts) <= MAX_CANDIDATES:
+        starts.append(pos)
+        pos = content.find(new, pos + 1)
+    if len(starts) > MAX_CANDIDATES:
+        return None
+    for start in starts:
+        if digest(content[:start] + old + content[start + len(new):]) == state['digest']:
+            return start, start + len(old), start + len(new), old
+    return None
+
+
+def words_before(text: str, pos: int, words: int) -> int:
+    """The start of the line holding the `words`-th word before pos (0 if fewer)."""
+    span = LOOKAROUND_CHARS
+    while True:
+        begin = max(0, pos - span)
+        starts = [match.start() for match in WORD.finditer(text, begin, pos)]
+        # The first word found may be cut off by `begin`, so it does not count
+        if len(starts) > words or begin == 0:
+            start = starts[-words - 1] if len(starts) > words else 0
+            return text.rfind('\n', 0, start) + 1
+        span *= 4
+
+
+def words_after(text: str, pos: int, words: int) -> int:
+    """The end of the line holding the `words`-th word after pos (len(text) if fewer)."""
+    span = LOOKAROUND_CHARS
+    while True:
+        end = min(len(text), pos + span)
+        ends = [match.end() for match in WORD.finditer(text, pos, end)]
+        if len(ends) > words or end == len(text):
+            stop = ends[words] if len(ends) > words else len(text)
+            line_end = text.find('\n', stop)
+            return len(text) if line_end == -1 else line_end
+        span *= 4
+
+
+def edit_window(content: str, edit: tuple) -> Window:
+    """
+    The region to rescan around an edit. Outside it, old and new content
+    are the same text, shifted by the change in length after the window.
+    """
+    start, old_end, new_end, old = edit
+    window_start = words_before(content, start, MARGIN_WORDS)
+    window_end = words_after(content, new_end, MARGIN_WORDS)
+    old_window = content[window_start:start] + old + content[new_end:window_end]
+    return Window(window_start, window_end - (new_end - old_end), window_end, old_window,
+                  words_after(content, window_end, MARGIN_WORDS))
+
+
+def update_matches(regex, old_spans: list, text: str, window: Window) -> list:
+    """
+    The (start, end) spans of regex.finditer(text), from the spans in the
+    old content: kept before the window, found again inside it, and
+    shifted after it once the new matches line up with the old ones.
+    """
+    start, new_end = window.start, window.new_end
+    delta = new_end - window.old_end
+    old_starts = [span[0] for span in old_spans]
+    spans = [tuple(span) for span in old_spans[:bisect_left(old_starts, start)]]
+    pos = max(start, spans[-1][1]) if spans else start
+
+    while True:
+        if pos >= new_end:
+            # In step with the old matches unless one of them runs over this point
+            i = bisect_left(old_starts, pos - delta)
+            if i == 0 or old_spans[i - 1][1] <= pos - delta:
+                return spans + [(s + delta, e + delta) for s, e in old_spans[i:]]
+        # A match starting before `safe` ends before words_after(safe), so the
+        # search can stop there
+        if pos < new_end:
+            safe, horizon = new_end, window.horizon
+        else:
+            safe = words_after(text, pos, MARGIN_WORDS)
+            horizon = words_after(text, safe, MARGIN_WORDS)
+        match = regex.search(text, pos, horizon)
+        if match and match.start() < safe:
+            spans.append(match.span())
+            pos = max(match.end(), match.start() + 1)
+        else:
+            pos = safe
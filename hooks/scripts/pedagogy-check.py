@@ -6,6 +6,11 @@ Validates PD and learning content against J Fraser pedagogy protocol
 This hook runs on Stop to validate teaching/learning content
 follows Experience -> Analysis -> Framework sequence and includes
 required elements like mirror work.
+
+Given the hook payload, it checks the edited file. It keeps every rule
+match in the file, so after an Edit only the changed region is rescanned
+and the whole-document results (indicators, element counts, sequence)
+are worked out again from the updated matches (see incremental.py).
 """
 
 import sys
@@ -13,6 +18,8 @@ import re
 import os
 from pathlib import Path
 
+import incremental
+
 # Indicators of teaching/learning content
 LEARNING_CONTENT_INDICATORS = [
     r'professional\s+development',
@@ -144,6 +151,20 @@ ANTI_PATTERNS = {
 }
 
 
+# Every rule pattern by key, as the checks below run it: on the
+# lowercased content, except the anti-patterns
+RULE_PATTERNS = {f'indicator:{i}': re.compile(pattern) for i, pattern in enumerate(LEARNING_CONTENT_INDICATORS)}
+RULE_PATTERNS.update({f'{key}:{i}': re.compile(pattern)
+                      for key, config in REQUIRED_ELEMENTS.items()
+                      for i, pattern in enumerate(config['patterns'])})
+ANTI_RULE_PATTERNS = {f'{key}:{i}': re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+                      for key, config in ANTI_PATTERNS.items()
+                      for i, pattern in enumerate(config['patterns'])}
+
+HOOK_NAME = 'pedagogy-check'
+RULES = incremental.rules_fingerprint(LEARNING_CONTENT_INDICATORS, REQUIRED_ELEMENTS, ANTI_PATTERNS)
+
+
 def is_learning_content(content: str) -> bool:
     """Check if content appears to be teaching/learning material."""
     content_lower = content.lower()
@@ -198,6 +219,105 @@ def check_sequence(content: str) -> dict:
     return {'correct': None, 'message': 'Could not verify sequence'}
 
 
+def check_content(content: str):
+    """Results of every check, or None when the content is not learning content."""
+    # Only check learning content
+    if not is_learning_content(content):
+        return None
+
+    # Check all elements
+    results = {'elements': {}, 'warnings': []}
+
+    for key, config in REQUIRED_ELEMENTS.items():
+        found, count = check_element(content, config)
+        results['elements'][key] = {'found': found, 'count': count}
+
+    # Check sequence
+    results['sequence'] = check_sequence(content)
+
+    # Check for anti-patterns
+    for key, config in ANTI_PATTERNS.items():
+        for pattern in config['patterns']:
+            if re.search(pattern, content, re.IGNORECASE | re.MULTILINE):
+                results['warnings'].append(config['warning'])
+                break
+
+    return results
+
+
+def rule_spans(content: str) -> dict:
+    """The (start, end) span of every match of every rule pattern, by key."""
+    content_lower = content.lower()
+    spans = {key: [match.span() for match in regex.finditer(content_lower)]
+             for key, regex in RULE_PATTERNS.items()}
+    spans.update({key: [match.span() for match in regex.finditer(content)]
+                  for key, regex in ANTI_RULE_PATTERNS.items()})
+    return spans
+
+
+def update_spans(content: str, window, state: dict):
+    """
+    rule_spans() for content that is the cached content with one edit,
+    from the cached spans and the edit window; None when the lowercased
+    text would not line up with the content.
+    """
+    if not state.get('aligned') or not incremental.case_aligned(content):
+        return None
+    content_lower = content.lower()
+    spans = {key: incremental.update_matches(regex, state['spans'][key], content_lower, window)
+             for key, regex in RULE_PATTERNS.items()}
+    spans.update({key: incremental.update_matches(regex, state['spans'][key], content, window)
+                  for key, regex in ANTI_RULE_PATTERNS.items()})
+    return spans
+
+
+def results_from_spans(spans: dict):
+    """check_content() results worked out from the rule matches."""
+    indicators = sum(1 for i in range(len(LEARNING_CONTENT_INDICATORS)) if spans[f'indicator:{i}'])
+    if indicators < 2:
+        return None
+
+    results = {'elements': {}, 'warnings': []}
+    for key, config in REQUIRED_ELEMENTS.items():
+        counts = [len(spans[f'{key}:{i}']) for i in range(len(config['patterns']))]
+        results['elements'][key] = {'found': any(counts), 'count': sum(counts)}
+
+    # The first pattern that matches gives the position, as in check_sequence()
+    positions = {}
+    for name, key in (('experience', 'experiential_entry'), ('framework', 'framework_after')):
+        for i in range(len(REQUIRED_ELEMENTS[key]['patterns'])):
+            if spans[f'{key}:{i}']:
+                positions[name] = spans[f'{key}:{i}'][0][0]
+                break
+    if 'experience' in positions and 'framework' in positions:
+        if positions['experience'] < positions['framework']:
+            results['sequence'] = {'correct': True, 'message': 'Experience precedes Framework'}
+        else:
+            results['sequence'] = {'correct': False, 'message': 'WARNING: Framework may appear before Experience'}
+    else:
+        results['sequence'] = {'correct': None, 'message': 'Could not verify sequence'}
+
+    for key, config in ANTI_PATTERNS.items():
+        if any(spans[f'{key}:{i}'] for i in range(len(config['patterns']))):
+            results['warnings'].append(config['warning'])
+    return results
+
+
+def check_file(content: str, filepath: str, payload: dict):
+    """
+    check_content() of a file after the tool in the hook payload changed
+    it, rescanning only the edit window when the file's cached state
+    allows, and caching the new state.
+    """
+    state = incremental.load_state(HOOK_NAME, filepath, RULES)
+    edit = incremental.locate_edit(content, payload, state)
+    spans = update_spans(content, incremental.edit_window(content, edit), state) if edit else None
+    spans = spans or rule_spans(content)
+    incremental.save_state(HOOK_NAME, filepath, RULES, content,
+                           {'spans': spans, 'aligned': incremental.case_aligned(content)})
+    return results_from_spans(spans)
+
+
 def format_report(results: dict, filepath: str = '') -> str:
     """Format the pedagogy check report."""
     lines = []
@@ -293,30 +413,22 @@ def main():
         else:
             sys.exit(0)
 
+        # A hook payload names the edited file: check the file itself
+        payload = incremental.read_payload(content)
+        if payload:
+            filepath = payload['tool_input'].get('file_path') or ''
+            if not os.path.isfile(filepath):
+                sys.exit(0)
+            with open(filepath, 'r', errors='ignore') as f:
+                content = f.read()
+
         if not content:
             sys.exit(0)
 
-        # Only check learning content
-        if not is_learning_content(content):
+        results = check_file(content, filepath, payload) if payload else check_content(content)
+        if results is None:
             sys.exit(0)
 
-        # Check all elements
-        results = {'elements': {}, 'warnings': []}
-
-        for key, config in REQUIRED_ELEMENTS.items():
-            found, count = check_element(content, config)
-            results['elements'][key] = {'found': found, 'count': count}
-
-        # Check sequence
-        results['sequence'] = check_sequence(content)
-
-        # Check for anti-patterns
-        for key, config in ANTI_PATTERNS.items():
-            for pattern in config['patterns']:
-                if re.search(pattern, content, re.IGNORECASE | re.MULTILINE):
-                    results['warnings'].append(config['warning'])
-                    break
-
         # Format and print report
         report = format_report(results, filepath)
         print(report, file=sys.stderr)
@@ -11,6 +11,11 @@ mkdir -p "$LOG_DIR"
 # Log session start
 echo "$(date '+%Y-%m-%d %H:%M:%S') - APEX Session Started" >> "$LOG_DIR/sessions.log"
 
+# Optional: keep the Python hooks loaded between edits (see hook-server.py)
+if [ "${APEX_HOOK_SERVER:-0}" = "1" ]; then
+    python3 "${PLUGIN_ROOT}/hooks/scripts/hook-server.py" start >> "$LOG_DIR/sessions.log" 2>&1
+fi
+
 # Display welcome message
 cat << 'EOF'
 ╔═══════════════════════════════════════════════════════════════╗
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Mergeable Partial Aggregates
+Per-group sufficient statistics shared by the equity-audit scripts
+
+Each chunk of a large file is reduced to a small table of per-group
+statistics (rows, count, sum, centered sum of squares, min, max). Tables
+from different chunks merge exactly, so a streamed run reports the same
+counts, means and standard deviations as a single in-memory groupby while
+only ever holding one chunk plus the group table in memory.
+
+Intersections are handled like a CUBE/ROLLUP: the finest-grain cell
+table is built once and every lower-order grouping is rolled up from the
+smallest table that contains it, so the work scales with cells, not rows.
+
+Medians and percentiles cannot be merged from sums, so on request each
+group also carries a quantile sketch (see sketches.py) in a 'sketch'
+column; sketches merge wherever the other statistics do.
+
+Usage:
+    from aggregates import cube, group_stats, merge_stats, read_csv_chunks
+
+    cells = None
+    for chunk in read_csv_chunks('students.csv', 100_000):
+        part = group_stats(chunk, ['race', 'gender', 'ell'], 'gpa')
+        cells = part if cells is None else merge_stats(cells, part)
+    tables = cube(cells, [('race',), ('race', 'gender')])
+"""
+
+import numpy as np
+import pandas as pd
+
+from sketches import DEFAULT_K, group_sketches, merge_sketches
+
+# rows counts every record in the group; the rest describe the metric values
+METRIC_STATS = ['count', 'sum', 'm2', 'min', 'max']
+
+# Sketch size for each quantile mode; None keeps every value (exact)
+QUANTILE_MODES = {'sketch': DEFAULT_K, 'exact': None}
+
+def read_columns(path: str) -> list:
+    """Read only the header row of a CSV file."""
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def read_csv_chunks(path: str, chunksize: int, usecols: list = None, dtype: dict = None):
+    """Iterate over (selected columns of) a CSV file in chunks of `chunksize` rows."""
+    if dtype and usecols is not None:
+        dtype = {col: kind for col, kind in dtype.items() if col in usecols}
+    return pd.read_csv(path, chunksize=chunksize, usecols=usecols, dtype=dtype or None)
+
+def group_stats(df: pd.DataFrame, keys: list, metric_col: str = None,
+                quantiles: str = None) -> pd.DataFrame:
+    """
+    Reduce a frame to one row of partial aggregates per group.
+
+    Missing keys are kept as their own group so that totals over the whole
+    file can still be rolled up later; `rollup` drops them on request.
+    `quantiles` ('sketch' or 'exact', see QUANTILE_MODES) adds a 'sketch'
+    column of per-group quantile sketches of the metric.
+    """
+    grouped = df.groupby(keys, dropna=False, observed=True, sort=False)
+    stats = grouped.size().to_frame('rows')
+
+    if metric_col:
+        values = grouped[metric_col].agg(['count', 'sum', 'var', 'min', 'max'])
+        count = values['count'].to_numpy()
+        stats['count'] = count
+        stats['sum'] = values['sum'].to_numpy()
+        # Centered sum of squares; var is NaN for groups with fewer than two values
+        stats['m2'] = np.where(count > 1, values['var'].to_numpy() * (count - 1), 0.0)
+        stats['min'] = values['min'].to_numpy()
+        stats['max'] = values['max'].to_numpy()
+
+        if quantiles:
+            metric = df[metric_col].to_numpy(dtype=float, na_value=np.nan)
+            stats['sketch'] = group_sketches(metric, group_codes(df, keys), len(stats),
+                                             QUANTILE_MODES[quantiles])
+
+    return stats
+
+def group_codes(df: pd.DataFrame, keys: list) -> np.ndarray:
+    """
+    Each row's group number in first-appearance order, missing keys
+    included: the numbering of groupby(keys, dropna=False, sort=False),
+    several times faster than GroupBy.ngroup.
+    """
+    parts = [pd.factorize(df[col], use_na_sentinel=False) for col in keys]
+    if len(parts) == 1:
+        return parts[0][0]
+    combined = np.ravel_multi_index([codes for codes, _ in parts], [len(uniques) for _, uniques in parts])
+    return pd.factorize(combined)[0]
+
+def rollup(stats: pd.DataFrame, keys: list, dropna: bool = True) -> pd.DataFrame:
+    """
+    Combine partial aggregates up to a coarser set of keys.
+
+    `keys` must be index levels of `stats`; an empty list rolls everything
+    into a single overall row. Centered sums of squares are combined with
+    the parallel-variance formula, so no precision is lost by merging.
+    """
+    def group(frame):
+        if keys:
+            return frame.groupby(level=keys, dropna=dropna, observed=True)
+        return frame.groupby(np.zeros(len(frame), dtype=int))
+
+    grouped = group(stats)
+    if 'count' not in stats.columns:
+        return grouped[['rows']].sum()
+
+    result = grouped[['rows', 'count', 'sum']].sum()
+    result['min'] = grouped['min'].min()
+    result['max'] = grouped['max'].max()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        part_mean = stats['sum'] / stats['count']
+        whole_mean = grouped['sum'].transform('sum') / grouped['count'].transform('sum')
+        spread = stats['m2'] + stats['count'] * (part_mean - whole_mean) ** 2
+    result['m2'] = group(spread.where(stats['count'] > 0, 0.0).to_frame('m2'))['m2'].sum()
+
+    if 'sketch' in stats.columns:
+        result['sketch'] = grouped['sketch'].agg(merge_sketches)
+        return result[['rows'] + METRIC_STATS + ['sketch']]
+    return result[['rows'] + METRIC_STATS]
+
+def merge_stats(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    """Merge two partial-aggregate tables built over the same keys."""
+    keys = list(left.index.names)
+    return rollup(pd.concat([left, right]), keys, dropna=False)
+
+def stats_mean(stats: pd.DataFrame) -> pd.Series:
+    """Mean of the metric for each group (NaN where no values)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return stats['sum'] / stats['count'].where(stats['count'] > 0)
+
+def stats_std(stats: pd.DataFrame) -> pd.Series:
+    """Sample standard deviation (ddof=1) of the metric for each group."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(stats['m2'] / (stats['count'] - 1).where(stats['count'] > 1))
+
+def complement_stats(stats: pd.DataFrame, overall: pd.Series) -> pd.DataFrame:
+    """
+    Count, sum and centered sum of squares of everything outside each
+    group, given the `overall` row the groups were rolled up into (the
+    parallel-variance formula run backwards).
+    """
+    count = overall['count'] - stats['count']
+    total = overall['sum'] - stats['sum']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = stats_mean(stats) - total / count.where(count > 0)
+        between = (stats['count'] * count / overall['count'] * diff ** 2).fillna(0.0)
+    m2 = (overall['m2'] - stats['m2'] - between).clip(lower=0.0)
+    return pd.DataFrame({'count': count, 'sum': total, 'm2': m2})
+
+def cube(cells: pd.DataFrame, groupings: list) -> dict:
+    """
+    Roll a finest-grain cell table up to every requested grouping.
+
+    Groupings are built finest first, each from the smallest table already
+    built whose keys contain it. Missing keys are kept in the returned
+    tables (so later roll-ups stay exact); finish with `rollup(table, keys)`
+    to drop them. Returns tables keyed by grouping tuple.
+    """
+    built = {tuple(cells.index.names): cells}
+
+    for keys in sorted(set(map(tuple, groupings)), key=len, reverse=True):
+        if keys in built:
+            continue
+        parent = min((table for names, table in built.items() if set(keys) <= set(names)), key=len)
+        built[keys] = rollup(parent, list(keys), dropna=False)
+
+    return {tuple(keys): built[tuple(keys)] for keys in groupings}
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Equity Audit Benchmarks
+Times the audit scripts on synthetic data and compares results across commits
+
+Each case runs the real script in a fresh process on seeded synthetic
+data (see synthetic_data.py) with --timings, so results cover the code
+path users run. Per-phase times (load, group, gaps, render, output) are
+the median over --repeat runs; peak RSS is the largest seen. Results are
+written as JSON tagged with the git commit, so two result files can be
+compared with --compare.
+
+Generated data files are kept in the data directory
+(skills/equity-audit/.bench by default) and reused by later runs.
+
+Usage:
+    python benchmark.py                              # 10k and 1m rows, all cases
+    python benchmark.py --sizes 10k,1m,10m --repeat 5
+    python benchmark.py --cases disaggregate --compare .bench/results-1a2b3c4.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import generate, parse_rows
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DEFAULT_DATA_DIR = SCRIPTS_DIR.parent / '.bench'
+
+CASES = {
+    'disaggregate': ['disaggregate.py', '--by', 'race_ethnicity,gender,sped,ell,frl',
+                     '--metric', 'gpa', '--intersect', '--gaps'],
+    'disaggregate-stream': ['disaggregate.py', '--by', 'race_ethnicity,gender,sped,ell,frl',
+                            '--metric', 'gpa', '--intersect', '--gaps', '--chunksize', '500000'],
+    'disproportionality': ['disproportionality.py', '--group', 'race_ethnicity', '--outcome', 'suspended'],
+    'disproportionality-sites': ['disproportionality.py', '--by-site', 'school',
+                                 '--group', 'race_ethnicity', '--outcome', 'suspended'],
+}
+PHASES = ['load', 'group', 'gaps', 'render', 'output']
+
+def dataset(data_dir: Path, rows: int, seed: int) -> Path:
+    """Path of the synthetic file for (rows, seed), generating it if needed."""
+    path = data_dir / f"students_{rows}_{seed}.csv"
+    if not path.exists():
+        print(f"Generating {rows:,} rows -> {path}")
+        staging = path.with_name(f".{path.name}.tmp")
+        generate(str(staging), rows, seed)
+        os.replace(staging, path)
+    return path
+
+def git_commit() -> dict:
+    """Current commit and whether the working tree has uncommitted changes."""
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=SCRIPTS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    try:
+        return {'commit': git('rev-parse', '--short', 'HEAD'),
+                'dirty': bool(git('status', '--porcelain', '--', '.'))}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': 'unknown', 'dirty': None}
+
+def run_case(case: str, path: Path, work_dir: Path, env: dict) -> dict:
+    """Run one case once in a fresh process; returns wall time and phase timings."""
+    script, *args = CASES[case]
+    timings_file = work_dir / 'timings.json'
+    command = [sys.executable, str(SCRIPTS_DIR / script), '--data', str(path), *args,
+               '--output', str(work_dir / 'output.csv'), '--timings', str(timings_file)]
+    if env.get('APEX_EQUITY_CACHE_DIR') is None:
+        command.append('--no-cache')
+
+    started = time.perf_counter()
+    completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env)
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{case} failed: {completed.stderr.strip()[-500:]}")
+
+    timings = json.loads(timings_file.read_text())
+    return {'wall_s': round(wall, 4), **timings}
+
+def summarize(case: str, rows: int, runs: list) -> dict:
+    """Median wall and phase times over the runs; peak RSS is the maximum."""
+    phases = {}
+    for phase in PHASES:
+        values = [run['phases'][phase] for run in runs if phase in run['phases']]
+        if values:
+            phases[phase] = round(statistics.median(values), 4)
+    wall = statistics.median(run['wall_s'] for run in runs)
+    return {
+        'case': case,
+        'rows': rows,
+        'wall_s': round(wall, 4),
+        'rows_per_s': round(rows / wall),
+        'phases': phases,
+        'peak_rss_mb': max(run['peak_rss_mb'] or 0 for run in runs),
+        'runs': runs,
+    }
+
+def print_results(results: list):
+    """Print a table of median phase times and peak memory."""
+    print(f"\n{'Case':<26} {'Rows':>11} {'Wall':>8}" + "".join(f"{p:>8}" for p in PHASES) + f" {'Peak RSS':>10}")
+    print("-" * (58 + 8 * len(PHASES)))
+    for result in results:
+        phases = "".join(f"{result['phases'][p]:>8.3f}" if p in result['phases'] else f"{'-':>8}"
+                         for p in PHASES)
+        print(f"{result['case']:<26} {result['rows']:>11,} {result['wall_s']:>8.3f}{phases} "
+              f"{result['peak_rss_mb']:>7.0f} MB")
+    print("\nTimes are medians in seconds.")
+
+def compare(base: dict, current: dict):
+    """Print the change in wall time, each phase and peak RSS against a base result file."""
+    baseline = {(r['case'], r['rows']): r for r in base['results']}
+    print(f"\nComparison: {base['meta']['commit']} -> {current['meta']['commit']}"
+          + (" (uncommitted changes)" if current['meta'].get('dirty') else ""))
+    print(f"{'Case':<26} {'Rows':>11} {'Measure':<12} {'Before':>10} {'After':>10} {'Change':>9}")
+    print("-" * 82)
+
+    def change(before, after):
+        return f"{(after - before) / before * 100:>+8.1f}%" if before else f"{'-':>9}"
+
+    for result in current['results']:
+        old = baseline.get((result['case'], result['rows']))
+        if old is None:
+            continue
+        measures = [('wall', old['wall_s'], result['wall_s'])]
+        measures += [(p, old['phases'][p], result['phases'][p]) for p in PHASES
+                     if p in old['phases'] and p in result['phases']]
+        measures.append(('peak RSS MB', old['peak_rss_mb'], result['peak_rss_mb']))
+        for name, before, after in measures:
+            print(f"{result['case']:<26} {result['rows']:>11,} {name:<12} {before:>10.3f} {after:>10.3f} "
+                  f"{change(before, after)}")
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the equity-audit scripts on synthetic data',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Cases: {', '.join(CASES)}
+
+Examples:
+  Quick check:
+    python benchmark.py --sizes 10k --repeat 1
+
+  Before/after a change:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+        """
+    )
+
+    parser.add_argument('--sizes', default='10k,1m', help='Comma-separated row counts (default 10k,1m; e.g. 10k,1m,10m)')
+    parser.add_argument('--cases', default=','.join(CASES), help='Comma-separated cases to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case; medians are reported (default 3)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic data (default 42)')
+    parser.add_argument('--warm-cache', action='store_true',
+                        help='Time runs with a warm parse cache instead of parsing every run')
+    parser.add_argument('--data-dir', default=str(DEFAULT_DATA_DIR),
+                        help=f'Where generated data and results are kept (default {DEFAULT_DATA_DIR})')
+    parser.add_argument('--output', help='Results JSON file (default DATA_DIR/results-<commit>.json)')
+    parser.add_argument('--compare', metavar='BASE', help='Earlier results JSON to compare against')
+
+    args = parser.parse_args()
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        print(f"Error: Unknown cases: {', '.join(unknown)}")
+        print(f"Available cases: {', '.join(CASES)}")
+        sys.exit(1)
+    try:
+        sizes = [parse_rows(size) for size in args.sizes.split(',')]
+    except ValueError:
+        print(f"Error: Invalid --sizes '{args.sizes}'")
+        sys.exit(1)
+
+    base = None
+    if args.compare:
+        try:
+            with open(args.compare) as f:
+                base = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {args.compare}: {e}")
+            sys.exit(1)
+
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    meta = {
+        **git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'warm_cache': args.warm_cache,
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory() as work:
+        work_dir = Path(work)
+        env = dict(os.environ)
+        env.pop('APEX_EQUITY_CACHE_DIR', None)
+        if args.warm_cache:
+            env['APEX_EQUITY_CACHE_DIR'] = str(work_dir / 'cache')
+
+        for rows in sizes:
+            path = dataset(data_dir, rows, args.seed)
+            for case in cases:
+                print(f"Running {case} on {rows:,} rows...", flush=True)
+                try:
+                    if args.warm_cache:
+                        run_case(case, path, work_dir, env)
+                    runs = [run_case(case, path, work_dir, env) for _ in range(args.repeat)]
+                except RuntimeError as e:
+                    print(f"Error: {e}")
+                    sys.exit(1)
+                results.append(summarize(case, rows, runs))
+
+    report = {'meta': meta, 'results': results}
+    output = Path(args.output) if args.output else data_dir / f"results-{meta['commit']}.json"
+    output.write_text(json.dumps(report, indent=2))
+
+    print_results(results)
+    if base:
+        compare(base, report)
+    print(f"Results saved to: {output}")
+
+if __name__ == '__main__':
+    main()
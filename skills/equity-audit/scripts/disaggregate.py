@@ -6,102 +6,403 @@ Breaks down aggregate data by demographic categories with intersectional analysi
 Usage:
     python disaggregate.py --data file.csv --by "race,gender,sped,ell"
     python disaggregate.py --data file.csv --by "race,gender" --metric gpa --intersect
+    python disaggregate.py --data file.csv --by "race,gender" --metric "gpa,attendance_rate" --quantiles exact
+    python disaggregate.py --data big.csv --by "race,gender" --metric gpa --chunksize 500000
+    python disaggregate.py --data big.csv --by "race,gender" --metric gpa --sample 0.01
+    python disaggregate.py --sqlite sis.db --table students --by "race,gender" --metric gpa
 
 Example:
     python disaggregate.py --data students.csv --by "race_ethnicity,gender,sped_status" --metric math_score
 """
 
 import argparse
+import math
+import os
+import numpy as np
 import pandas as pd
 import sys
 from itertools import combinations
 
-def disaggregate_single(df: pd.DataFrame, by_col: str, metric_col: str = None) -> pd.DataFrame:
-    """Disaggregate by a single column."""
-    if metric_col and metric_col in df.columns:
-        result = df.groupby(by_col).agg({
-            metric_col: ['count', 'mean', 'std', 'min', 'max']
-        }).round(2)
-        result.columns = ['Count', 'Mean', 'Std Dev', 'Min', 'Max']
+from aggregates import (complement_stats, cube, group_stats, merge_stats, read_columns,
+                        read_csv_chunks, rollup, stats_mean, stats_std)
+from parse_cache import load_csv, read_schema
+from sampling import SAMPLE_LEVEL, estimate_groups, parse_sample, stratified_sample, stratum_table
+from render import (DEFAULT_PAGE_SIZE, EXPORT_FORMATS, RENDER_FORMATS, export_results, render_bars,
+                    render_table, select_rows)
+from sketches import sketch_quantiles
+from sqlite_source import sqlite_cells, sqlite_columns, sqlite_sketches, table_source
+import timings
+
+# Percentile columns reported when quantile sketches are available
+QUANTILES = {'P10': 0.1, 'P25': 0.25, 'Median': 0.5, 'P75': 0.75, 'P90': 0.9}
+
+# Gap scan defaults: medium effect size, smallest group tested, false discovery rate
+GAP_EFFECT_SIZE = 0.5
+GAP_MIN_N = 30
+GAP_FDR = 0.05
+
+def quantile_columns(stats: pd.DataFrame) -> pd.DataFrame:
+    """P10 through P90 for each group, or no columns when there are no sketches."""
+    if 'sketch' not in stats.columns:
+        return pd.DataFrame(index=stats.index)
+    values = sketch_quantiles(stats['sketch'], list(QUANTILES.values()))
+    values.columns = list(QUANTILES)
+    return values
+
+def single_from_stats(stats: pd.DataFrame, by_col: str, metric_col: str = None) -> pd.DataFrame:
+    """Count, mean, spread and range per value of one column, from partial aggregates."""
+    grouped = rollup(stats, [by_col])
+    if metric_col:
+        result = pd.concat([
+            pd.DataFrame({
+                'Count': grouped['count'],
+                'Mean': stats_mean(grouped),
+                'Std Dev': stats_std(grouped),
+                'Min': grouped['min'],
+            }),
+            quantile_columns(grouped),
+            grouped[['max']].rename(columns={'max': 'Max'}),
+        ], axis=1).round(2)
     else:
-        result = df.groupby(by_col).size().reset_index(name='Count')
+        result = grouped[['rows']].rename(columns={'rows': 'Count'})
         result['Percent'] = (result['Count'] / result['Count'].sum() * 100).round(1)
-        result = result.set_index(by_col)
 
     return result
 
-def disaggregate_intersectional(df: pd.DataFrame, cols: list, metric_col: str = None) -> pd.DataFrame:
-    """Disaggregate by intersection of multiple columns."""
-    if metric_col and metric_col in df.columns:
-        result = df.groupby(cols).agg({
-            metric_col: ['count', 'mean', 'std']
-        }).round(2)
-        result.columns = ['Count', 'Mean', 'Std Dev']
+def intersectional_from_stats(stats: pd.DataFrame, cols: list, metric_col: str = None) -> pd.DataFrame:
+    """Count, mean and spread per combination of several columns, from partial aggregates."""
+    grouped = rollup(stats, cols)
+    if metric_col:
+        result = pd.concat([
+            pd.DataFrame({
+                'Count': grouped['count'],
+                'Mean': stats_mean(grouped),
+                'Std Dev': stats_std(grouped),
+            }),
+            quantile_columns(grouped),
+        ], axis=1).round(2)
     else:
-        result = df.groupby(cols).size().reset_index(name='Count')
+        result = grouped[['rows']].rename(columns={'rows': 'Count'}).reset_index()
         result['Percent'] = (result['Count'] / result['Count'].sum() * 100).round(1)
+        # Show key columns as plain values, as an ungrouped frame would
+        for col in cols:
+            if isinstance(result[col].dtype, pd.CategoricalDtype):
+                result[col] = result[col].astype(result[col].cat.categories.dtype)
 
     return result
 
-def print_single_disaggregation(df: pd.DataFrame, col: str, result: pd.DataFrame, metric: str = None):
-    """Print single-variable disaggregation."""
+def combine_metrics(tables: dict) -> pd.DataFrame:
+    """Per-metric tables side by side under a metric column level (as-is for one metric)."""
+    if len(tables) == 1:
+        return next(iter(tables.values()))
+    return pd.concat(tables, axis=1)
+
+def metric_table(result: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """One metric's columns of a combine_metrics table."""
+    return result[metric] if isinstance(result.columns, pd.MultiIndex) else result
+
+def stream_cells(path: str, by_cols: list, metric_cols: list, chunksize: int,
+                 dtype: dict = None, quantiles: str = None) -> tuple:
+    """
+    Fold a CSV file chunk by chunk into finest-grain cell tables, one per
+    metric (keyed None when there is no metric).
+
+    Only one chunk (of the referenced columns) and the cell tables are held
+    in memory at a time. Returns the cell tables and the total record count.
+    """
+    cells = {}
+    total_records = 0
+    usecols = list(dict.fromkeys(by_cols + metric_cols))
+
+    for chunk in read_csv_chunks(path, chunksize, usecols=usecols, dtype=dtype):
+        total_records += len(chunk)
+        for metric in metric_cols or [None]:
+            part = group_stats(chunk, by_cols, metric, quantiles)
+            cells[metric] = merge_stats(cells[metric], part) if metric in cells else part
+
+    return cells, total_records
+
+def print_header(source: str, records: int):
+    """Print the report banner."""
+    print(f"\n{'#'*60}")
+    print(f"# DATA DISAGGREGATION REPORT")
+    print(f"# Source: {source}")
+    print(f"# Records: {records:,}")
+    print(f"{'#'*60}")
+
+def shown_rows(table: pd.DataFrame, display: dict) -> pd.DataFrame:
+    """The rows of a table to print under the `display` top K and page, noting any cut."""
+    shown, note = select_rows(table, display.get('top'), display.get('page'),
+                              display.get('page_size') or DEFAULT_PAGE_SIZE)
+    if note:
+        print(f"({note})")
+    return shown
+
+def show_table(table: pd.DataFrame, display: dict = None):
+    """Print one result table cut and rendered per the `display` settings."""
+    display = display or {}
+    print(render_table(shown_rows(table, display), display.get('format') or 'text'))
+
+def print_single_disaggregation(df: pd.DataFrame, col: str, result: pd.DataFrame, metrics: list = None,
+                                display: dict = None):
+    """Print single-variable disaggregation (one table per metric)."""
     print(f"\n{'='*60}")
     print(f"DISAGGREGATION BY: {col.upper()}")
     print(f"{'='*60}")
 
-    total = result['Count'].sum() if 'Count' in result.columns else len(df)
+    first = metric_table(result, metrics[0]) if metrics else result
+    total = first['Count'].sum() if 'Count' in first.columns else len(df)
     print(f"Total Records: {total:,}\n")
 
-    if metric:
-        print(f"Metric: {metric}\n")
-        print(result.to_string())
+    if metrics:
+        for i, metric in enumerate(metrics):
+            if i:
+                print()
+            print(f"Metric: {metric}\n")
+            show_table(metric_table(result, metric), display)
+    elif (display or {}).get('format') in (None, 'text'):
+        print(render_bars(shown_rows(result, display or {}), total))
     else:
-        for idx, row in result.iterrows():
-            pct = row.get('Percent', row['Count']/total*100)
-            bar = '#' * int(pct / 2)
-            print(f"  {idx:<30} {row['Count']:>6,} ({pct:>5.1f}%) {bar}")
+        show_table(result, display)
 
     print()
 
-def print_intersectional(result: pd.DataFrame, cols: list, metric: str = None):
-    """Print intersectional analysis."""
+def print_intersectional(result: pd.DataFrame, cols: list, metrics: list = None, display: dict = None):
+    """Print intersectional analysis (one table per metric)."""
     print(f"\n{'='*60}")
     print(f"INTERSECTIONAL ANALYSIS: {' x '.join([c.upper() for c in cols])}")
     print(f"{'='*60}\n")
 
-    if metric:
-        print(f"Metric: {metric}\n")
-
-    print(result.to_string())
+    for metric in metrics or [None]:
+        if metric:
+            print(f"Metric: {metric}\n")
+        show_table(metric_table(result, metric) if metric else result, display)
+        print()
+
+def gap_tests(stats: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """
+    Every group of `keys` against everyone else, from partial aggregates:
+    n, means, Cohen's d over the pooled standard deviation, and a
+    two-sided Welch test p-value (normal approximation, sound at the
+    minimum n the scan applies).
+    """
+    groups = rollup(stats, keys)
+    rest = complement_stats(groups, rollup(stats, []).iloc[0])
+    n, rest_n = groups['count'], rest['count']
+    mean, rest_mean = stats_mean(groups), stats_mean(rest)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled_sd = np.sqrt((groups['m2'] + rest['m2']) / (n + rest_n - 2))
+        effect_size = (mean - rest_mean) / pooled_sd
+        standard_error = np.sqrt(groups['m2'] / (n - 1) / n + rest['m2'] / (rest_n - 1) / rest_n)
+        z = ((mean - rest_mean) / standard_error).abs()
+    p_value = [math.erfc(value / math.sqrt(2)) if np.isfinite(value) else np.nan for value in z]
+
+    return pd.DataFrame({'n': n, 'mean': mean, 'rest_n': rest_n, 'rest_mean': rest_mean,
+                         'effect_size': effect_size, 'p_value': p_value}, index=groups.index)
+
+def fdr_qvalues(p_values: np.ndarray) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p-values (q-values) for one family of tests."""
+    p_values = np.asarray(p_values, dtype=float)
+    order = np.argsort(p_values)
+    ranked = p_values[order] * len(p_values) / np.arange(1, len(p_values) + 1)
+    q_values = np.empty_like(p_values)
+    q_values[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return q_values
+
+def scan_gaps(tables: dict, groupings: list, metrics: list, min_n: int = GAP_MIN_N,
+              effect_size: float = GAP_EFFECT_SIZE, fdr: float = GAP_FDR) -> tuple:
+    """
+    Test every group of every grouping (single columns and intersections)
+    and metric against the rest of the population, straight from the cube
+    tables.
+
+    Groups (or their complements) under `min_n` values are not tested.
+    The remaining tests form one family for false-discovery-rate control:
+    a gap is reported when its Benjamini-Hochberg q-value is at most `fdr`
+    and |effect size| is at least `effect_size`. Returns ({grouping: gaps
+    sorted by |effect size|}, scan summary).
+    """
+    tests = []
+    for keys in groupings:
+        for metric in metrics:
+            table = gap_tests(tables[metric][tuple(keys)], list(keys))
+            table['metric'] = metric
+            table['grouping'] = ' x '.join(keys)
+            table.index = [' / '.join(map(str, group)) if isinstance(group, tuple) else group
+                           for group in table.index]
+            tests.append(table)
+    tests = pd.concat(tests) if tests else pd.DataFrame(columns=['n', 'rest_n', 'p_value', 'grouping'])
+
+    tested = tests[(tests['n'] >= min_n) & (tests['rest_n'] >= min_n) & tests['p_value'].notna()].copy()
+    tested['q_value'] = fdr_qvalues(tested['p_value'].to_numpy())
+    found = tested[(tested['q_value'] <= fdr) & (tested['effect_size'].abs() >= effect_size)]
+
+    gaps = {' x '.join(keys): [] for keys in groupings}
+    # Group labels repeat across groupings and metrics, so sort by position
+    order = np.argsort(-found['effect_size'].abs().to_numpy(), kind='stable')
+    for group, row in found.iloc[order].iterrows():
+        gaps[row['grouping']].append({
+            'group': group,
+            'metric': row['metric'],
+            'n': int(row['n']),
+            'mean': round(row['mean'], 2),
+            'comparison_mean': round(row['rest_mean'], 2),
+            'difference': round(row['mean'] - row['rest_mean'], 2),
+            'effect_size': round(row['effect_size'], 2),
+            'p_value': float(row['p_value']),
+            'q_value': float(row['q_value']),
+            'direction': 'above' if row['mean'] > row['rest_mean'] else 'below'
+        })
+
+    summary = {'tests': len(tested), 'below_min_n': len(tests) - len(tested),
+               'gaps': len(found), 'min_n': min_n, 'fdr': fdr, 'effect_size': effect_size}
+    return gaps, summary
+
+def print_gaps(gaps: list, metrics: list):
+    """Print the gaps found for one table."""
+    if not gaps:
+        return
+    print(f"  SIGNIFICANT GAPS DETECTED:")
+    for gap in gaps:
+        direction = "+" if gap['direction'] == 'above' else ""
+        label = f"{gap['group']} ({gap['metric']})" if len(metrics) > 1 else gap['group']
+        print(f"    - {label}: {gap['mean']} vs {gap['comparison_mean']} for everyone else "
+              f"({direction}{gap['difference']}, effect size: {gap['effect_size']}, "
+              f"n={gap['n']:,}, q={gap['q_value']:.2g})")
     print()
 
-def identify_gaps(df: pd.DataFrame, by_col: str, metric_col: str) -> list:
-    """Identify significant gaps in outcomes."""
-    if metric_col not in df.columns:
-        return []
-
-    grouped = df.groupby(by_col)[metric_col].mean()
-    overall_mean = df[metric_col].mean()
-    overall_std = df[metric_col].std()
-
-    gaps = []
-    for group, mean in grouped.items():
-        diff = mean - overall_mean
-        if overall_std > 0:
-            effect_size = diff / overall_std
-            if abs(effect_size) > 0.5:  # Medium effect size threshold
-                gaps.append({
-                    'group': group,
-                    'mean': round(mean, 2),
-                    'overall_mean': round(overall_mean, 2),
-                    'difference': round(diff, 2),
-                    'effect_size': round(effect_size, 2),
-                    'direction': 'above' if diff > 0 else 'below'
-                })
-
-    return sorted(gaps, key=lambda x: abs(x['effect_size']), reverse=True)
-
-def main():
+def print_gap_summary(summary: dict):
+    """Print how many groups were tested and how many gaps survived FDR control."""
+    print(f"Gap scan: {summary['tests']:,} group tests, {summary['gaps']:,} gaps with |effect size| >= "
+          f"{summary['effect_size']} at {summary['fdr']:.0%} false discovery rate "
+          f"({summary['below_min_n']:,} groups under n={summary['min_n']} not tested)")
+
+def intersection_groups(by_cols: list) -> list:
+    """Every 2- and 3-way combination of the grouping columns."""
+    intersections = []
+    for r in range(2, min(len(by_cols) + 1, 4)):  # Limit to 3-way intersections
+        intersections.extend(list(cols) for cols in combinations(by_cols, r))
+    return intersections
+
+def report_tables(tables: dict, by_cols: list, intersections: list, metrics: list,
+                  gaps: bool = False, df: pd.DataFrame = None, gap_settings: dict = None,
+                  display: dict = None) -> dict:
+    """
+    Print the single-column and intersectional tables (and gaps) from the
+    cube tables of each metric; returns them as the report results.
+    `gap_settings` overrides the scan_gaps thresholds; `display` sets the
+    table format, top K and page (see show_table).
+    """
+    # Gap analysis: every group of every table is one test in a single FDR family
+    all_gaps, gap_summary = {}, None
+    if gaps and metrics:
+        groupings = [[col] for col in by_cols] + [list(cols) for cols in intersections]
+        all_gaps, gap_summary = scan_gaps(tables, groupings, metrics, **(gap_settings or {}))
+        timings.lap('gaps')
+
+    # Single-variable disaggregation
+    all_results = {}
+    for col in by_cols:
+        result = combine_metrics({metric: single_from_stats(tables[metric][(col,)], col, metric)
+                                  for metric in tables})
+        all_results[col] = result
+        print_single_disaggregation(df, col, result, metrics, display)
+        print_gaps(all_gaps.get(col), metrics)
+        timings.lap('render')
+
+    # Intersectional analysis
+    intersection_results = {}
+    for cols in intersections:
+        result = combine_metrics({metric: intersectional_from_stats(tables[metric][tuple(cols)], cols, metric)
+                                  for metric in tables})
+        intersection_results[' x '.join(cols)] = result
+        print_intersectional(result, cols, metrics, display)
+        print_gaps(all_gaps.get(' x '.join(cols)), metrics)
+
+    if gap_summary:
+        print_gap_summary(gap_summary)
+
+    # Summary
+    print(f"\n{'='*60}")
+    print("EQUITY ANALYSIS NOTES:")
+    print("="*60)
+    print("- Compare outcome rates across groups, not just raw counts")
+    print("- Consider systemic factors when interpreting gaps")
+    print("- Use intersectional analysis to reveal hidden disparities")
+    print("- Pair quantitative data with qualitative (street data)")
+    print("="*60 + "\n")
+    timings.lap('render')
+
+    return {'single': all_results, 'intersections': intersection_results, 'gaps': all_gaps,
+            'gap_scan': gap_summary}
+
+def sample_from_estimates(estimates: pd.DataFrame, metric_col: str = None) -> pd.DataFrame:
+    """A disaggregation table from sample estimates, with margins of error."""
+    if metric_col:
+        return pd.DataFrame({
+            'Count': estimates['count'].round().astype(np.int64),
+            '± Count': estimates['count_margin'],
+            'Mean': estimates['mean'],
+            '± Mean': estimates['mean_margin'],
+            'Sampled': estimates['sampled'],
+        }).round(2)
+    # Rows per group are counted exactly during the sampling pass
+    result = estimates[['rows']].rename(columns={'rows': 'Count'})
+    result['Percent'] = (result['Count'] / result['Count'].sum() * 100).round(1)
+    return result
+
+def print_sample_banner(sampled: int, records: int):
+    """Flag a report as approximate and say how to confirm it."""
+    print(f"# APPROXIMATE: stratified sample of {sampled:,} of {records:,} records")
+    print(f"# Counts and percents of rows are exact; '±' columns are {SAMPLE_LEVEL:.0%} margins of error")
+    print(f"# Confirm in exact mode: rerun without --sample (add --chunksize for large files)")
+    print(f"{'#'*60}")
+
+def report_sample(rows: pd.DataFrame, sizes: pd.Series, source: str, by_cols: list, intersections: list,
+                  metrics: list, display: dict = None) -> dict:
+    """
+    Print approximate single-column and intersectional tables from a
+    stratified sample whose strata are the --by combinations (see
+    sampling.stratified_sample).
+    """
+    strata = {metric: stratum_table(rows, sizes, by_cols, metric) for metric in metrics or [None]}
+    timings.lap('group')
+
+    print_header(source, int(sizes.sum()))
+    print_sample_banner(len(rows), int(sizes.sum()))
+
+    def table(keys: list) -> pd.DataFrame:
+        return combine_metrics({metric: sample_from_estimates(estimate_groups(cells, keys), metric)
+                                for metric, cells in strata.items()})
+
+    all_results = {}
+    for col in by_cols:
+        all_results[col] = table([col])
+        print_single_disaggregation(None, col, all_results[col], metrics, display)
+    intersection_results = {}
+    for cols in intersections:
+        intersection_results[' x '.join(cols)] = table(list(cols))
+        print_intersectional(intersection_results[' x '.join(cols)], cols, metrics, display)
+    timings.lap('render')
+
+    return {'single': all_results, 'intersections': intersection_results, 'gaps': {},
+            'sampled': len(rows)}
+
+def save_results(all_results: dict, output: str, intersections: dict = None, metrics: list = None):
+    """
+    Save the single-column and intersectional tables: long format for
+    .parquet and .jsonl, one sheet each for .xlsx, CSV sections otherwise.
+    """
+    if output.endswith(tuple(EXPORT_FORMATS)):
+        export_results(all_results, intersections, output, metrics[0] if metrics and len(metrics) == 1 else None)
+        return
+    with open(output, 'w') as f:
+        for name, result in list(all_results.items()) + list((intersections or {}).items()):
+            f.write(f"\n=== {name} ===\n")
+            f.write(result.to_csv())
+
+def main(argv: list = None):
     parser = argparse.ArgumentParser(
         description='Disaggregate data by demographic categories',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -118,91 +419,204 @@ Examples:
 
   Full analysis with output:
     python disaggregate.py --data students.csv --by "race,gender,ell,sped" --metric math_score --intersect --output results.csv
+
+  Several metrics with medians and percentiles (approximate sketches, or exact):
+    python disaggregate.py --data students.csv --by "race,ell" --metric "gpa,attendance_rate" --quantiles sketch
+    python disaggregate.py --data students.csv --by "race,ell" --metric gpa --quantiles exact
+
+  Thousands of groups: top 25 schools as Markdown, every table saved in long format:
+    python disaggregate.py --data students.csv --by "school,race" --metric gpa --intersect --top 25 \\
+        --format markdown --output results.parquet
+
+  Quick approximate preview of a 10M-row file (confirm by rerunning without --sample):
+    python disaggregate.py --data big.csv --by "race,gender,ell" --metric gpa --intersect --sample 100k
+
+  Streaming a file larger than memory:
+    python disaggregate.py --data incidents.csv --by "race,gender" --metric days --gaps --chunksize 500000
+
+  Aggregating inside a SQLite database (only group totals are read):
+    python disaggregate.py --sqlite sis.db --table students --by "race,gender" --metric gpa --intersect
+    python disaggregate.py --sqlite sis.db --query "SELECT * FROM students WHERE grade >= 9" --by race --metric gpa
         """
     )
-    parser.add_argument('--data', required=True, help='Path to CSV file')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', help='Path to CSV file')
+    source.add_argument('--sqlite', metavar='DB', help='SQLite database to aggregate in place (with --table or --query)')
+    parser.add_argument('--table', help='Table to read from --sqlite')
+    parser.add_argument('--query', help='SELECT query to read from --sqlite')
     parser.add_argument('--by', required=True, help='Comma-separated columns to disaggregate by')
-    parser.add_argument('--metric', help='Metric column to analyze (optional)')
+    parser.add_argument('--metric', help='Comma-separated metric columns to analyze (optional)')
+    parser.add_argument('--quantiles', choices=['sketch', 'exact', 'off'], default='off',
+                        help='Median and P10-P90 per group: mergeable KLL sketches (within about '
+                             '1%% of rank; exact for groups under 200 values), exact (keeps every '
+                             'value in memory), or off (default). Either one reads every metric '
+                             'value, so with --sqlite it streams every row out of the database')
     parser.add_argument('--intersect', action='store_true', help='Include intersectional analysis')
-    parser.add_argument('--gaps', action='store_true', help='Identify significant outcome gaps')
-    parser.add_argument('--output', help='Output file path (optional)')
-
-    args = parser.parse_args()
-
-    # Load data
-    try:
-        df = pd.read_csv(args.data)
-        print(f"\n{'#'*60}")
-        print(f"# DATA DISAGGREGATION REPORT")
-        print(f"# Source: {args.data}")
-        print(f"# Records: {len(df):,}")
-        print(f"{'#'*60}")
-    except FileNotFoundError:
-        print(f"Error: File '{args.data}' not found")
-        sys.exit(1)
-    except Exception as e:
-        print(f"Error reading file: {e}")
-        sys.exit(1)
+    parser.add_argument('--gaps', action='store_true',
+                        help='Identify significant outcome gaps in every single and intersectional table')
+    parser.add_argument('--gap-effect', type=float, default=GAP_EFFECT_SIZE,
+                        help=f'Smallest |effect size| (Cohen\'s d vs everyone else) reported as a gap '
+                             f'(default {GAP_EFFECT_SIZE})')
+    parser.add_argument('--gap-min-n', type=int, default=GAP_MIN_N,
+                        help=f'Groups with fewer metric values are not tested (default {GAP_MIN_N})')
+    parser.add_argument('--fdr', type=float, default=GAP_FDR,
+                        help=f'False discovery rate across all gap tests (default {GAP_FDR})')
+    parser.add_argument('--output',
+                        help='Output file path (optional): .parquet or .jsonl (long format, every table), '
+                             '.xlsx (one sheet per table, constant memory) or CSV sections')
+    parser.add_argument('--format', choices=RENDER_FORMATS, default='text',
+                        help='Printed table format (default text)')
+    parser.add_argument('--top', type=int, help='Print only the K largest groups of each table')
+    parser.add_argument('--page', type=int, help='Print only this page (1-based) of each table')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f'Rows per --page (default {DEFAULT_PAGE_SIZE})')
+    parser.add_argument('--chunksize', type=int,
+                        help='Stream the CSV in chunks of this many rows to bound memory use')
+    parser.add_argument('--sample', metavar='FRACTION|N',
+                        help='Approximate preview from a stratified sample of this fraction of the rows '
+                             'or this many rows (e.g. 0.01 or 50k), with margins of error')
+    parser.add_argument('--seed', type=int, help='Random seed for a reproducible --sample')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse the CSV directly without the on-disk parse cache')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='Re-parse the CSV and replace its parse cache entry')
+    parser.add_argument('--timings', metavar='FILE',
+                        help='Write per-phase timings and peak memory to FILE as JSON')
+    parser.add_argument('--schema', help='JSON file mapping columns to dtypes (skips type inference)')
+
+    args = parser.parse_args(argv)
+    if args.timings:
+        timings.start(args.timings)
+
+    if args.sqlite:
+        if bool(args.table) == bool(args.query):
+            parser.error('--sqlite requires exactly one of --table or --query')
+        if args.chunksize:
+            parser.error('--chunksize applies to CSV input only')
+    elif args.table or args.query:
+        parser.error('--table and --query require --sqlite')
+    if args.sample:
+        if args.sqlite or args.gaps:
+            parser.error('--sample applies to CSV input without --gaps')
+        try:
+            sample = parse_sample(args.sample)
+        except ValueError as e:
+            parser.error(str(e))
+    if any(value is not None and value < 1 for value in (args.top, args.page, args.page_size)):
+        parser.error('--top, --page and --page-size must be at least 1')
+
+    # Read the header only; just the referenced columns are loaded below
+    if args.sqlite:
+        if not os.path.exists(args.sqlite):
+            print(f"Error: Database '{args.sqlite}' not found")
+            sys.exit(1)
+        source_sql = table_source(args.table, args.query)
+        source_name = f"{args.sqlite} ({args.table or 'query'})"
+        try:
+            columns = sqlite_columns(args.sqlite, source_sql)
+        except Exception as e:
+            print(f"Error reading database: {e}")
+            sys.exit(1)
+    else:
+        source_name = args.data
+        try:
+            columns = read_columns(args.data)
+        except FileNotFoundError:
+            print(f"Error: File '{args.data}' not found")
+            sys.exit(1)
+        except Exception as e:
+            print(f"Error reading file: {e}")
+            sys.exit(1)
+
+    schema = None
+    if args.schema:
+        try:
+            schema = read_schema(args.schema)
+        except (OSError, ValueError) as e:
+            print(f"Error reading schema: {e}")
+            sys.exit(1)
 
     # Parse columns
-    by_cols = [col.strip() for col in args.by.split(',')]
+    by_cols = list(dict.fromkeys(col.strip() for col in args.by.split(',')))
 
     # Validate columns
-    missing = [col for col in by_cols if col not in df.columns]
+    missing = [col for col in by_cols if col not in columns]
     if missing:
         print(f"Error: Columns not found: {', '.join(missing)}")
-        print(f"Available columns: {', '.join(df.columns)}")
+        print(f"Available columns: {', '.join(columns)}")
         sys.exit(1)
 
-    if args.metric and args.metric not in df.columns:
-        print(f"Warning: Metric column '{args.metric}' not found, proceeding without metric")
-        args.metric = None
-
-    # Single-variable disaggregation
-    all_results = {}
-    for col in by_cols:
-        result = disaggregate_single(df, col, args.metric)
-        all_results[col] = result
-        print_single_disaggregation(df, col, result, args.metric)
-
-        # Gap analysis
-        if args.gaps and args.metric:
-            gaps = identify_gaps(df, col, args.metric)
-            if gaps:
-                print(f"  SIGNIFICANT GAPS DETECTED:")
-                for gap in gaps:
-                    direction = "+" if gap['direction'] == 'above' else ""
-                    print(f"    - {gap['group']}: {gap['mean']} ({direction}{gap['difference']}, "
-                          f"effect size: {gap['effect_size']})")
-                print()
+    metrics = []
+    for metric in dict.fromkeys(col.strip() for col in (args.metric or '').split(',') if col.strip()):
+        if metric in columns:
+            metrics.append(metric)
+        else:
+            print(f"Warning: Metric column '{metric}' not found, proceeding without it")
+    quantiles = None if args.quantiles == 'off' else args.quantiles
+
+    intersections = intersection_groups(by_cols) if args.intersect else []
+    display = {'format': args.format, 'top': args.top, 'page': args.page, 'page_size': args.page_size}
+
+    if args.sample:
+        try:
+            rows, sizes = stratified_sample(args.data, by_cols, metrics, sample, args.chunksize, schema, args.seed,
+                                            use_cache=not args.no_cache, rebuild=args.rebuild_cache)
+        except Exception as e:
+            print(f"Error reading file: {e}")
+            sys.exit(1)
+        timings.lap('load')
+        results = report_sample(rows, sizes, source_name, by_cols, intersections, metrics, display)
+        if args.output:
+            save_results(results['single'], args.output, results['intersections'], metrics)
+            print(f"Results saved to: {args.output}")
+        return results
+
+    # Build the finest-grain cell table once (streaming folds it chunk by chunk)
+    df = None
+    try:
+        if args.sqlite:
+            cells = {}
+            for metric in metrics or [None]:
+                cells[metric], records = sqlite_cells(args.sqlite, source_sql, by_cols, metric)
+            if metrics and quantiles:
+                sketches = sqlite_sketches(args.sqlite, source_sql, by_cols, metrics, quantiles)
+                for metric in metrics:
+                    cells[metric]['sketch'] = sketches[metric].reindex(cells[metric].index)
+        elif args.chunksize:
+            cells, records = stream_cells(args.data, by_cols, metrics, args.chunksize, schema, quantiles)
+        else:
+            df = load_csv(args.data, columns=list(dict.fromkeys(by_cols + metrics)),
+                          categorical=[col for col in by_cols if col not in metrics],
+                          schema=schema, use_cache=not args.no_cache, rebuild=args.rebuild_cache)
+            records = len(df)
+            timings.lap('load')
+            cells = {metric: group_stats(df, by_cols, metric, quantiles) for metric in metrics or [None]}
+    except Exception as e:
+        print(f"Error reading {'database' if args.sqlite else 'file'}: {e}")
+        sys.exit(1)
+    timings.lap('group' if df is not None else 'load')
+    print_header(source_name, records)
 
-    # Intersectional analysis
-    if args.intersect and len(by_cols) >= 2:
-        for r in range(2, min(len(by_cols) + 1, 4)):  # Limit to 3-way intersections
-            for cols in combinations(by_cols, r):
-                result = disaggregate_intersectional(df, list(cols), args.metric)
-                print_intersectional(result, list(cols), args.metric)
+    # Every single-column and intersectional table is a roll-up of the cells
+    groupings = [(col,) for col in by_cols] + [tuple(cols) for cols in intersections]
+    tables = {metric: cube(table, groupings) for metric, table in cells.items()}
+    timings.lap('group')
 
-    # Summary
-    print(f"\n{'='*60}")
-    print("EQUITY ANALYSIS NOTES:")
-    print("="*60)
-    print("- Compare outcome rates across groups, not just raw counts")
-    print("- Consider systemic factors when interpreting gaps")
-    print("- Use intersectional analysis to reveal hidden disparities")
-    print("- Pair quantitative data with qualitative (street data)")
-    print("="*60 + "\n")
+    results = report_tables(tables, by_cols, intersections, metrics, args.gaps, df,
+                            {'min_n': args.gap_min_n, 'effect_size': args.gap_effect, 'fdr': args.fdr},
+                            display)
 
     # Save if output specified
     if args.output:
-        with pd.ExcelWriter(args.output) if args.output.endswith('.xlsx') else open(args.output, 'w') as f:
-            for col, result in all_results.items():
-                if args.output.endswith('.xlsx'):
-                    result.to_excel(f, sheet_name=col[:31])
-                else:
-                    f.write(f"\n=== {col} ===\n")
-                    f.write(result.to_csv())
+        try:
+            save_results(results['single'], args.output, results['intersections'], metrics)
+        except (ImportError, RuntimeError, ValueError) as e:
+            print(f"Error saving results: {e}")
+            sys.exit(1)
         print(f"Results saved to: {args.output}")
+        timings.lap('output')
+
+    return results
 
 if __name__ == "__main__":
     main()
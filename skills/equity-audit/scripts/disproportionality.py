@@ -8,14 +8,134 @@ Usage:
 
 Example:
     python disproportionality.py --data discipline.csv --group race_ethnicity --outcome suspended
+    python disproportionality.py --data incidents.csv --group race_ethnicity --outcome suspended --chunksize 500000
+    python disproportionality.py --data district.csv --by-site school --group race_ethnicity --outcome suspended
+    python disproportionality.py --data-dir schools/ --group race_ethnicity --outcome suspended --workers 8
+    python disproportionality.py --data discipline.csv --group race_ethnicity --outcome suspended --ci --permutation
+    python disproportionality.py --data incidents.csv --group race_ethnicity --outcome suspended --sample 0.01
+    python disproportionality.py --sqlite sis.db --table discipline --group race_ethnicity --outcome suspended
+    python disproportionality.py --data discipline.csv --group race_ethnicity --outcome suspended,expelled,days_suspended \
+        --count-outcomes days_suspended
+    python disproportionality.py --data roster.csv --incidents incidents.csv --student-key student_id \
+        --incident-type action --group race_ethnicity --outcome OSS,Expulsion
 """
 
 import argparse
+import glob
+import os
+import numpy as np
 import pandas as pd
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from typing import Dict
 
-def calculate_risk_ratios(df: pd.DataFrame, group_col: str, outcome_col: str) -> Dict[str, dict]:
+from aggregates import read_columns, read_csv_chunks
+from incident_join import DEFAULT_CHUNKSIZE, join_incidents, read_roster
+from parse_cache import load_csv, read_schema
+from resampling import bootstrap_intervals, permutation_pvalues
+from sampling import SAMPLE_LEVEL, estimate_risk_ratios, parse_sample, stratified_sample, stratum_table
+from sqlite_source import sqlite_columns, sqlite_counts, sqlite_outcome_matrix, table_source
+import timings
+
+# Default bootstrap settings for --ci
+DEFAULT_RESAMPLES = 2000
+DEFAULT_CI_LEVEL = 0.95
+
+def outcome_indicator(df: pd.DataFrame, outcome_col: str) -> pd.Series:
+    """Boolean outcomes count True values; anything else counts rows equal to 1."""
+    if df[outcome_col].dtype == bool:
+        return df[outcome_col]
+    return df[outcome_col] == 1
+
+def count_outcomes(df: pd.DataFrame, group_col, outcome_col: str) -> pd.DataFrame:
+    """
+    Count population and outcome rows for every group in one grouped pass.
+
+    `group_col` may be a list of columns (e.g. site and group) to count every
+    combination at once. Groups come back in first-appearance order; rows
+    with a missing group are skipped.
+    """
+    has_outcome = outcome_indicator(df, outcome_col)
+    keys = [df[col] for col in group_col] if isinstance(group_col, list) else df[group_col]
+    counts = has_outcome.groupby(keys, sort=False, observed=True).agg(['size', 'sum'])
+    counts.columns = ['population_n', 'outcome_n']
+    return counts
+
+def risk_ratios_from_counts(counts: pd.DataFrame, total_population: int,
+                            total_with_outcome: int, ci: dict = None) -> Dict[str, dict]:
+    """
+    Build the risk-ratio results dict from per-group counts.
+
+    `counts` is indexed by group with `population_n` and `outcome_n` columns.
+    The totals include rows whose group is missing, matching the population
+    the percentages are taken against.
+
+    With `ci` (level, resamples, permutation, seed), each group also gets
+    bootstrap `ci_low`/`ci_high` and, if requested, a permutation `p_value`.
+    """
+    population = counts['population_n'].to_numpy(dtype=np.int64)
+    with_outcome = counts['outcome_n'].to_numpy(dtype=np.int64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Percentage of group in population
+        if total_population > 0:
+            pop_pct = (population / total_population) * 100
+        else:
+            pop_pct = np.zeros(len(counts))
+
+        # Percentage of group in outcome
+        if total_with_outcome > 0:
+            outcome_pct = (with_outcome / total_with_outcome) * 100
+        else:
+            outcome_pct = np.zeros(len(counts))
+
+        # Risk ratio
+        risk_ratio = np.where(pop_pct > 0, outcome_pct / pop_pct, 0.0)
+
+        # Composition index (alternative measure)
+        outcome_rate = np.where(population > 0, (with_outcome / population) * 100, 0.0)
+
+    pop_pct = np.round(pop_pct, 1)
+    outcome_pct = np.round(outcome_pct, 1)
+    outcome_rate = np.round(outcome_rate, 1)
+    risk_ratio = np.round(risk_ratio, 2)
+
+    results = {}
+    for i, group in enumerate(counts.index):
+        results[str(group)] = {
+            'population_n': int(population[i]),
+            'population_pct': float(pop_pct[i]),
+            'outcome_n': int(with_outcome[i]),
+            'outcome_pct': float(outcome_pct[i]),
+            'outcome_rate': float(outcome_rate[i]),
+            'risk_ratio': float(risk_ratio[i])
+        }
+
+    if ci:
+        add_intervals(results, population, with_outcome, total_population, total_with_outcome, ci)
+
+    return results
+
+def add_intervals(results: Dict[str, dict], population: np.ndarray, with_outcome: np.ndarray,
+                  total_population: int, total_with_outcome: int, ci: dict):
+    """Attach bootstrap intervals (and permutation p-values) to results in place."""
+    low, high = bootstrap_intervals(population, with_outcome, total_population, total_with_outcome,
+                                    resamples=ci['resamples'], level=ci['level'], seed=ci.get('seed'))
+    p_values = None
+    if ci.get('permutation'):
+        p_values = permutation_pvalues(population, with_outcome, total_population,
+                                       total_with_outcome, resamples=ci['resamples'],
+                                       seed=ci.get('seed'))
+
+    for i, data in enumerate(results.values()):
+        data['ci_low'] = round(float(low[i]), 2)
+        data['ci_high'] = round(float(high[i]), 2)
+        if p_values is not None:
+            data['p_value'] = round(float(p_values[i]), 4)
+
+def calculate_risk_ratios(df: pd.DataFrame, group_col: str, outcome_col: str,
+                          ci: dict = None) -> Dict[str, dict]:
     """
     Calculate risk ratios for each group.
 
@@ -26,60 +146,305 @@ def calculate_risk_ratios(df: pd.DataFrame, group_col: str, outcome_col: str) ->
     - Ratio > 1.0: Overrepresentation
     - Ratio < 1.0: Underrepresentation
     """
-    results = {}
+    counts = count_outcomes(df, group_col, outcome_col)
+    total_with_outcome = int(outcome_indicator(df, outcome_col).sum())
 
-    total_population = len(df)
+    return risk_ratios_from_counts(counts, len(df), total_with_outcome, ci)
 
-    # Handle boolean or numeric outcome column
-    if df[outcome_col].dtype == bool:
-        total_with_outcome = df[outcome_col].sum()
-    else:
-        total_with_outcome = len(df[df[outcome_col] == 1])
+def stream_counts(path: str, group_col: str, outcome_col: str, chunksize: int,
+                  dtype: dict = None) -> tuple:
+    """
+    Fold a CSV file chunk by chunk into per-group counts and file totals.
 
-    for group in df[group_col].unique():
-        if pd.isna(group):
-            continue
+    Only one chunk (of the two referenced columns) and the per-group counts
+    are held in memory at a time.
+    Returns (counts, total_population, total_with_outcome).
+    """
+    counts = pd.DataFrame({'population_n': [], 'outcome_n': []}, dtype='int64')
+    total_population = 0
+    total_with_outcome = 0
 
-        group_mask = df[group_col] == group
-        group_population = group_mask.sum()
+    usecols = list(dict.fromkeys([group_col, outcome_col]))
+    for chunk in read_csv_chunks(path, chunksize, usecols=usecols, dtype=dtype):
+        part = count_outcomes(chunk, group_col, outcome_col)
+        # Keep first-appearance group order across chunks
+        counts = pd.concat([counts, part]).groupby(level=0, sort=False).sum()
+        total_population += len(chunk)
+        total_with_outcome += int(outcome_indicator(chunk, outcome_col).sum())
 
-        if df[outcome_col].dtype == bool:
-            group_with_outcome = df[group_mask & df[outcome_col]].shape[0]
-        else:
-            group_with_outcome = df[group_mask & (df[outcome_col] == 1)].shape[0]
+    return counts, total_population, total_with_outcome
 
-        # Percentage of group in population
-        pop_pct = (group_population / total_population) * 100 if total_population > 0 else 0
+def outcome_values(df: pd.DataFrame, outcome_col: str, count: bool = False) -> pd.Series:
+    """
+    Numeric outcome values for the matrix mode.
 
-        # Percentage of group in outcome
-        if total_with_outcome > 0:
-            outcome_pct = (group_with_outcome / total_with_outcome) * 100
-        else:
-            outcome_pct = 0
+    Outcomes count students exactly as in the single-outcome mode (True
+    or 1; other codes do not count). Only an outcome marked as a count
+    (e.g. days suspended) is summed, so its share is a share of all days.
+    """
+    if not count:
+        return outcome_indicator(df, outcome_col).astype('int64')
+    column = df[outcome_col]
+    if pd.api.types.is_bool_dtype(column):
+        return column.astype('int64')
+    return pd.to_numeric(column, errors='coerce').fillna(0)
+
+def count_outcome_matrix(df: pd.DataFrame, group_col: str, outcome_cols: list, count_cols: list = ()) -> tuple:
+    """
+    Population and outcome totals per group for several outcomes in one pass.
 
-        # Risk ratio
-        if pop_pct > 0:
-            risk_ratio = outcome_pct / pop_pct
-        else:
-            risk_ratio = 0
+    Outcomes in `count_cols` are summed (see outcome_values). Returns
+    (counts, totals): counts is indexed by group with population_n and one
+    column per outcome; totals holds the same sums over every row
+    (including rows with a missing group).
+    """
+    matrix = pd.DataFrame({col: outcome_values(df, col, col in count_cols) for col in outcome_cols})
+    grouped = matrix.groupby(df[group_col], sort=False, observed=True)
+    counts = grouped.sum()
+    counts.insert(0, 'population_n', grouped.size())
+    return counts, pd.concat([pd.Series({'population_n': len(df)}), matrix.sum()])
+
+def stream_outcome_matrix(path: str, group_col: str, outcome_cols: list, chunksize: int,
+                          dtype: dict = None, count_cols: list = ()) -> tuple:
+    """Fold a CSV chunk by chunk into count_outcome_matrix results."""
+    counts, totals = None, None
+    usecols = list(dict.fromkeys([group_col] + outcome_cols))
+    for chunk in read_csv_chunks(path, chunksize, usecols=usecols, dtype=dtype):
+        part, part_totals = count_outcome_matrix(chunk, group_col, outcome_cols, count_cols)
+        if counts is None:
+            counts, totals = part, part_totals
+            continue
+        # Keep first-appearance group order across chunks
+        counts = pd.concat([counts, part]).groupby(level=0, sort=False).sum()
+        totals = totals + part_totals
+    return counts, totals
 
-        # Composition index (alternative measure)
-        if group_population > 0:
-            group_outcome_rate = (group_with_outcome / group_population) * 100
-        else:
-            group_outcome_rate = 0
+def matrix_risk_ratios(counts: pd.DataFrame, totals: pd.Series, outcome_cols: list,
+                       count_cols: list = ()) -> Dict[str, Dict[str, dict]]:
+    """
+    Risk ratios for every outcome: {outcome: {group: result dict}}.
 
+    Each result also records whether the outcome counts students
+    ('binary') or sums a count such as days ('count', the outcomes in
+    `count_cols`); for counts the outcome_rate is the average per student
+    instead of a percentage.
+    """
+    results = {}
+    for col in outcome_cols:
+        outcome_counts = pd.DataFrame({'population_n': counts['population_n'], 'outcome_n': counts[col]})
+        kind = 'count' if col in count_cols else 'binary'
+        results[col] = risk_ratios_from_counts(
+            outcome_counts, int(totals['population_n']), int(totals[col]))
+        for data in results[col].values():
+            data['kind'] = kind
+            if kind == 'count':
+                # Per-student average (e.g. days per student) rather than a percentage
+                data['outcome_rate'] = round(data['outcome_n'] / data['population_n'], 2) if data['population_n'] else 0.0
+    return results
+
+def sample_risk_ratios(path: str, group_col: str, outcome_col: str, sample, chunksize: int = None,
+                       dtype: dict = None, seed: int = None, use_cache: bool = True,
+                       rebuild: bool = False) -> tuple:
+    """
+    Approximate risk ratios from a stratified sample with one stratum per
+    group (see sampling.py); population counts stay exact.
+
+    Returns (results with `ci_low`/`ci_high` margins and `sampled_n`,
+    total population, rows sampled).
+    """
+    rows, sizes = stratified_sample(path, [group_col], [outcome_col], sample, chunksize, dtype, seed,
+                                    use_cache, rebuild)
+    estimates = estimate_risk_ratios(stratum_table(rows, sizes, [group_col],
+                                                   values=outcome_indicator(rows, outcome_col)))
+    total_population = int(estimates['population_n'].sum())
+    total_with_outcome = estimates['outcome_n'].sum()
+    estimates = estimates[estimates.index.notna()]
+
+    results = {}
+    for group, data in estimates.iterrows():
         results[str(group)] = {
-            'population_n': int(group_population),
-            'population_pct': round(pop_pct, 1),
-            'outcome_n': int(group_with_outcome),
-            'outcome_pct': round(outcome_pct, 1),
-            'outcome_rate': round(group_outcome_rate, 1),
-            'risk_ratio': round(risk_ratio, 2)
+            'population_n': int(data['population_n']),
+            'population_pct': round(data['population_n'] / total_population * 100, 1),
+            'outcome_n': int(round(data['outcome_n'])),
+            'outcome_pct': round(data['outcome_n'] / total_with_outcome * 100, 1) if total_with_outcome else 0.0,
+            'outcome_rate': round(data['outcome_rate'] * 100, 1),
+            'risk_ratio': round(data['risk_ratio'], 2),
+            'ci_low': round(data['ci_low'], 2),
+            'ci_high': round(data['ci_high'], 2),
+            'sampled_n': int(data['sampled_n']),
         }
+    return results, total_population, len(rows)
+
+def risk_ratio_table(results: Dict[str, dict], group_col: str) -> pd.DataFrame:
+    """One row per group of single-outcome results."""
+    table = pd.DataFrame(results).T
+    table.index.name = group_col
+    return table
+
+def matrix_table(results: Dict[str, Dict[str, dict]], group_col: str) -> pd.DataFrame:
+    """Flatten matrix results into one long table (one row per group and outcome)."""
+    rows = [{group_col: group, 'outcome': outcome, **data}
+            for outcome, groups in results.items() for group, data in groups.items()]
+    return pd.DataFrame(rows)
+
+def site_risk_ratios(df: pd.DataFrame, site_col: str, group_col: str,
+                     outcome_col: str, ci: dict = None) -> Dict[str, Dict[str, dict]]:
+    """
+    Calculate risk ratios within every site from one grouped pass.
+
+    Each site is compared against its own population, exactly as if
+    calculate_risk_ratios were run on that site's rows alone.
+    """
+    counts = count_outcomes(df, [site_col, group_col], outcome_col)
+    totals = count_outcomes(df, site_col, outcome_col)
+    return site_results_from_counts(counts, totals, ci)
+
+def site_results_from_counts(counts: pd.DataFrame, totals: pd.DataFrame,
+                             ci: dict = None) -> Dict[str, Dict[str, dict]]:
+    """
+    Per-site risk ratios from (site, group) counts and per-site totals.
+
+    Site totals include rows whose group is missing.
+    """
+    results = {}
+    for site, site_counts in counts.groupby(level=0, sort=False, observed=True):
+        total = totals.loc[site]
+        results[str(site)] = risk_ratios_from_counts(
+            site_counts.droplevel(0), int(total['population_n']), int(total['outcome_n']), ci)
 
     return results
 
+def file_risk_ratios(task: tuple) -> tuple:
+    """
+    Process-pool worker: risk ratios for one per-site CSV file.
+
+    Returns (site, results, records, error); the site is the file name
+    without its extension.
+    """
+    path, group_col, outcome_col, schema, use_cache, rebuild, ci = task
+    site = Path(path).stem
+    try:
+        columns = read_columns(path)
+        missing = [col for col in (group_col, outcome_col) if col not in columns]
+        if missing:
+            return site, None, 0, f"columns not found: {', '.join(missing)}"
+        df = load_csv(path, columns=list(dict.fromkeys([group_col, outcome_col])),
+                      categorical=[group_col] if group_col != outcome_col else [],
+                      outcomes=[outcome_col], schema=schema,
+                      use_cache=use_cache, rebuild=rebuild)
+        return site, calculate_risk_ratios(df, group_col, outcome_col, ci), len(df), None
+    except Exception as e:
+        return site, None, 0, str(e)
+
+def data_dir_risk_ratios(data_dir: str, group_col: str, outcome_col: str, workers: int,
+                         schema: dict = None, use_cache: bool = True,
+                         rebuild: bool = False, ci: dict = None) -> tuple:
+    """
+    Run the analysis for every CSV file in a directory, fanned out across processes.
+
+    Returns (site results, total records, {site: error}).
+    """
+    paths = sorted(glob.glob(os.path.join(data_dir, '*.csv')))
+    tasks = [(path, group_col, outcome_col, schema, use_cache, rebuild, ci) for path in paths]
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            outcomes = list(pool.map(file_risk_ratios, tasks))
+    else:
+        outcomes = [file_risk_ratios(task) for task in tasks]
+
+    results, errors, records = {}, {}, 0
+    for site, site_results, site_records, error in outcomes:
+        if error:
+            errors[site] = error
+        else:
+            results[site] = site_results
+            records += site_records
+
+    return results, records, errors
+
+def site_table(site_results: Dict[str, Dict[str, dict]]) -> pd.DataFrame:
+    """
+    Flatten per-site results into one long table.
+
+    Columns are site, group, n, outcome_n, risk_ratio and flag, plus
+    ci_low, ci_high and p_value when intervals were computed.
+    """
+    columns = ['site', 'group', 'n', 'outcome_n', 'risk_ratio', 'flag']
+    rows = []
+    for site, results in site_results.items():
+        for group, data in results.items():
+            row = {
+                'site': site,
+                'group': group,
+                'n': data['population_n'],
+                'outcome_n': data['outcome_n'],
+                'risk_ratio': data['risk_ratio'],
+                'flag': interpret_ratio(data['risk_ratio'])[1],
+            }
+            for key in ('ci_low', 'ci_high', 'p_value'):
+                if key in data:
+                    row[key] = data[key]
+                    if key not in columns:
+                        columns.append(key)
+            rows.append(row)
+    return pd.DataFrame(rows, columns=columns)
+
+def rank_sites(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rank sites with any group over the 2.0x threshold (most severe first).
+
+    When intervals are present a group only counts as over a threshold if
+    the lower bound of its interval is.
+    """
+    basis = 'ci_low' if 'ci_low' in table.columns else 'risk_ratio'
+    over = table[table[basis] > 2.0]
+    if over.empty:
+        return pd.DataFrame(columns=['site', 'over_3', 'over_2', 'max_ratio', 'max_group'])
+
+    top = over.loc[over.groupby('site', sort=False)['risk_ratio'].idxmax(), ['site', 'risk_ratio', 'group']]
+    summary = over.groupby('site', sort=False).agg(
+        over_3=(basis, lambda r: int((r > 3.0).sum())),
+        over_2=(basis, 'size'),
+    ).reset_index()
+    summary = summary.merge(top.rename(columns={'risk_ratio': 'max_ratio', 'group': 'max_group'}), on='site')
+    return summary.sort_values(['over_3', 'over_2', 'max_ratio'], ascending=False, ignore_index=True)
+
+def print_site_summary(summary: pd.DataFrame, outcome_name: str, site_count: int, ci: dict = None):
+    """Print the ranked multi-site summary."""
+    print(f"\n{'='*80}")
+    print(f"MULTI-SITE DISPROPORTIONALITY SUMMARY")
+    print(f"Outcome: {outcome_name}")
+    if ci:
+        print(f"Thresholds applied to the lower bound of {ci['level']:.0%} bootstrap intervals")
+    print(f"Sites analyzed: {site_count:,}   "
+          f"Sites over 2.0x: {len(summary):,}   "
+          f"Sites over 3.0x: {int((summary['over_3'] > 0).sum()):,}")
+    print(f"{'='*80}\n")
+
+    if summary.empty:
+        print("No site has a group above 2.0x.\n")
+        return
+
+    print(f"{'Rank':<6} {'Site':<25} {'>3.0x':>6} {'>2.0x':>6} {'Max Ratio':>10}  {'Highest Group':<25}")
+    print("-" * 85)
+    for rank, row in enumerate(summary.itertuples(index=False), start=1):
+        print(f"{rank:<6} {str(row.site):<25} {row.over_3:>6} {row.over_2:>6} "
+              f"{row.max_ratio:>9.2f}x  {str(row.max_group):<25}")
+    print()
+
+def report_sites(site_results: Dict[str, Dict[str, dict]], outcome_name: str,
+                 output: str = None, ci: dict = None):
+    """Print the ranked site summary and save the long-format table."""
+    table = site_table(site_results)
+    print_site_summary(rank_sites(table), outcome_name, len(site_results), ci)
+    timings.lap('render')
+
+    if output:
+        table.to_csv(output, index=False)
+        print(f"Results saved to: {output}")
+        timings.lap('output')
+
 def interpret_ratio(ratio: float) -> tuple:
     """Interpret the risk ratio with severity level."""
     if ratio < 0.5:
@@ -145,7 +510,179 @@ def print_report(results: dict, outcome_name: str):
 
     print()
 
-def main():
+def print_interval_report(results: dict, ci: dict, threshold: float = 2.0):
+    """Print bootstrap intervals and whether each group is confirmed over the threshold."""
+    has_p = any('p_value' in data for data in results.values())
+
+    print(f"{'='*80}")
+    print(f"CONFIDENCE INTERVALS ({ci['level']:.0%} bootstrap, {ci['resamples']:,} resamples)")
+    print(f"{'='*80}\n")
+
+    header = f"{'Group':<25} {'Ratio':>8} {'Interval':>18}"
+    if has_p:
+        header += f" {'p':>8}"
+    print(f"{header}  Over {threshold:.1f}x?")
+    print("-" * 95)
+
+    sorted_results = sorted(results.items(), key=lambda x: x[1]['risk_ratio'], reverse=True)
+    for group, data in sorted_results:
+        interval = f"[{data['ci_low']:.2f}, {data['ci_high']:.2f}]"
+        line = f"{group:<25} {data['risk_ratio']:>7.2f}x {interval:>18}"
+        if has_p:
+            line += f" {data['p_value']:>8.4f}"
+
+        if data['ci_low'] > threshold and (not has_p or data['p_value'] < 1 - ci['level']):
+            verdict = "Confirmed"
+        elif data['risk_ratio'] > threshold:
+            verdict = f"Not confirmed (interval reaches {threshold:.1f}x or below)"
+            if has_p and data['p_value'] >= 1 - ci['level']:
+                verdict = "Not confirmed (could be chance)"
+        else:
+            verdict = "-"
+        print(f"{line}  {verdict}")
+
+    print(f"\n{'='*80}")
+    print("  Intervals resample students; small groups get wide intervals.")
+    print(f"  Confirmed = lower bound above {threshold:.1f}x"
+          + (" and permutation p below the significance level." if has_p else "."))
+    if has_p:
+        print("  p = chance of a ratio this high if outcomes were unrelated to group.")
+    print(f"{'='*80}\n")
+
+def print_sample_report(results: dict, threshold: float = 2.0):
+    """Print the margins of error of sample risk ratios and how to confirm them."""
+    print(f"{'='*80}")
+    print(f"APPROXIMATE INTERVALS ({SAMPLE_LEVEL:.0%}, stratified sample)")
+    print(f"{'='*80}\n")
+    print(f"{'Group':<25} {'Ratio':>8} {'Interval':>18} {'Sampled':>9}  Over {threshold:.1f}x?")
+    print("-" * 95)
+
+    sorted_results = sorted(results.items(), key=lambda x: x[1]['risk_ratio'], reverse=True)
+    for group, data in sorted_results:
+        high = f"{data['ci_high']:.2f}" if np.isfinite(data['ci_high']) else "n/a"
+        interval = f"[{data['ci_low']:.2f}, {high}]"
+        if data['ci_low'] > threshold:
+            verdict = "Likely"
+        elif data['risk_ratio'] > threshold or data['ci_high'] > threshold:
+            verdict = "Possible (confirm in exact mode)"
+        else:
+            verdict = "-"
+        print(f"{group:<25} {data['risk_ratio']:>7.2f}x {interval:>18} {data['sampled_n']:>9,}  {verdict}")
+
+    print(f"\n{'='*80}")
+    print("  Population counts are exact; outcome counts, rates and ratios are estimates.")
+    print("  Confirm in exact mode: rerun without --sample (add --chunksize for large files).")
+    print(f"{'='*80}\n")
+
+def print_matrix_report(results: Dict[str, Dict[str, dict]], group_col: str):
+    """Print a group x outcome matrix of risk ratios."""
+    outcomes = list(results)
+    groups = list(dict.fromkeys(group for data in results.values() for group in data))
+    width = max(10, max(len(outcome) for outcome in outcomes) + 2)
+
+    print(f"\n{'='*80}")
+    print(f"DISPROPORTIONALITY MATRIX")
+    print(f"Outcomes: {', '.join(outcomes)}")
+    print(f"{'='*80}\n")
+
+    print(f"{'Group':<25} {'Pop %':>7}" + "".join(f"{outcome[:width - 2]:>{width}}" for outcome in outcomes))
+    print("-" * (33 + width * len(outcomes)))
+
+    # Sort by population (largest groups first) so rows read like the roster
+    sizes = {group: max(data[group]['population_n'] for data in results.values() if group in data)
+             for group in groups}
+    for group in sorted(groups, key=lambda g: sizes[g], reverse=True):
+        first = next(data[group] for data in results.values() if group in data)
+        cells = ""
+        for outcome in outcomes:
+            data = results[outcome].get(group)
+            if data is None:
+                cells += f"{'-':>{width}}"
+                continue
+            marker = {'critical': '!!!', 'high': '!!', 'medium': '!'}.get(interpret_ratio(data['risk_ratio'])[1], '')
+            ratio = f"{data['risk_ratio']:.2f}x{marker}"
+            cells += f"{ratio:>{width}}"
+        print(f"{str(group):<25} {first['population_pct']:>6.1f}%{cells}")
+
+    counted = [outcome for outcome in outcomes if next(iter(results[outcome].values()), {}).get('kind') == 'count']
+    print(f"\n{'='*80}")
+    print("  Cells are risk ratios: (% of outcome) / (% of population)")
+    print("  !  = 1.2-2.0x   !! = 2.0-3.0x   !!! = > 3.0x")
+    if counted:
+        print(f"  Count-valued ({', '.join(counted)}): % of the total count, e.g. of all days")
+    print(f"{'='*80}")
+
+    concerns = [(outcome, group, data) for outcome, groups in results.items()
+                for group, data in groups.items() if data['risk_ratio'] > 2.0]
+    if concerns:
+        print("\nGROUPS REQUIRING IMMEDIATE ATTENTION:")
+        for outcome, group, data in sorted(concerns, key=lambda c: c[2]['risk_ratio'], reverse=True):
+            if data['kind'] == 'count':
+                detail = f"{data['outcome_n']:,} {outcome} across {data['population_n']:,} students"
+            else:
+                detail = f"{data['outcome_n']:,} of {data['population_n']:,} students"
+            print(f"  - {group} / {outcome}: {data['risk_ratio']}x ({detail})")
+    print()
+
+def incident_counts(args, outcomes: list, schema: dict = None) -> pd.DataFrame:
+    """
+    Join the --incidents log to the --data roster: distinct students with
+    each outcome per ([site,] group), missing keys kept for the totals.
+    """
+    sites = [args.by_site] if args.by_site else []
+    roster = read_roster(args.data, args.student_key, sites + [args.group], schema,
+                         use_cache=not args.no_cache, rebuild=args.rebuild_cache)
+    counts, summary = join_incidents(args.incidents, roster, args.student_key, sites + [args.group],
+                                     outcomes, args.incident_type, args.incident_key,
+                                     args.chunksize or DEFAULT_CHUNKSIZE)
+    print(f"\nJoined {summary['incidents']:,} incidents from {args.incidents} to {len(roster):,} "
+          f"students ({summary['unmatched']:,} incidents not on the roster)")
+    for outcome, rows in summary['outcome_rows'].items():
+        if not rows:
+            print(f"Warning: No '{outcome}' incidents found in {args.incidents}")
+    return counts
+
+def report_outcome_matrix(args, outcomes: list, count_cols: list, source_name: str, schema: dict = None) -> dict:
+    """Count every outcome in one grouped pass, then print and save the matrix."""
+    try:
+        if args.sqlite:
+            counts, totals = sqlite_outcome_matrix(
+                args.sqlite, table_source(args.table, args.query), args.group, outcomes, count_cols)
+        elif args.incidents:
+            counts = incident_counts(args, outcomes, schema)
+            # Distinct students: totals keep students without a group
+            totals = counts.sum()
+            counts = counts[counts.index.notna()]
+        elif args.chunksize:
+            counts, totals = stream_outcome_matrix(args.data, args.group, outcomes, args.chunksize, schema,
+                                                   count_cols)
+        else:
+            df = load_csv(args.data, columns=list(dict.fromkeys([args.group] + outcomes)),
+                          categorical=[args.group] if args.group not in outcomes else [],
+                          outcomes=outcomes, schema=schema,
+                          use_cache=not args.no_cache, rebuild=args.rebuild_cache)
+            timings.lap('load')
+            counts, totals = count_outcome_matrix(df, args.group, outcomes, count_cols)
+    except Exception as e:
+        print(f"Error reading {'database' if args.sqlite else 'file'}: {e}")
+        sys.exit(1)
+
+    timings.lap('load' if args.chunksize or args.incidents else 'group')
+    print(f"\nLoaded {int(totals['population_n']):,} records from {source_name}")
+
+    results = matrix_risk_ratios(counts, totals, outcomes, count_cols)
+    timings.lap('group')
+    print_matrix_report(results, args.group)
+    timings.lap('render')
+
+    if args.output:
+        matrix_table(results, args.group).to_csv(args.output, index=False)
+        print(f"Results saved to: {args.output}")
+        timings.lap('output')
+
+    return results
+
+def main(argv: list = None):
     parser = argparse.ArgumentParser(
         description='Calculate disproportionality ratios for equity analysis',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -159,49 +696,269 @@ Examples:
 
   With output file:
     python disproportionality.py --data data.csv --group ethnicity --outcome expelled --output results.csv
+
+  Several outcomes in one pass (group x outcome matrix and combined CSV):
+    python disproportionality.py --data discipline.csv --group race --outcome suspended,expelled,days_suspended \
+        --count-outcomes days_suspended --output matrix.csv
+
+  Every school in a district file, ranked by severity:
+    python disproportionality.py --data district.csv --by-site school --group race --outcome suspended --output sites.csv
+
+  One file per site, processed in parallel:
+    python disproportionality.py --data-dir schools/ --group race --outcome suspended --workers 8
+
+  Incident log joined to an enrollment roster (distinct students per incident type):
+    python disproportionality.py --data roster.csv --incidents incidents.csv --student-key student_id \
+        --incident-type action --group race --outcome OSS,ISS,Expulsion --output matrix.csv
+
+  Quick approximate preview of a very large file (confirm by rerunning without --sample):
+    python disproportionality.py --data big.csv --group race --outcome suspended --sample 100k
+
+  Counting inside a SQLite database (only group totals are read):
+    python disproportionality.py --sqlite sis.db --table discipline --by-site school --group race --outcome suspended
         """
     )
-    parser.add_argument('--data', required=True, help='Path to CSV file')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', help='Path to CSV file')
+    source.add_argument('--data-dir', help='Directory of per-site CSV files (one site per file)')
+    source.add_argument('--sqlite', metavar='DB', help='SQLite database to count in place (with --table or --query)')
+    parser.add_argument('--table', help='Table to read from --sqlite')
+    parser.add_argument('--query', help='SELECT query to read from --sqlite')
+    parser.add_argument('--incidents', metavar='FILE',
+                        help='Incident log CSV (many rows per student) to join to the --data roster')
+    parser.add_argument('--student-key', metavar='COLUMN', help='Student ID column joining --incidents to the roster')
+    parser.add_argument('--incident-key', metavar='COLUMN',
+                        help='Student ID column in the incident log, if named differently')
+    parser.add_argument('--incident-type', metavar='COLUMN',
+                        help='Incident log column whose values are the outcomes (e.g. OSS, Expulsion); '
+                             'otherwise outcomes are 0/1 columns of the log')
     parser.add_argument('--group', required=True, help='Column for demographic grouping')
-    parser.add_argument('--outcome', required=True, help='Column for outcome (0/1 or boolean)')
+    parser.add_argument('--outcome', required=True,
+                        help='Column for outcome (0/1 or boolean); comma-separate several for a '
+                             'group x outcome matrix')
+    parser.add_argument('--count-outcomes', metavar='COLUMNS',
+                        help='Comma-separated --outcome columns holding counts such as days suspended, '
+                             'summed in the matrix instead of counting students with 1')
+    parser.add_argument('--by-site', metavar='COLUMN',
+                        help='Run the analysis separately for every value of this site column')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for --data-dir (default: all cores)')
     parser.add_argument('--output', help='Output file path for CSV results (optional)')
+    parser.add_argument('--chunksize', type=int,
+                        help='Stream the CSV in chunks of this many rows to bound memory use')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse the CSV directly without the on-disk parse cache')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='Re-parse the CSV and replace its parse cache entry')
+    parser.add_argument('--schema', help='JSON file mapping columns to dtypes (skips type inference)')
+    parser.add_argument('--ci', nargs='?', type=float, const=DEFAULT_CI_LEVEL, metavar='LEVEL',
+                        help=f'Add bootstrap confidence intervals (default level {DEFAULT_CI_LEVEL})')
+    parser.add_argument('--resamples', type=int, default=DEFAULT_RESAMPLES,
+                        help=f'Bootstrap/permutation resamples (default {DEFAULT_RESAMPLES})')
+    parser.add_argument('--permutation', action='store_true',
+                        help='Add a permutation test that each ratio is above chance (implies --ci)')
+    parser.add_argument('--threshold', type=float, default=2.0,
+                        help='Ratio a group must exceed to be confirmed with --ci (default 2.0)')
+    parser.add_argument('--sample', metavar='FRACTION|N',
+                        help='Approximate preview from a stratified sample of this fraction of the rows '
+                             'or this many rows (e.g. 0.01 or 50k), with margins of error')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible resampling or --sample')
+    parser.add_argument('--timings', metavar='FILE',
+                        help='Write per-phase timings and peak memory to FILE as JSON')
+
+    args = parser.parse_args(argv)
+    if args.timings:
+        timings.start(args.timings)
+
+    ci = None
+    if args.ci is not None or args.permutation:
+        level = DEFAULT_CI_LEVEL if args.ci is None else args.ci
+        if not 0 < level < 1:
+            parser.error('--ci LEVEL must be between 0 and 1 (e.g. 0.95)')
+        ci = {'level': level, 'resamples': args.resamples,
+              'permutation': args.permutation, 'seed': args.seed}
+
+    if args.incidents:
+        if not args.data:
+            parser.error('--incidents requires the enrollment roster as --data')
+        if not args.student_key:
+            parser.error('--incidents requires --student-key')
+    elif args.student_key or args.incident_key or args.incident_type:
+        parser.error('--student-key, --incident-key and --incident-type require --incidents')
+    if args.chunksize and (args.by_site or args.data_dir) and not args.incidents:
+        parser.error('--chunksize cannot be combined with --by-site or --data-dir')
+    if args.sqlite:
+        if bool(args.table) == bool(args.query):
+            parser.error('--sqlite requires exactly one of --table or --query')
+        if args.chunksize:
+            parser.error('--chunksize applies to CSV input only')
+    elif args.table or args.query:
+        parser.error('--table and --query require --sqlite')
+
+    outcomes = list(dict.fromkeys(col.strip() for col in args.outcome.split(',')))
+    count_cols = list(dict.fromkeys(col.strip() for col in args.count_outcomes.split(','))) \
+        if args.count_outcomes else []
+    if any(col not in outcomes for col in count_cols):
+        parser.error('--count-outcomes must name --outcome columns')
+    if count_cols and args.incidents:
+        parser.error('--count-outcomes cannot be combined with --incidents (outcomes count distinct students)')
+    if (len(outcomes) > 1 or count_cols) and (args.by_site or args.data_dir or ci):
+        parser.error('several --outcome columns or --count-outcomes cannot be combined with '
+                     '--by-site, --data-dir or --ci')
+    if args.sample:
+        if not args.data or args.incidents or args.by_site or ci or len(outcomes) > 1 or count_cols:
+            parser.error('--sample applies to one --outcome of a --data CSV, without --incidents, '
+                         '--by-site or --ci')
+        try:
+            sample = parse_sample(args.sample)
+        except ValueError as e:
+            parser.error(str(e))
+
+    schema = None
+    if args.schema:
+        try:
+            schema = read_schema(args.schema)
+        except (OSError, ValueError) as e:
+            print(f"Error reading schema: {e}")
+            sys.exit(1)
+
+    # Multi-site batch: one file per site, fanned out across processes
+    if args.data_dir:
+        if not os.path.isdir(args.data_dir):
+            print(f"Error: Directory '{args.data_dir}' not found")
+            sys.exit(1)
+        site_results, records, errors = data_dir_risk_ratios(
+            args.data_dir, args.group, args.outcome, args.workers, schema,
+            use_cache=not args.no_cache, rebuild=args.rebuild_cache, ci=ci)
+        timings.lap('load')
+        for site, error in errors.items():
+            print(f"Warning: Skipping site '{site}': {error}")
+        print(f"\nLoaded {records:,} records from {len(site_results):,} site files in {args.data_dir}")
+        report_sites(site_results, args.outcome, args.output, ci)
+        return site_results
+
+    # Read the header only; just the referenced columns are loaded below
+    if args.sqlite:
+        if not os.path.exists(args.sqlite):
+            print(f"Error: Database '{args.sqlite}' not found")
+            sys.exit(1)
+        source_sql = table_source(args.table, args.query)
+        source_name = f"{args.sqlite} ({args.table or 'query'})"
+        try:
+            columns = sqlite_columns(args.sqlite, source_sql)
+        except Exception as e:
+            print(f"Error reading database: {e}")
+            sys.exit(1)
+    else:
+        source_name = args.data
+        try:
+            columns = read_columns(args.data)
+            incident_columns = read_columns(args.incidents) if args.incidents else []
+        except FileNotFoundError as e:
+            print(f"Error: File '{e.filename}' not found")
+            sys.exit(1)
+        except Exception as e:
+            print(f"Error reading file: {e}")
+            sys.exit(1)
+
+    # Validate columns (outcomes of an incident join live in the incident log)
+    required = [args.group] + ([args.by_site] if args.by_site else [])
+    if args.incidents:
+        required += [args.student_key]
+        checks = [(required, columns),
+                  ([args.incident_key or args.student_key] + ([args.incident_type] if args.incident_type
+                                                              else outcomes), incident_columns)]
+    else:
+        checks = [(required + outcomes, columns)]
+    for cols, available in checks:
+        for col in cols:
+            if col not in available:
+                print(f"Error: Column '{col}' not found")
+                print(f"Available columns: {', '.join(available)}")
+                sys.exit(1)
+
+    if len(outcomes) > 1 or count_cols:
+        return report_outcome_matrix(args, outcomes, count_cols, source_name, schema)
+
+    if args.sample:
+        try:
+            results, total_population, sampled = sample_risk_ratios(
+                args.data, args.group, args.outcome, sample, args.chunksize, schema, args.seed,
+                use_cache=not args.no_cache, rebuild=args.rebuild_cache)
+        except Exception as e:
+            print(f"Error reading file: {e}")
+            sys.exit(1)
+        timings.lap('load')
+        print(f"\nLoaded {total_population:,} records from {source_name}")
+        print(f"APPROXIMATE: stratified sample of {sampled:,} records; see the intervals below")
+        print_report(results, args.outcome)
+        print_sample_report(results, args.threshold)
+        timings.lap('render')
+        if args.output:
+            risk_ratio_table(results, args.group).to_csv(args.output)
+            print(f"Results saved to: {args.output}")
+        return results
 
-    args = parser.parse_args()
-
-    # Load data
+    # Calculate
     try:
-        df = pd.read_csv(args.data)
-        print(f"\nLoaded {len(df):,} records from {args.data}")
-    except FileNotFoundError:
-        print(f"Error: File '{args.data}' not found")
-        sys.exit(1)
+        if args.sqlite or args.incidents:
+            sites = [args.by_site] if args.by_site else []
+            if args.sqlite:
+                counts = sqlite_counts(args.sqlite, source_sql, sites + [args.group], args.outcome)
+            else:
+                counts = incident_counts(args, outcomes, schema).rename(columns={outcomes[0]: 'outcome_n'})
+            total_population = int(counts['population_n'].sum())
+            total_with_outcome = int(counts['outcome_n'].sum())
+            # Totals keep rows with a missing group; the report does not
+            if args.by_site:
+                site_totals = counts.groupby(level=0, sort=False).sum()
+            counts = counts[counts.index.to_frame().notna().all(axis=1).to_numpy()]
+        elif args.chunksize:
+            counts, total_population, total_with_outcome = stream_counts(
+                args.data, args.group, args.outcome, args.chunksize, schema)
+        else:
+            sites = [args.by_site] if args.by_site else []
+            categorical = [col for col in sites + [args.group] if col != args.outcome]
+            df = load_csv(args.data, columns=list(dict.fromkeys(sites + [args.group, args.outcome])),
+                          categorical=categorical, outcomes=[args.outcome], schema=schema,
+                          use_cache=not args.no_cache, rebuild=args.rebuild_cache)
+            total_population = len(df)
+            timings.lap('load')
+            if not args.by_site:
+                counts = count_outcomes(df, args.group, args.outcome)
+                total_with_outcome = int(outcome_indicator(df, args.outcome).sum())
     except Exception as e:
-        print(f"Error reading file: {e}")
+        print(f"Error reading {'database' if args.sqlite else 'file'}: {e}")
         sys.exit(1)
 
-    # Validate columns
-    if args.group not in df.columns:
-        print(f"Error: Column '{args.group}' not found")
-        print(f"Available columns: {', '.join(df.columns)}")
-        sys.exit(1)
+    timings.lap('load' if args.chunksize or args.incidents else 'group')
+    print(f"\nLoaded {total_population:,} records from {source_name}")
 
-    if args.outcome not in df.columns:
-        print(f"Error: Column '{args.outcome}' not found")
-        print(f"Available columns: {', '.join(df.columns)}")
-        sys.exit(1)
+    if args.by_site:
+        if args.sqlite or args.incidents:
+            site_results = site_results_from_counts(counts, site_totals, ci)
+        else:
+            site_results = site_risk_ratios(df, args.by_site, args.group, args.outcome, ci)
+        timings.lap('group')
+        report_sites(site_results, args.outcome, args.output, ci)
+        return site_results
 
-    # Calculate
-    results = calculate_risk_ratios(df, args.group, args.outcome)
+    results = risk_ratios_from_counts(counts, total_population, total_with_outcome, ci)
+    timings.lap('group')
 
     # Print report
     print_report(results, args.outcome)
+    if ci:
+        print_interval_report(results, ci, args.threshold)
+    timings.lap('render')
 
     # Save if output specified
     if args.output:
-        results_df = pd.DataFrame(results).T
-        results_df.index.name = args.group
-        results_df.to_csv(args.output)
+        risk_ratio_table(results, args.group).to_csv(args.output)
         print(f"Results saved to: {args.output}")
+        timings.lap('output')
+
+    return results
 
 if __name__ == "__main__":
     main()
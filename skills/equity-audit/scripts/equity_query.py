@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Equity Query Client
+Runs audit scripts through the resident query server
+
+Takes the script name followed by exactly the arguments the script takes,
+sends them to query_server.py and prints the same report the script would.
+It imports only the standard library, so each call starts in a few
+milliseconds. If no server is running, the script is run directly.
+
+The server listens on a unix socket (see query_server.py); the client
+only connects to a socket owned by the current user, so another user
+cannot stand in for the server and receive the queries.
+
+Usage:
+    python equity_query.py disaggregate --data file.csv --by "race,gender" --metric gpa
+    python equity_query.py disproportionality --data file.csv --group race --outcome suspended
+    python equity_query.py --json disproportionality --data file.csv --group race --outcome suspended
+    python equity_query.py --status
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPTS = ('disaggregate', 'disproportionality')
+DEFAULT_SOCKET = os.environ.get('APEX_EQUITY_SERVER_SOCKET') or os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp',
+    f"apex-equity-{os.getuid()}", 'query.sock')
+
+class QueryServerError(Exception):
+    """The server answered with an error status."""
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP over a unix socket that must belong to the current user."""
+
+    def __init__(self, socket_path: str, timeout: float = None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        owner = os.stat(self.socket_path).st_uid  # FileNotFoundError when no server
+        if owner != os.getuid():
+            raise PermissionError(f"{self.socket_path} belongs to another user (uid {owner})")
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def request(socket_path: str, path: str, payload: dict = None, timeout: float = None) -> dict:
+    """Send a request to the server and decode its JSON reply."""
+    conn = UnixHTTPConnection(socket_path, timeout)
+    try:
+        if payload is None:
+            conn.request('GET', path)
+        else:
+            conn.request('POST', path, body=json.dumps(payload).encode(),
+                         headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        body = response.read()
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise QueryServerError(body.decode(errors='replace'))
+    return json.loads(body)
+
+def run_directly(script: str, args: list) -> int:
+    """Fallback when the server is down: run the script as a subprocess."""
+    command = [sys.executable, str(Path(__file__).resolve().parent / f"{script}.py"), *args]
+    return subprocess.run(command).returncode
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run equity-audit scripts through the resident query server',
+        usage='%(prog)s [--socket PATH] [--json] [--no-fallback] SCRIPT [script arguments]',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  Same arguments as the scripts themselves:
+    python equity_query.py disaggregate --data students.csv --by race,gender --metric gpa --intersect
+    python equity_query.py disproportionality --data discipline.csv --group race --outcome suspended
+
+  Server management:
+    python equity_query.py --status
+    python equity_query.py --stop
+        """
+    )
+
+    parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                        help=f'Server socket (default {DEFAULT_SOCKET}, or APEX_EQUITY_SERVER_SOCKET)')
+    parser.add_argument('--json', action='store_true', help='Print the full JSON response')
+    parser.add_argument('--no-fallback', action='store_true',
+                        help='Fail instead of running the script directly when the server is down')
+    parser.add_argument('--status', action='store_true', help='Show resident datasets and memory use')
+    parser.add_argument('--stop', action='store_true', help='Stop the server')
+    parser.add_argument('script', nargs='?', choices=SCRIPTS, help='Script to run')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='Arguments for the script')
+
+    args = parser.parse_args()
+
+    if not (args.script or args.status or args.stop):
+        parser.error('a script name (or --status / --stop) is required')
+
+    try:
+        if args.status or args.stop:
+            reply = request(args.socket, '/status' if args.status else '/shutdown',
+                            None if args.status else {})
+            print(json.dumps(reply, indent=2))
+            return
+
+        reply = request(args.socket, '/query',
+                        {'script': args.script, 'args': args.args, 'cwd': os.getcwd()})
+    except QueryServerError as e:
+        print(f"Error from query server: {e}")
+        sys.exit(1)
+    except PermissionError as e:
+        print(f"Error: Not using the query server socket: {e}")
+        sys.exit(1)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        # Nothing was sent, so running the script here cannot run it twice
+        if args.no_fallback or not args.script:
+            print(f"Error: Query server not reachable at {args.socket} ({e})")
+            sys.exit(1)
+        print(f"Query server not reachable at {args.socket}; running {args.script}.py directly",
+              file=sys.stderr)
+        sys.exit(run_directly(args.script, args.args))
+    except (OSError, http.client.HTTPException) as e:
+        print(f"Error: Query server connection failed ({e})")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(reply, indent=2))
+    else:
+        sys.stdout.write(reply['stdout'])
+        sys.stderr.write(reply['stderr'])
+    sys.exit(reply['exit_code'])
+
+if __name__ == '__main__':
+    main()
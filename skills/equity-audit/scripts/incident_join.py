@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Incident-to-Roster Join
+Derives per-student outcomes from an incident log without flattening it
+
+Discipline data usually arrives as an incident log (many rows per student)
+plus an enrollment roster (one row per student). Risk ratios need, per
+group, the number of enrolled students with at least one incident of each
+type. This module streams the log in chunks and hash-joins each chunk's
+student IDs against the roster's key index. For every outcome it keeps
+a bitmap over roster students (exact distinct counts, one byte per
+student per outcome, far less than the roster itself). The merged
+incident-roster table is never built; memory is one chunk plus the roster.
+
+Incidents whose student is not on the roster are counted and reported,
+not guessed at.
+
+Usage:
+    from incident_join import join_incidents, read_roster
+
+    roster = read_roster('enrollment.csv', 'student_id', ['race'])
+    counts, summary = join_incidents('incidents.csv', roster, 'student_id', ['race'],
+                                     ['OSS', 'Expulsion'], type_col='action')
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregates import group_codes, read_csv_chunks
+from parse_cache import load_csv
+
+DEFAULT_CHUNKSIZE = 500_000
+
+def read_roster(path: str, student_key: str, cell_keys: list, schema: dict = None,
+                use_cache: bool = True, rebuild: bool = False) -> pd.DataFrame:
+    """
+    Load the roster's student key and grouping columns. Repeated student IDs
+    keep their first row; students without an ID stay in the population but
+    match no incidents.
+    """
+    roster = load_csv(path, columns=list(dict.fromkeys([student_key] + cell_keys)),
+                      categorical=[col for col in cell_keys if col != student_key],
+                      schema=schema, use_cache=use_cache, rebuild=rebuild)
+    repeated = roster[student_key].duplicated() & roster[student_key].notna()
+    return roster[~repeated].reset_index(drop=True)
+
+def student_index(keys: pd.Series) -> tuple:
+    """
+    Hash index over the roster's known student IDs, and the roster row of
+    each index entry. Numeric IDs are indexed as numbers (whole-number
+    floats from gaps in the column as integers), anything else as text.
+    """
+    known = np.flatnonzero(keys.notna().to_numpy())
+    values = keys.iloc[known]
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        values = values.astype(str)
+    elif pd.api.types.is_float_dtype(values.dtype) and (values % 1 == 0).all():
+        values = values.astype(np.int64)
+    return pd.Index(values.to_numpy()), known
+
+def lookup_students(index: pd.Index, ids: pd.Series) -> np.ndarray:
+    """
+    Positions of `ids` in the student index (-1 when not found). IDs of a
+    different kind than the index are converted, once per distinct ID:
+    text IDs such as '00123' match a numeric roster ID 123.
+    """
+    numeric_index = pd.api.types.is_numeric_dtype(index.dtype)
+    if numeric_index == pd.api.types.is_numeric_dtype(ids.dtype):
+        return index.get_indexer(ids.to_numpy())
+    codes, uniques = pd.factorize(ids)
+    uniques = pd.Index(uniques).astype(str)
+    if numeric_index:
+        uniques = pd.Index(pd.to_numeric(uniques.str.strip(), errors='coerce'))
+    return np.append(index.get_indexer(uniques), -1)[codes]
+
+def incident_masks(chunk: pd.DataFrame, outcomes: list, type_col: str = None) -> list:
+    """Which rows of a chunk are incidents of each outcome."""
+    if type_col:
+        # Compare each distinct type once rather than every row
+        codes, uniques = pd.factorize(chunk[type_col])
+        types = pd.Index(uniques).astype(str).str.strip()
+        return [np.isin(codes, np.flatnonzero(types == outcome)) for outcome in outcomes]
+    # True values or 1, as outcome_indicator counts them on a flat file
+    return [(chunk[outcome] if chunk[outcome].dtype == bool else chunk[outcome] == 1).to_numpy()
+            for outcome in outcomes]
+
+def join_incidents(path: str, roster: pd.DataFrame, student_key: str, cell_keys: list,
+                   outcomes: list, type_col: str = None, incident_key: str = None,
+                   chunksize: int = DEFAULT_CHUNKSIZE) -> tuple:
+    """
+    Distinct roster students with at least one incident of each outcome,
+    per roster cell (combination of `cell_keys`).
+
+    Outcomes are values of `type_col`, or 0/1 columns of the incident file
+    when no type column is given. Returns (counts, summary): counts is
+    indexed by the cell keys (missing keys kept, as in group_stats) with
+    population_n and one column per outcome; summary holds the incident,
+    matched and unmatched row counts and the incident rows per outcome.
+    """
+    incident_key = incident_key or student_key
+    index, known = student_index(roster[student_key])          # hash table of student IDs
+    cells = group_codes(roster, cell_keys)
+    labels = roster.groupby(cell_keys, dropna=False, observed=True, sort=False).size()
+    population = np.bincount(cells, minlength=len(labels))
+
+    flags = np.zeros((len(roster), len(outcomes)), dtype=bool)
+
+    summary = {'incidents': 0, 'matched': 0, 'unmatched': 0, 'outcome_rows': dict.fromkeys(outcomes, 0)}
+    usecols = list(dict.fromkeys([incident_key] + ([type_col] if type_col else outcomes)))
+    for chunk in read_csv_chunks(path, chunksize, usecols=usecols):
+        students = np.append(known, -1)[lookup_students(index, chunk[incident_key])]   # roster row, or -1
+        matched = students >= 0
+        summary['incidents'] += len(chunk)
+        summary['matched'] += int(matched.sum())
+
+        for j, mask in enumerate(incident_masks(chunk, outcomes, type_col)):
+            summary['outcome_rows'][outcomes[j]] += int(mask.sum())
+            flags[students[mask & matched], j] = True
+
+    summary['unmatched'] = summary['incidents'] - summary['matched']
+
+    with_outcome = np.stack([np.bincount(cells[flags[:, j]], minlength=len(labels))
+                             for j in range(len(outcomes))], axis=1)
+
+    counts = pd.DataFrame(with_outcome.reshape(len(labels), len(outcomes)), index=labels.index,
+                          columns=outcomes)
+    counts.insert(0, 'population_n', population)
+    return counts, summary
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Longitudinal Disproportionality
+Multi-year risk ratios from a persisted per-term aggregate state
+
+Each term's file is folded once into a small JSON state file holding
+population and outcome counts per (term, [site,] group). Trend reports and
+rolling multi-year risk ratios are computed from those counts alone, so a
+new term never requires rescanning earlier ones. If a file that was
+already folded has grown (rows appended), only the appended rows are read.
+
+Rolling ratios pool the counts of the last --window terms (3 by default,
+as in IDEA significant-disproportionality determinations) before taking
+the ratio, which keeps small groups from swinging year to year. Term
+labels must sort chronologically (e.g. 2022-23, 2023-24).
+
+Usage:
+    python longitudinal.py --state STATE.json --add FILE --term LABEL --group column --outcome column
+
+Example:
+    python longitudinal.py --state discipline.json --add fall2024.csv --term 2024-25 --group race_ethnicity --outcome suspended
+    python longitudinal.py --state discipline.json --add history.csv --term-col school_year --group race_ethnicity --outcome suspended --by-site school
+    python longitudinal.py --state discipline.json --window 3 --output trends.csv
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregates import read_columns
+from disproportionality import interpret_ratio, outcome_indicator
+
+STATE_VERSION = 1
+DEFAULT_CHUNKSIZE = 500_000
+SAMPLE_BYTES = 64 * 1024
+
+def new_state(group_col: str, outcome_col: str, site_col: str = None) -> dict:
+    """An empty state for one group/outcome (and optional site) combination."""
+    return {'version': STATE_VERSION, 'group': group_col, 'outcome': outcome_col,
+            'site': site_col, 'sources': [], 'counts': []}
+
+def load_state(path: str) -> dict:
+    """Read a state file; returns None if it does not exist yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        raise ValueError(f"'{path}' is not a version {STATE_VERSION} state file")
+    return state
+
+def save_state(state: dict, path: str):
+    """Write the state file atomically so an interrupted run never corrupts it."""
+    staging = Path(path).with_name(f".{Path(path).name}.tmp")
+    staging.write_text(json.dumps(state, separators=(',', ':')))
+    os.replace(staging, path)
+
+def fingerprint(path: str, end: int) -> str:
+    """Hash the first and last SAMPLE_BYTES of the file's first `end` bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        digest.update(f.read(min(end, SAMPLE_BYTES)))
+        f.seek(max(0, end - SAMPLE_BYTES))
+        digest.update(f.read(min(end, SAMPLE_BYTES)))
+    return digest.hexdigest()[:32]
+
+def resume_offset(path: str, record: dict) -> int:
+    """
+    Byte offset to start folding `path` from, given its previous record.
+
+    Returns 0 for a file never folded, the old end of file if rows were
+    appended since, and None if nothing changed. Raises ValueError if
+    previously folded rows were modified.
+    """
+    if record is None:
+        return 0
+    size = os.path.getsize(path)
+    folded = record['bytes']
+    if size == folded and fingerprint(path, size) == record['fingerprint']:
+        return None
+    if size > folded and fingerprint(path, folded) == record['fingerprint']:
+        with open(path, 'rb') as f:
+            f.seek(folded - 1)
+            if f.read(1) == b'\n':
+                return folded
+    raise ValueError(f"'{path}' changed since it was folded (not just appended to); "
+                     f"re-add it with --replace or rebuild the state")
+
+def read_rows(path: str, offset: int, usecols: list, text_cols: list, chunksize: int):
+    """Iterate over the rows of `path` from byte `offset` on, in chunks."""
+    header = read_columns(path)
+    dtype = {col: str for col in text_cols}
+    with open(path, 'rb') as f:
+        if offset:
+            f.seek(offset)
+            chunks = pd.read_csv(f, header=None, names=header, usecols=usecols,
+                                 dtype=dtype, chunksize=chunksize)
+        else:
+            chunks = pd.read_csv(f, usecols=usecols, dtype=dtype, chunksize=chunksize)
+        yield from chunks
+
+def fold_counts(chunks, keys: list, outcome_col: str) -> pd.DataFrame:
+    """
+    Count population and outcome rows per key combination over all chunks.
+
+    Rows with a missing group are kept (as None) because they still count
+    toward the totals the percentages are taken against; rows with a
+    missing term or site are dropped.
+    """
+    counts = None
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=keys[:-1])
+        has_outcome = outcome_indicator(chunk, outcome_col)
+        part = has_outcome.groupby([chunk[col] for col in keys], dropna=False, sort=False).agg(['size', 'sum'])
+        part.columns = ['population_n', 'outcome_n']
+        counts = part if counts is None else pd.concat([counts, part]).groupby(
+            level=list(range(len(keys))), dropna=False, sort=False).sum()
+    return counts
+
+def add_file(state: dict, path: str, term: str = None, term_col: str = None,
+             replace: bool = False, chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """
+    Fold a file's new rows into the state. Returns the number of rows folded.
+
+    With `term` every row belongs to that term; with `term_col` the term is
+    read from that column. `replace` first drops everything already folded
+    for `term` (used when a term's file was corrected, not just appended to).
+    """
+    source = os.path.abspath(path)
+    site_col = state['site']
+    keys = [site_col, state['group']] if site_col else [state['group']]
+
+    columns = read_columns(path)
+    required = keys + [state['outcome']] + ([term_col] if term_col else [])
+    missing = [col for col in required if col not in columns]
+    if missing:
+        raise ValueError(f"columns not found in '{path}': {', '.join(missing)}")
+
+    if replace:
+        state['counts'] = [row for row in state['counts'] if row[0] != term]
+        state['sources'] = [s for s in state['sources'] if s['term'] != term]
+
+    label = term if term is not None else f"column:{term_col}"
+    record = next((s for s in state['sources'] if s['path'] == source and s['term'] == label), None)
+    offset = resume_offset(path, record)
+    if offset is None:
+        return 0
+
+    key_cols = ([term_col] if term_col else []) + keys
+    chunks = read_rows(path, offset, list(dict.fromkeys(key_cols + [state['outcome']])),
+                       key_cols, chunksize)
+    counts = fold_counts(chunks, key_cols, state['outcome'])
+
+    folded = 0
+    if counts is not None:
+        merge_counts(state, counts, term)
+        folded = int(counts['population_n'].sum())
+
+    size = os.path.getsize(path)
+    entry = {'path': source, 'term': label, 'bytes': size, 'fingerprint': fingerprint(path, size),
+             'rows': (record['rows'] if record and offset else 0) + folded}
+    state['sources'] = [s for s in state['sources'] if s is not record] + [entry]
+    return folded
+
+def merge_counts(state: dict, counts: pd.DataFrame, term: str = None):
+    """Add new counts (indexed by [term,] [site,] group) to the state's counts."""
+    new = counts.reset_index()
+    new.columns = (['term'] if term is None else []) + state_keys(state) + ['population_n', 'outcome_n']
+    if term is not None:
+        new.insert(0, 'term', term)
+    new = new.astype({col: object for col in ['term'] + state_keys(state)})
+    new = new.where(new.notna(), None)
+
+    combined = pd.concat([state_frame(state), new], ignore_index=True)
+    keys = ['term'] + state_keys(state)
+    combined = combined.groupby(keys, dropna=False, sort=False)[['population_n', 'outcome_n']].sum().reset_index()
+    combined = combined.astype(object).where(combined.notna(), None)
+    state['counts'] = [[row[0], *row[1:-2], int(row[-2]), int(row[-1])]
+                       for row in combined.itertuples(index=False)]
+
+def state_keys(state: dict) -> list:
+    return ['site', 'group'] if state['site'] else ['group']
+
+def state_frame(state: dict) -> pd.DataFrame:
+    """The state's counts as a DataFrame: term, [site,] group, population_n, outcome_n."""
+    columns = ['term'] + state_keys(state) + ['population_n', 'outcome_n']
+    frame = pd.DataFrame(state['counts'], columns=columns)
+    return frame.astype({'population_n': 'int64', 'outcome_n': 'int64'})
+
+def ratios(frame: pd.DataFrame, unit: list) -> pd.Series:
+    """
+    Risk ratio per row, against the totals of each `unit` (e.g. term and site).
+
+    Same formula as disproportionality.py: (% of group in outcome) divided
+    by (% of group in population), 0 when undefined.
+    """
+    if unit:
+        total_n = frame.groupby(unit, sort=False)['population_n'].transform('sum')
+        total_k = frame.groupby(unit, sort=False)['outcome_n'].transform('sum')
+    else:
+        total_n, total_k = frame['population_n'].sum(), frame['outcome_n'].sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (frame['outcome_n'] / total_k) / (frame['population_n'] / total_n)
+    return ratio.where(np.isfinite(ratio), 0.0).round(2)
+
+def trend_table(state: dict, window: int = 3, threshold: float = 2.0) -> tuple:
+    """
+    Annual and rolling risk ratios for every term and group.
+
+    Returns (table, terms). The table has one row per term and [site,]
+    group with the annual ratio, the ratio over the window of terms ending
+    there (pooled counts) and the number of consecutive terms, ending
+    there, with an annual ratio over `threshold`.
+    """
+    site_keys = state_keys(state)[:-1]
+    frame = state_frame(state)
+    terms = sorted(frame['term'].unique())
+
+    frame['risk_ratio'] = ratios(frame, ['term'] + site_keys)
+
+    rolling = []
+    for i, term in enumerate(terms):
+        span = terms[max(0, i - window + 1):i + 1]
+        pooled = frame[frame['term'].isin(span)].groupby(
+            state_keys(state), dropna=False, sort=False)[['population_n', 'outcome_n']].sum().reset_index()
+        pooled['rolling_ratio'] = ratios(pooled, site_keys)
+        pooled['window_terms'] = len(span)
+        rolling.append(pooled.assign(term=term)[['term'] + state_keys(state) + ['rolling_ratio', 'window_terms']])
+
+    table = frame.merge(pd.concat(rolling), on=['term'] + state_keys(state), how='left')
+    table = table[table['group'].notna()].copy()
+    table['order'] = table['term'].map({term: i for i, term in enumerate(terms)})
+    table = table.sort_values(state_keys(state) + ['order'], kind='stable')
+
+    over = table['risk_ratio'] > threshold
+    # Count consecutive terms over the threshold; a missing term breaks the run
+    gap = table['order'].groupby(series_labels(table, state_keys(state)), sort=False).diff().ne(1)
+    run_id = (~over | gap).cumsum()
+    table['terms_over'] = over.groupby(run_id).cumsum().astype(int)
+
+    return table.drop(columns='order').reset_index(drop=True), terms
+
+def series_labels(table: pd.DataFrame, keys: list) -> pd.Series:
+    """One hashable label per [site,] group series."""
+    return pd.Series(list(zip(*(table[col].astype(str) for col in keys))), index=table.index)
+
+def trend_slope(table: pd.DataFrame, terms: list, keys: list) -> pd.Series:
+    """Least-squares change in annual risk ratio per term, indexed by series label."""
+    labels = series_labels(table, keys)
+    x = table['term'].map({term: i for i, term in enumerate(terms)})
+    y = table['risk_ratio']
+    x_dev = x - x.groupby(labels).transform('mean')
+    y_dev = y - y.groupby(labels).transform('mean')
+    xy = (x_dev * y_dev).groupby(labels).sum()
+    xx = (x_dev ** 2).groupby(labels).sum()
+    return (xy / xx.where(xx > 0)).round(3)
+
+def print_trend_report(state: dict, table: pd.DataFrame, terms: list, window: int, threshold: float):
+    """Print annual ratios for recent terms, the latest rolling ratio and the trend."""
+    keys = state_keys(state)
+    shown = terms[-5:]
+    latest = terms[-1]
+
+    print(f"\n{'='*80}")
+    print(f"LONGITUDINAL DISPROPORTIONALITY REPORT")
+    print(f"Outcome: {state['outcome']}   Group: {state['group']}"
+          + (f"   Site: {state['site']}" if state['site'] else ""))
+    print(f"Terms: {len(terms)} ({terms[0]} to {latest})   Rolling window: {window} terms")
+    print(f"{'='*80}\n")
+
+    label = 'Site / Group' if state['site'] else 'Group'
+    header = f"{label:<25}" + "".join(f"{term[-9:]:>10}" for term in shown)
+    print(f"{header} {f'{window}-term':>9} {'Trend':>8}  Assessment")
+    print("-" * max(95, len(header) + 40))
+
+    labels = series_labels(table, keys)
+    annual = dict(zip(zip(labels, table['term']), table['risk_ratio']))
+    slopes = trend_slope(table, terms, keys)
+
+    current = table[table['term'] == latest].assign(label=labels)
+    for row in current.sort_values('rolling_ratio', ascending=False).itertuples(index=False):
+        name = " / ".join(row.label)
+        values = "".join(f"{annual[(row.label, term)]:>9.2f}x" if (row.label, term) in annual
+                         else f"{'-':>10}" for term in shown)
+        slope = slopes.get(row.label)
+        trend = f"{slope:>+8.2f}" if pd.notna(slope) else f"{'-':>8}"
+        interpretation, _ = interpret_ratio(row.rolling_ratio)
+        note = f" ({row.terms_over} terms over {threshold:.1f}x)" if row.terms_over > 1 else ""
+        print(f"{name[:25]:<25}{values} {row.rolling_ratio:>8.2f}x {trend}  {interpretation}{note}")
+
+    print(f"\n{'='*80}")
+    print(f"  {window}-term = risk ratio of the counts pooled over the last {window} terms")
+    print("  Trend = average change in the annual ratio per term (+ = widening)")
+    print(f"{'='*80}\n")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Track disproportionality across terms from a persisted aggregate state',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  Start a state and fold in terms as they arrive:
+    python longitudinal.py --state suspensions.json --add 2022-23.csv --term 2022-23 --group race --outcome suspended
+    python longitudinal.py --state suspensions.json --add 2023-24.csv --term 2023-24
+
+  Backfill history from one file with a term column, per school:
+    python longitudinal.py --state schools.json --add history.csv --term-col year --group race --outcome suspended --by-site school
+
+  Report only (no new data):
+    python longitudinal.py --state suspensions.json --window 3 --output trends.csv
+        """
+    )
+
+    parser.add_argument('--state', required=True, help='State file (created on first --add)')
+    parser.add_argument('--add', metavar='FILE', help='CSV file to fold into the state')
+    term = parser.add_mutually_exclusive_group()
+    term.add_argument('--term', help='Term label for every row of --add (labels must sort chronologically)')
+    term.add_argument('--term-col', help='Column of --add holding each row\'s term label')
+    parser.add_argument('--replace', action='store_true',
+                        help='Discard counts already folded for --term before adding (corrected files)')
+    parser.add_argument('--group', help='Column containing group membership (fixed when the state is created)')
+    parser.add_argument('--outcome', help='Column containing outcome (1/0 or True/False)')
+    parser.add_argument('--by-site', metavar='COLUMN', help='Keep counts per site (e.g. school)')
+    parser.add_argument('--window', type=int, default=3, help='Terms pooled into rolling ratios (default 3)')
+    parser.add_argument('--threshold', type=float, default=2.0, help='Ratio counted as over threshold (default 2.0)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f'Rows read per chunk when folding (default {DEFAULT_CHUNKSIZE:,})')
+    parser.add_argument('--output', help='Save the term-by-group trend table to CSV')
+
+    args = parser.parse_args()
+
+    if args.add and not (args.term or args.term_col):
+        parser.error('--add requires --term or --term-col')
+    if args.replace and not args.term:
+        parser.error('--replace requires --term')
+    if args.window < 1:
+        parser.error('--window must be at least 1')
+
+    try:
+        state = load_state(args.state)
+    except (OSError, ValueError) as e:
+        print(f"Error reading state: {e}")
+        sys.exit(1)
+
+    if state is None:
+        if not args.add:
+            print(f"Error: state file '{args.state}' does not exist; create it with --add")
+            sys.exit(1)
+        if not (args.group and args.outcome):
+            parser.error('--group and --outcome are required when creating a state')
+        state = new_state(args.group, args.outcome, args.by_site)
+    else:
+        given = {'group': args.group, 'outcome': args.outcome, 'site': args.by_site}
+        conflicts = [name for name, value in given.items() if value and value != state[name]]
+        if conflicts:
+            print(f"Error: state '{args.state}' tracks group={state['group']}, outcome={state['outcome']}, "
+                  f"site={state['site']}; start a new state for other columns")
+            sys.exit(1)
+
+    if args.add:
+        try:
+            rows = add_file(state, args.add, args.term, args.term_col, args.replace, args.chunksize)
+        except FileNotFoundError:
+            print(f"Error: File '{args.add}' not found")
+            sys.exit(1)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        if rows:
+            save_state(state, args.state)
+            print(f"Folded {rows:,} new records from {args.add} into {args.state}")
+        else:
+            print(f"No new records in {args.add}; {args.state} is up to date")
+
+    if not state['counts']:
+        print("State has no counts yet.")
+        return
+
+    table, terms = trend_table(state, args.window, args.threshold)
+    print_trend_report(state, table, terms, args.window, args.threshold)
+
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Results saved to: {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Parse Cache
+Column-projected, typed CSV loading with an on-disk columnar cache
+
+Only the columns an analysis references are parsed. Demographic columns
+are read straight into `category` and outcome columns are stored as bool
+or the smallest integer type, so wide SIS exports load in a fraction of
+the time and memory. An optional JSON schema (column -> dtype) skips
+pandas type inference for the columns it lists.
+
+Parsed columns are cached one file per column, so later runs on the same
+file skip parsing entirely and a run that needs a new column only parses
+that column. Entries are keyed by the file's absolute path, size,
+modification time, a hash of its first and last megabyte and the schema,
+so an edited or replaced file is re-parsed automatically. Columns are
+stored as Parquet when pyarrow is installed and as pickles otherwise.
+
+The cache lives next to the scripts (skills/equity-audit/.cache) unless
+APEX_EQUITY_CACHE_DIR is set, and is capped at APEX_EQUITY_CACHE_MB
+megabytes (default 2048); least recently used entries are evicted first.
+Cached columns are student-level data, so directories are created 0700
+and files 0600 whatever the umask.
+
+Long-running processes (query_server.py) can also keep parsed columns in
+memory with `enable_memory_cache`; that tier is checked before the disk
+and has its own least-recently-used size cap.
+
+Usage:
+    from parse_cache import load_csv
+
+    df = load_csv('students.csv')                # reuse or build the cache
+    df = load_csv('students.csv', rebuild=True)  # force a fresh parse
+    df = load_csv('discipline.csv', columns=['race', 'suspended'],
+                  categorical=['race'], outcomes=['suspended'],
+                  schema=read_schema('schema.json'), use_cache=False)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    COLUMN_FORMAT = 'parquet'
+except ImportError:
+    COLUMN_FORMAT = 'pickle'
+
+CACHE_DIR = Path(os.environ.get('APEX_EQUITY_CACHE_DIR',
+                                Path(__file__).resolve().parent.parent / '.cache'))
+CACHE_MAX_BYTES = int(float(os.environ.get('APEX_EQUITY_CACHE_MB', 2048)) * 1024 * 1024)
+
+# Text columns with at most this share of distinct values become categorical
+CATEGORY_MAX_RATIO = 0.5
+SAMPLE_BYTES = 1024 * 1024
+
+# Text read_csv infers as bool; a column read as a grouping key keeps it as text
+BOOL_LABELS = {'True': True, 'TRUE': True, 'true': True,
+               'False': False, 'FALSE': False, 'false': False}
+
+# In-memory tier: cache key -> {'source', 'frame', 'bytes', 'hits'}; off unless enabled
+_memory = None
+_memory_max_bytes = 0
+
+def read_schema(path: str) -> dict:
+    """Read a JSON schema file mapping column names to pandas dtypes."""
+    with open(path) as f:
+        schema = json.load(f)
+    if not isinstance(schema, dict) or not all(isinstance(v, str) for v in schema.values()):
+        raise ValueError(f"Schema '{path}' must be a JSON object of column -> dtype strings")
+    return schema
+
+def source_key(path: str, schema: dict = None) -> tuple:
+    """Fingerprint a source file: (cache key, metadata dict)."""
+    source = os.path.abspath(path)
+    stat = os.stat(source)
+
+    digest = hashlib.sha256()
+    digest.update(f"{source}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    digest.update(json.dumps(schema or {}, sort_keys=True).encode())
+    with open(source, 'rb') as f:
+        digest.update(f.read(SAMPLE_BYTES))
+        if stat.st_size > SAMPLE_BYTES:
+            f.seek(max(SAMPLE_BYTES, stat.st_size - SAMPLE_BYTES))
+            digest.update(f.read(SAMPLE_BYTES))
+
+    meta = {'source': source, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return digest.hexdigest()[:32], meta
+
+def categorize(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert low-cardinality text columns to `category` in place."""
+    limit = max(1, int(len(df) * CATEGORY_MAX_RATIO))
+    for col in df.columns:
+        if pd.api.types.is_string_dtype(df[col].dtype) and pd.api.types.infer_dtype(df[col]) == 'string':
+            if df[col].nunique() <= limit:
+                df[col] = df[col].astype('category')
+    return df
+
+def restore_labels(series: pd.Series) -> pd.Series:
+    """
+    Give a column read as `category` the labels pandas would have inferred.
+
+    Categories parsed from text are strings; numeric codes such as grade or
+    sped flags are turned back into numbers (floats if the column has gaps)
+    so they sort and print exactly as an inferred column would.
+    """
+    categories = series.cat.categories
+    numeric = pd.to_numeric(pd.Series(categories), errors='coerce')
+    if len(categories) == 0 or numeric.isna().any():
+        return series
+    if series.isna().any():
+        numeric = numeric.astype(float)
+    if numeric.duplicated().any():
+        return pd.to_numeric(series.astype(object)).astype('category')
+    restored = series.cat.rename_categories(list(numeric))
+    return restored.cat.reorder_categories(sorted(restored.cat.categories))
+
+def compact_outcome(series: pd.Series) -> pd.Series:
+    """Store an outcome column as bool or the smallest integer type that fits."""
+    series = numeric_values(series)
+    if series.dtype == bool or not pd.api.types.is_integer_dtype(series):
+        return series
+    return pd.to_numeric(series, downcast='integer')
+
+def numeric_values(series: pd.Series) -> pd.Series:
+    """
+    Undo `category` on a column whose categories are numbers or booleans.
+
+    A column cached as a grouping key keeps True/False as text categories,
+    which are mapped back to the booleans an outcome read would infer.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        gaps = series.isna().any()
+        if len(categories) and pd.api.types.infer_dtype(categories) == 'string' \
+                and all(label in BOOL_LABELS for label in categories):
+            values = series.astype(object).map(BOOL_LABELS)
+            return values if gaps else values.astype(bool)
+        if pd.api.types.is_bool_dtype(categories):
+            return series.astype(object if gaps else bool)
+        if pd.api.types.is_numeric_dtype(categories):
+            return series.astype(float if gaps else categories.dtype)
+    return series
+
+def parse_csv(path: str, columns: list = None, categorical=(), schema: dict = None) -> pd.DataFrame:
+    """Parse the selected columns, reading categorical ones straight into `category`."""
+    schema = schema or {}
+    dtype = {col: 'category' for col in categorical if col not in schema}
+    dtype.update({col: kind for col, kind in schema.items() if columns is None or col in columns})
+
+    df = pd.read_csv(path, usecols=columns, dtype=dtype or None)
+    for col in categorical:
+        if col not in schema:
+            df[col] = restore_labels(df[col])
+    return categorize(df)
+
+def apply_roles(df: pd.DataFrame, categorical=(), outcomes=()) -> pd.DataFrame:
+    """Type columns for their role, whatever form they were cached in."""
+    for col in df.columns:
+        if col in categorical:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        elif col in outcomes:
+            df[col] = compact_outcome(df[col])
+        else:
+            df[col] = numeric_values(df[col])
+    return df
+
+def _column_file(entry: Path, name: str) -> Path:
+    stem = hashlib.sha1(name.encode()).hexdigest()[:16]
+    return entry / f"{stem}.{'parquet' if COLUMN_FORMAT == 'parquet' else 'pkl'}"
+
+def _private_dir(path: Path):
+    """Create a directory (and parents) readable by the current user only."""
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    os.chmod(path, 0o700)  # mkdir leaves existing directories as they were
+
+def _write_column(series: pd.Series, target: Path):
+    frame = series.to_frame()
+    staging = target.with_name(f".{target.name}.tmp")
+    # Created 0600 before anything is written to it
+    os.close(os.open(staging, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+    if COLUMN_FORMAT == 'parquet':
+        frame.to_parquet(staging, index=False)
+    else:
+        frame.to_pickle(staging)
+    os.chmod(staging, 0o600)
+    os.replace(staging, target)
+
+def _read_column(target: Path) -> pd.Series:
+    if target.suffix == '.parquet':
+        frame = pd.read_parquet(target)
+    else:
+        frame = pd.read_pickle(target)
+    return frame.iloc[:, 0]
+
+def _entry_size(entry: Path) -> int:
+    return sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+
+def read_entry(key: str, columns: list = None) -> pd.DataFrame:
+    """
+    Load the cached columns of an entry (all, or those in `columns`).
+
+    Returns None if there is no entry; columns that were never cached are
+    simply absent from the result.
+    """
+    entry = CACHE_DIR / key
+    meta_file = entry / 'meta.json'
+    if not meta_file.exists():
+        return None
+
+    meta = json.loads(meta_file.read_text())
+    files = dict(zip(meta['columns'], meta['files']))
+    wanted = meta['columns'] if columns is None else [c for c in columns if c in files]
+    data = {name: _read_column(entry / files[name]) for name in wanted}
+
+    os.utime(meta_file)  # mark as recently used
+    return pd.DataFrame(data, columns=wanted)
+
+def write_entry(key: str, meta: dict, df: pd.DataFrame):
+    """Add parsed columns to a cache entry, then enforce the size cap."""
+    entry = CACHE_DIR / key
+    _private_dir(CACHE_DIR)
+    _private_dir(entry)
+    meta_file = entry / 'meta.json'
+
+    current = json.loads(meta_file.read_text()) if meta_file.exists() else None
+    if current is None or current.get('rows') != len(df):
+        current = dict(meta, columns=[], files=[], rows=len(df))
+
+    files = dict(zip(current['columns'], current['files']))
+    for col in df.columns:
+        target = _column_file(entry, col)
+        _write_column(df[col], target)
+        files[col] = target.name
+    current['columns'], current['files'] = list(files), list(files.values())
+
+    staging = entry / '.meta.json.tmp'
+    with open(os.open(staging, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+        f.write(json.dumps(current, indent=2))
+    os.chmod(staging, 0o600)
+    os.replace(staging, meta_file)
+
+    drop_stale(current['source'], keep=key)
+    evict(keep=key)
+
+def drop_stale(source: str, keep: str = None):
+    """Remove older entries for a source file that has since changed."""
+    for meta_file in CACHE_DIR.glob('*/meta.json'):
+        entry = meta_file.parent
+        if entry.name == keep:
+            continue
+        try:
+            if json.loads(meta_file.read_text()).get('source') == source:
+                shutil.rmtree(entry, ignore_errors=True)
+        except (OSError, ValueError):
+            continue
+
+def evict(max_bytes: int = None, keep: str = None):
+    """Delete least recently used entries until the cache fits under the cap."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for meta_file in CACHE_DIR.glob('*/meta.json'):
+        entries.append((meta_file.stat().st_mtime, meta_file.parent))
+
+    total = sum(_entry_size(entry) for _, entry in entries)
+    for _, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        if entry.name == keep:
+            continue
+        total -= _entry_size(entry)
+        shutil.rmtree(entry, ignore_errors=True)
+
+def enable_memory_cache(max_bytes: int):
+    """Keep parsed columns in memory (up to `max_bytes`) for later loads in this process."""
+    global _memory, _memory_max_bytes
+    if _memory is None:
+        _memory = OrderedDict()
+    _memory_max_bytes = max_bytes
+    _evict_memory()
+
+def memory_status() -> list:
+    """Resident entries, most recently used last: source, columns, rows, bytes, hits."""
+    if _memory is None:
+        return []
+    return [{'source': entry['source'], 'columns': list(entry['frame'].columns),
+             'rows': len(entry['frame']), 'bytes': entry['bytes'], 'hits': entry['hits']}
+            for entry in _memory.values()]
+
+def recall(key: str, columns: list) -> pd.DataFrame:
+    """Columns of an in-memory entry (those it has), or None."""
+    if _memory is None or key not in _memory:
+        return None
+    entry = _memory[key]
+    _memory.move_to_end(key)
+    entry['hits'] += 1
+    return entry['frame'][[col for col in columns if col in entry['frame'].columns]]
+
+def remember(key: str, meta: dict, df: pd.DataFrame):
+    """Add columns to the in-memory tier, replacing entries for older versions of the file."""
+    if _memory is None:
+        return
+    for other in [k for k, entry in _memory.items() if entry['source'] == meta['source'] and k != key]:
+        del _memory[other]
+
+    entry = _memory.setdefault(key, {'source': meta['source'], 'frame': None, 'bytes': 0, 'hits': 0})
+    new = df if entry['frame'] is None else df[[c for c in df.columns if c not in entry['frame'].columns]]
+    if entry['frame'] is not None and not len(new.columns):
+        return
+    entry['frame'] = new if entry['frame'] is None else pd.concat([entry['frame'], new], axis=1)
+    entry['bytes'] = int(entry['frame'].memory_usage(deep=True).sum())
+    _memory.move_to_end(key)
+    _evict_memory(keep=key)
+
+def _evict_memory(keep: str = None):
+    total = sum(entry['bytes'] for entry in _memory.values())
+    for key in list(_memory):
+        if total <= _memory_max_bytes:
+            break
+        if key == keep:
+            continue
+        total -= _memory.pop(key)['bytes']
+
+def _join(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    if right is None or not len(right.columns):
+        return left
+    if left is None or not len(left.columns):
+        return right
+    return pd.concat([left, right], axis=1)
+
+def load_csv(path: str, columns: list = None, categorical=(), outcomes=(),
+             schema: dict = None, use_cache: bool = True, rebuild: bool = False) -> pd.DataFrame:
+    """
+    Load a CSV (or just `columns` of it) through the parse cache.
+
+    `categorical` columns come back as `category` and `outcomes` as bool or
+    compact integers. Cache problems never fail the load: if an entry
+    cannot be read or written the file is simply parsed as usual.
+    """
+    if not use_cache and _memory is None:
+        return apply_roles(parse_csv(path, columns, categorical, schema), categorical, outcomes)
+
+    key, meta = source_key(path, schema)
+    wanted = list(columns) if columns is not None else list(pd.read_csv(path, nrows=0).columns)
+
+    cached = None if rebuild else recall(key, wanted)
+    missing = wanted if cached is None else [c for c in wanted if c not in cached.columns]
+    if missing and use_cache and not rebuild:
+        try:
+            cached = _join(cached, read_entry(key, missing))
+        except Exception:
+            pass
+        missing = wanted if cached is None else [c for c in wanted if c not in cached.columns]
+
+    if missing:
+        parsed = parse_csv(path, missing, [c for c in categorical if c in missing], schema)
+        if use_cache:
+            try:
+                write_entry(key, meta, parsed)
+            except Exception:
+                pass
+        cached = _join(cached, parsed)
+
+    remember(key, meta, cached)
+    return apply_roles(cached[wanted], categorical, outcomes)
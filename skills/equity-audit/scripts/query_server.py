@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Equity Query Server
+Keeps datasets loaded and answers audit queries from memory
+
+A long-running local HTTP service that runs disaggregate.py and
+disproportionality.py in-process. Interpreter start-up and the pandas
+import are paid once, and parsed columns stay resident in memory (see
+parse_cache.enable_memory_cache), so repeat queries against the same file
+take milliseconds. Files are re-read automatically when they change on
+disk. When resident data exceeds --memory-mb, the least recently queried
+datasets are evicted.
+
+Queries take exactly the command-line arguments of the scripts and return
+JSON with the script's exit code, its printed report and its results. Use
+equity_query.py as the client. The server handles one query at a time.
+
+Queries can name any file and write --output anywhere the user can, so
+the server listens on a unix socket, not a TCP port: the socket is
+created 0600 in a directory only the user can enter, which keeps other
+local users out and leaves browsers nothing to send requests to.
+
+Usage:
+    python query_server.py
+    python query_server.py --socket /run/user/1000/equity.sock --memory-mb 4096 --preload students.csv
+
+Endpoints:
+    POST /query     {"script": "disaggregate", "args": [...], "cwd": "/path"}
+    GET  /status    resident datasets and memory use
+    POST /shutdown  stop the server
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import socketserver
+import sys
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from http.server import BaseHTTPRequestHandler
+
+import numpy as np
+import pandas as pd
+
+import disaggregate
+import disproportionality
+import timings
+from equity_query import DEFAULT_SOCKET, request
+from parse_cache import enable_memory_cache, load_csv, memory_status
+
+DEFAULT_MEMORY_MB = int(os.environ.get('APEX_EQUITY_SERVER_MB', 2048))
+
+SCRIPTS = {
+    'disaggregate': disaggregate.main,
+    'disproportionality': disproportionality.main,
+}
+
+def jsonable(value):
+    """Convert script results (dicts, DataFrames, NumPy scalars) to plain JSON values."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        return jsonable(json.loads(frame.to_json(orient='split', default_handler=str)))
+    if isinstance(value, dict):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def run_query(script: str, args: list, cwd: str = None) -> dict:
+    """Run a script's main() in-process with `args`, capturing its output."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    exit_code, results = 0, None
+    previous, program = os.getcwd(), sys.argv[0]
+    started = time.perf_counter()
+    try:
+        if cwd:
+            os.chdir(cwd)
+        sys.argv[0] = f"{script}.py"  # argparse usage and errors name the script
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            results = SCRIPTS[script](list(args))
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if isinstance(e.code, str):
+            stderr.write(e.code + "\n")
+    except Exception as e:
+        exit_code = 1
+        stderr.write(f"Error: {e}\n")
+    finally:
+        timings.stop()  # write --timings now rather than when the server exits
+        os.chdir(previous)
+        sys.argv[0] = program
+
+    return {
+        'exit_code': exit_code,
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        'results': jsonable(results),
+    }
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """JSON-over-HTTP front end for run_query."""
+
+    server_version = 'EquityQueryServer/1.0'
+
+    def send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/status':
+            self.send_json(404, {'error': f"unknown endpoint {self.path}"})
+            return
+        datasets = memory_status()
+        self.send_json(200, {
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.server.started, 1),
+            'queries': self.server.queries,
+            'memory_cap_mb': self.server.memory_mb,
+            'resident_mb': round(sum(d['bytes'] for d in datasets) / 1024 / 1024, 1),
+            'datasets': datasets,
+        })
+
+    def do_POST(self):
+        if self.path == '/shutdown':
+            self.send_json(200, {'stopping': True})
+            self.server.stopping = True
+            return
+        if self.path != '/query':
+            self.send_json(404, {'error': f"unknown endpoint {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            script, args = request['script'], request.get('args', [])
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {'error': f"bad request: {e}"})
+            return
+        if script not in SCRIPTS:
+            self.send_json(400, {'error': f"unknown script '{script}'; expected one of {', '.join(SCRIPTS)}"})
+            return
+
+        self.server.queries += 1
+        self.send_json(200, run_query(script, args, request.get('cwd')))
+
+    def address_string(self):
+        return 'local'  # unix socket peers have no address
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class QueryServer(socketserver.UnixStreamServer):
+    """HTTP on a unix socket readable and writable by the current user only."""
+
+    def server_bind(self):
+        previous = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(previous)
+
+def private_dir(path: str):
+    """Create the default socket directory 0700, refusing one another user owns."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by another user")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+def serve(socket_path: str, memory_mb: int, preload: list = (), verbose: bool = False):
+    """Run the server until /shutdown or Ctrl-C."""
+    try:
+        request(socket_path, '/status', timeout=2.0)
+        print(f"Equity query server already running on {socket_path}")
+        return
+    except OSError:
+        pass
+    if socket_path == DEFAULT_SOCKET:
+        private_dir(os.path.dirname(socket_path))
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)  # left by a server that did not shut down cleanly
+
+    enable_memory_cache(memory_mb * 1024 * 1024)
+    for path in preload:
+        df = load_csv(path)
+        print(f"Preloaded {len(df):,} records from {path}")
+
+    server = QueryServer(socket_path, QueryHandler)
+    server.started, server.queries, server.memory_mb = time.time(), 0, memory_mb
+    server.verbose, server.stopping = verbose, False
+    print(f"Equity query server listening on {socket_path} (memory cap {memory_mb:,} MB)", flush=True)
+
+    try:
+        while not server.stopping:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
+    print("Equity query server stopped")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve equity-audit queries from memory',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  Start the server, then query it with the usual script arguments:
+    python query_server.py --preload students.csv &
+    python equity_query.py disaggregate --data students.csv --by race,gender --metric gpa --gaps
+    python equity_query.py disproportionality --data students.csv --group race --outcome suspended
+    python equity_query.py --stop
+        """
+    )
+
+    parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                        help=f'Unix socket to listen on (default {DEFAULT_SOCKET}, or APEX_EQUITY_SERVER_SOCKET)')
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_MB,
+                        help=f'Resident data cap before eviction (default {DEFAULT_MEMORY_MB}, '
+                             f'or APEX_EQUITY_SERVER_MB)')
+    parser.add_argument('--preload', action='append', default=[], metavar='FILE',
+                        help='Load a CSV at start-up (repeatable)')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    args = parser.parse_args()
+
+    try:
+        serve(args.socket, args.memory_mb, args.preload, args.verbose)
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found")
+        sys.exit(1)
+    except OSError as e:
+        print(f"Error starting server: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
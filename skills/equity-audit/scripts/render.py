@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Report Rendering and Export
+Fast tables and long-format files for large disaggregation outputs
+
+When a --by column is a school or teacher ID, a single table can have
+thousands of rows. Tables are rendered column at a time: every cell is
+formatted and padded with vectorized string operations, then the rows
+are joined once, so rendering stays a small share of the run. Long
+tables can be cut to the top K groups by count, or paged.
+
+Results are exported in long format, one row per (table, group, metric,
+statistic), so every single-column and intersectional table fits in one
+file:
+
+    .parquet    columnar (needs pyarrow)
+    .jsonl      one JSON object per line, written in blocks
+    .xlsx       one sheet per table, streamed row by row through a
+                write-only openpyxl workbook so memory stays constant;
+                tables longer than an Excel sheet continue on more sheets
+
+Usage:
+    from render import export_results, render_table, select_rows
+
+    shown, note = select_rows(table, top=25)
+    print(render_table(shown, 'markdown'))
+    export_results({'race': table}, {'race x gender': cross}, 'results.parquet')
+"""
+
+import html
+
+import numpy as np
+import pandas as pd
+
+RENDER_FORMATS = ['text', 'markdown', 'html']
+EXPORT_FORMATS = ['.parquet', '.jsonl', '.xlsx']
+
+# Rows per page when paging without an explicit page size
+DEFAULT_PAGE_SIZE = 50
+
+# Excel's sheet limit (including the header row) and sheet name length
+XLSX_MAX_ROWS = 1_048_576
+XLSX_NAME_LENGTH = 31
+
+# Rows converted to JSON at a time
+JSONL_BLOCK_ROWS = 100_000
+
+def select_rows(table: pd.DataFrame, top: int = None, page: int = None,
+                page_size: int = DEFAULT_PAGE_SIZE, count_col='Count') -> tuple:
+    """
+    Cut a table to the `top` groups by count and/or to one 1-based page.
+    With several metrics the count is the first column whose last level
+    is `count_col`.
+
+    Returns (rows to show, note describing what was left out or None).
+    """
+    total = len(table)
+    if top and total > top:
+        matches = [i for i, col in enumerate(table.columns)
+                   if (col[-1] if isinstance(col, tuple) else col) == count_col]
+        counts = table.iloc[:, matches[0]] if matches else None
+        if counts is not None:
+            order = np.argsort(-counts.fillna(0).to_numpy(), kind='stable')[:top]
+            table = table.iloc[np.sort(order)]
+        else:
+            table = table.iloc[:top]
+    note = f"top {len(table):,} of {total:,} groups by count" if len(table) < total else None
+
+    if page:
+        pages = max(1, -(-len(table) // page_size))
+        start = (min(page, pages) - 1) * page_size
+        table = table.iloc[start:start + page_size]
+        note = f"page {min(page, pages)} of {pages}, rows {start + 1:,}-{start + len(table):,}" + \
+               (f" of the {note}" if note else f" of {total:,}")
+    return table, note
+
+def format_column(values: pd.Series) -> pd.Series:
+    """Format one column as strings: integers plain, floats to two places, Percent to one."""
+    if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(values):
+        return values.astype(str).where(values.notna(), 'NaN')
+    numbers = values.to_numpy(dtype=float, na_value=np.nan)
+    missing = np.isnan(numbers)
+    if pd.api.types.is_integer_dtype(values):
+        text = np.char.mod('%d', np.where(missing, 0, numbers).astype(np.int64))
+    else:
+        text = np.char.mod('%.1f' if values.name == 'Percent' else '%.2f', numbers)
+    return pd.Series(np.where(missing, 'NaN', text), index=values.index)
+
+def format_key(values: pd.Series) -> pd.Series:
+    """Format a key column as its labels print, whether read as category or plain dtype."""
+    return values.astype(str).where(values.notna(), 'NaN')
+
+def cell_frame(table: pd.DataFrame) -> tuple:
+    """The table as strings with its index as leading columns: (frame, number of key columns)."""
+    names = [name if name is not None else '' for name in table.index.names]
+    flat = table.copy()
+    flat.columns = [' '.join(map(str, col)) if isinstance(col, tuple) else str(col) for col in flat.columns]
+    if isinstance(table.index, pd.RangeIndex):
+        # Count-only intersections keep their keys as the leading columns
+        keys = len([col for col in flat.columns if col not in ('Count', 'Percent')])
+    else:
+        keys = len(names)
+        flat.index = flat.index.set_names(names)
+        flat = flat.reset_index(allow_duplicates=True)
+    return pd.DataFrame({i: format_key(flat[col]) if i < keys else format_column(flat[col])
+                         for i, col in enumerate(flat.columns)}
+                        ).set_axis(list(flat.columns), axis=1), keys
+
+def render_text(cells: pd.DataFrame, keys: int) -> str:
+    """Fixed-width text: key columns left-aligned, values right-aligned."""
+    lines = None
+    header = []
+    for i, col in enumerate(cells.columns):
+        values = cells.iloc[:, i]
+        width = max(len(col), int(values.str.len().max()) if len(values) else 0)
+        padded = values.str.ljust(width) if i < keys else values.str.rjust(width)
+        header.append(col.ljust(width) if i < keys else col.rjust(width))
+        lines = padded if lines is None else lines.str.cat(padded, sep='  ')
+    body = '\n'.join(lines.tolist()) if lines is not None and len(lines) else ''
+    return '  '.join(header).rstrip() + ('\n' + body if body else '')
+
+def render_markdown(cells: pd.DataFrame, keys: int) -> str:
+    """A GitHub-flavored Markdown table; value columns right-aligned."""
+    escaped = cells.apply(lambda values: values.str.replace('|', r'\|', regex=False))
+    rows = '| ' + escaped.iloc[:, 0].str.cat([escaped.iloc[:, i] for i in range(1, escaped.shape[1])],
+                                              sep=' | ') + ' |' if len(escaped) else pd.Series(dtype=str)
+    header = '| ' + ' | '.join(col.replace('|', r'\|') for col in cells.columns) + ' |'
+    rule = '|' + '|'.join(' --- ' if i < keys else ' ---: ' for i in range(cells.shape[1])) + '|'
+    return '\n'.join([header, rule] + rows.tolist())
+
+def render_html(cells: pd.DataFrame, keys: int) -> str:
+    """An HTML table; key columns as row headers."""
+    escaped = cells.apply(lambda values: values.map(html.escape))
+    parts = [escaped.iloc[:, i].radd('<th>' if i < keys else '<td>').add('</th>' if i < keys else '</td>')
+             for i in range(escaped.shape[1])]
+    rows = '    <tr>' + parts[0].str.cat(parts[1:], sep='') + '</tr>' if len(escaped) else pd.Series(dtype=str)
+    header = ''.join(f"<th>{html.escape(col)}</th>" for col in cells.columns)
+    return '\n'.join(['<table>', '  <thead>', f"    <tr>{header}</tr>", '  </thead>', '  <tbody>']
+                     + rows.tolist() + ['  </tbody>', '</table>'])
+
+RENDERERS = {'text': render_text, 'markdown': render_markdown, 'html': render_html}
+
+def render_table(table: pd.DataFrame, fmt: str = 'text') -> str:
+    """Render a result table (index included) as text, Markdown or HTML."""
+    cells, keys = cell_frame(table)
+    return RENDERERS[fmt](cells, keys)
+
+def render_bars(table: pd.DataFrame, total: int) -> str:
+    """The count-only chart: one `group  count (percent) ###` line per group."""
+    counts = table['Count'].to_numpy(dtype=float)
+    percent = table['Percent'].to_numpy(dtype=float) if 'Percent' in table.columns else counts / total * 100
+    labels = pd.Series(table.index.astype(str), dtype=str).str.ljust(30)
+    count_text = pd.Series([f"{int(n):>6,}" for n in counts], dtype=str)
+    bars = pd.Series(np.char.multiply('#', (percent / 2).astype(int)), dtype=str)
+    lines = '  ' + labels.str.cat([' ' + count_text, pd.Series(np.char.mod(' (%5.1f%%) ', percent)), bars], sep='')
+    return '\n'.join(lines.tolist())
+
+def long_format(single: dict, intersections: dict = None, metric: str = None) -> pd.DataFrame:
+    """
+    Every table as rows of (table, group, metric, statistic, value); the
+    group is its key values joined with ' / '. Tables of a single metric
+    carry no metric column level, so it is labeled `metric`.
+    """
+    parts = []
+    for name, table in list(single.items()) + list((intersections or {}).items()):
+        if isinstance(table.index, pd.RangeIndex):
+            # Count-only intersections keep their keys as columns
+            keys = [col for col in table.columns if col not in ('Count', 'Percent')]
+            table = table.set_index(keys)
+        columns = table.columns if isinstance(table.columns, pd.MultiIndex) else \
+            pd.MultiIndex.from_product([[metric], table.columns])
+        values = table.to_numpy(dtype=float, na_value=np.nan)
+        index = table.index
+        groups = index.map(lambda key: ' / '.join(map(str, key))) if isinstance(index, pd.MultiIndex) \
+            else index.astype(str)
+        parts.append(pd.DataFrame({
+            'table': name,
+            'group': np.repeat(np.asarray(groups, dtype=object), len(columns)),
+            'metric': np.tile(columns.get_level_values(0).to_numpy(dtype=object), len(table)),
+            'statistic': np.tile(columns.get_level_values(1).to_numpy(dtype=object), len(table)),
+            'value': values.reshape(-1),
+        }))
+    columns = ['table', 'group', 'metric', 'statistic', 'value']
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+
+def write_jsonl(long: pd.DataFrame, path: str):
+    """Write the long table as JSON lines, a block of rows at a time."""
+    with open(path, 'w') as f:
+        for start in range(0, len(long), JSONL_BLOCK_ROWS):
+            block = long.iloc[start:start + JSONL_BLOCK_ROWS]
+            text = block.to_json(orient='records', lines=True)
+            f.write(text if text.endswith('\n') else text + '\n')
+
+def sheet_names(name: str, parts: int, used: set) -> list:
+    """Unique Excel sheet names for a table split over `parts` sheets."""
+    names = []
+    for part in range(parts):
+        suffix = f" ({part + 1})" if parts > 1 else ''
+        base = name.replace('/', '-')[:XLSX_NAME_LENGTH - len(suffix)] + suffix
+        candidate, n = base, 2
+        while candidate.lower() in used:
+            tag = f"~{n}"
+            candidate, n = base[:XLSX_NAME_LENGTH - len(tag)] + tag, n + 1
+        used.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+def write_xlsx(tables: dict, path: str):
+    """
+    One sheet per table in a write-only openpyxl workbook: rows are
+    streamed to disk as they are appended, so memory stays constant.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    used = set()
+    for name, table in tables.items():
+        flat = table.reset_index() if not isinstance(table.index, pd.RangeIndex) else table
+        header = [' '.join(map(str, col)) if isinstance(col, tuple) else str(col) for col in flat.columns]
+        per_sheet = XLSX_MAX_ROWS - 1
+        parts = max(1, -(-len(flat) // per_sheet))
+        for part, sheet_name in enumerate(sheet_names(name, parts, used)):
+            sheet = workbook.create_sheet(sheet_name)
+            sheet.append(header)
+            block = flat.iloc[part * per_sheet:(part + 1) * per_sheet]
+            for row in block.astype(object).where(block.notna(), None).itertuples(index=False):
+                sheet.append([value.item() if isinstance(value, np.generic) else value for value in row])
+    workbook.save(path)
+
+def export_results(single: dict, intersections: dict, path: str, metric: str = None):
+    """Write every table to a .parquet, .jsonl or .xlsx file."""
+    if path.endswith('.xlsx'):
+        write_xlsx(dict(single, **(intersections or {})), path)
+    elif path.endswith('.parquet'):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError('Parquet export needs pyarrow (pip install pyarrow); use .jsonl instead')
+        long_format(single, intersections, metric).to_parquet(path, index=False)
+    elif path.endswith('.jsonl'):
+        write_jsonl(long_format(single, intersections, metric), path)
+    else:
+        raise ValueError(f"Unsupported export format: {path} (use {', '.join(EXPORT_FORMATS)})")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Resampling Intervals for Risk Ratios
+Vectorized bootstrap confidence intervals and permutation tests
+
+All resampling works on group counts, not rows. A bootstrap replicate of
+N students is one multinomial draw over the (group x outcome) cells, and
+a permutation of outcome labels across students is one multivariate
+hypergeometric draw over the groups. Thousands of replicates are a single
+NumPy call, so the cost does not depend on the number of rows.
+
+Usage:
+    from resampling import bootstrap_intervals, permutation_pvalues
+
+    low, high = bootstrap_intervals(population, with_outcome, n, k, resamples=10000)
+    p_values = permutation_pvalues(population, with_outcome, n, k, resamples=10000)
+"""
+
+import numpy as np
+
+def composition_ratios(group_n, group_k, total_n, total_k) -> np.ndarray:
+    """
+    Risk ratio (% of group in outcome) / (% of group in population), broadcast.
+
+    Follows calculate_risk_ratios: a ratio is 0 when nobody has the outcome.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = (group_k / total_k) / (group_n / total_n)
+    return np.where(np.isfinite(ratios), ratios, 0.0)
+
+def _cells(population: np.ndarray, with_outcome: np.ndarray, total_population: int,
+           total_with_outcome: int) -> np.ndarray:
+    """Counts per (group, outcome) cell, plus the rows whose group is missing."""
+    other_n = total_population - population.sum()
+    other_k = total_with_outcome - with_outcome.sum()
+    return np.concatenate([with_outcome, population - with_outcome, [other_k, other_n - other_k]])
+
+def bootstrap_intervals(population, with_outcome, total_population: int, total_with_outcome: int,
+                        resamples: int = 2000, level: float = 0.95, seed: int = None) -> tuple:
+    """
+    Percentile bootstrap interval for every group's risk ratio.
+
+    Resamples N students with replacement, i.e. draws the cell counts from
+    a multinomial with the observed cell shares. Returns (low, high) arrays.
+    """
+    population = np.asarray(population, dtype=np.int64)
+    with_outcome = np.asarray(with_outcome, dtype=np.int64)
+    groups = len(population)
+    if groups == 0 or total_population == 0:
+        return np.zeros(groups), np.zeros(groups)
+
+    rng = np.random.default_rng(seed)
+    cells = _cells(population, with_outcome, total_population, total_with_outcome)
+    draws = rng.multinomial(total_population, cells / total_population, size=resamples)
+
+    group_k = draws[:, :groups]
+    group_n = group_k + draws[:, groups:2 * groups]
+    total_k = group_k.sum(axis=1, keepdims=True) + draws[:, [2 * groups]]
+    ratios = composition_ratios(group_n, group_k, total_population, total_k)
+
+    tail = (1 - level) / 2
+    low, high = np.quantile(ratios, [tail, 1 - tail], axis=0)
+    return low, high
+
+def permutation_pvalues(population, with_outcome, total_population: int, total_with_outcome: int,
+                        resamples: int = 2000, seed: int = None) -> np.ndarray:
+    """
+    One-sided permutation p-value that each group's ratio is this high by chance.
+
+    Shuffling outcome labels across students keeps every group size and the
+    outcome total fixed, so each group's outcome count follows a multivariate
+    hypergeometric distribution; it is sampled directly instead of shuffling.
+    """
+    population = np.asarray(population, dtype=np.int64)
+    with_outcome = np.asarray(with_outcome, dtype=np.int64)
+    groups = len(population)
+    if groups == 0 or total_with_outcome == 0:
+        return np.ones(groups)
+
+    rng = np.random.default_rng(seed)
+    colors = np.append(population, total_population - population.sum())
+    draws = rng.multivariate_hypergeometric(colors, total_with_outcome, size=resamples)
+
+    observed = composition_ratios(population, with_outcome, total_population, total_with_outcome)
+    permuted = composition_ratios(population, draws[:, :groups], total_population, total_with_outcome)
+    # Small tolerance so ties with the observed ratio count as "at least as extreme"
+    extreme = (permuted >= observed - 1e-12).sum(axis=0)
+    return (extreme + 1) / (resamples + 1)
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Risk Measures Engine
+IDEA significant-disproportionality measures for every LEA, group, outcome and year
+
+Builds one count tensor (year x LEA x group x outcome) and computes, in
+vectorized NumPy, for every cell at once:
+
+    risk                  outcome count / group enrollment within the LEA
+                          (for count outcomes such as days removed, per student)
+    risk ratio (RR)       group risk / risk of all other children in the LEA
+    alternate RR (ARR)    group risk / risk of all other children in the State,
+                          used when the LEA comparison group is too small
+    weighted RR (WRR)     group risk / other groups' LEA risks weighted by
+                          State enrollment shares
+
+Minimum-n (group enrollment) and minimum-cell (group outcome count) rules
+decide which measure applies. Ratios are then averaged over a rolling
+window of years and runs of consecutive years over the threshold are
+counted, so a full State run over hundreds of LEAs and several years
+takes seconds.
+
+Usage:
+    python risk_measures.py --data students.csv --lea district --group race --outcome suspended
+    python risk_measures.py --counts state_counts.csv --year year --lea lea_id --group race \\
+        --population enrollment --outcome suspended,expelled --threshold 3.0 --window 3
+
+Example:
+    python risk_measures.py --data discipline.csv --year school_year --lea district --group race_ethnicity \\
+        --outcome suspended,expelled,days_suspended --count-outcomes days_suspended --min-n 30 --min-cell 10 \\
+        --output measures.csv
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import timings
+from aggregates import read_columns
+from disproportionality import outcome_values
+from parse_cache import load_csv
+
+# Defaults follow the largest values 34 CFR 300.647 lets a State choose
+DEFAULT_MIN_N = 30
+DEFAULT_MIN_CELL = 10
+DEFAULT_THRESHOLD = 3.0
+
+STATUS = ['below min n', 'below min cell', 'risk ratio', 'alternate risk ratio']
+
+def student_counts(df: pd.DataFrame, keys: list, outcome_cols: list, count_cols: list = ()) -> pd.DataFrame:
+    """
+    Collapse student rows to enrollment and outcome totals per key
+    combination; outcomes in `count_cols` are summed (see outcome_values).
+    """
+    matrix = pd.DataFrame({col: outcome_values(df, col, col in count_cols) for col in outcome_cols})
+    grouped = matrix.groupby([df[col] for col in keys], observed=True)
+    counts = grouped.sum()
+    counts.insert(0, 'population_n', grouped.size())
+    return counts.reset_index()
+
+def count_tensor(counts: pd.DataFrame, year_col: str, lea_col: str, group_col: str,
+                 population_col: str, outcome_cols: list) -> dict:
+    """
+    Scatter long-format counts into dense arrays.
+
+    Returns a dict with the axis labels (years, leas, groups, outcomes),
+    N (year x LEA x group enrollment) and K (year x LEA x group x outcome
+    counts). Rows with a missing year, LEA or group are dropped; repeated
+    keys are summed.
+    """
+    counts = counts.dropna(subset=[col for col in (year_col, lea_col, group_col) if col])
+    years, year_idx = ([None], np.zeros(len(counts), dtype=int)) if not year_col else \
+        _factorize(counts[year_col])
+    leas, lea_idx = _factorize(counts[lea_col])
+    groups, group_idx = _factorize(counts[group_col])
+    shape = (len(years), len(leas), len(groups))
+    flat = np.ravel_multi_index((year_idx, lea_idx, group_idx), shape)
+    size = int(np.prod(shape))
+
+    population = np.bincount(flat, weights=counts[population_col].to_numpy(float), minlength=size)
+    outcomes = np.stack([np.bincount(flat, weights=counts[col].to_numpy(float), minlength=size)
+                         for col in outcome_cols], axis=-1)
+    return {
+        'years': years, 'leas': leas, 'groups': groups, 'outcomes': list(outcome_cols),
+        'N': population.reshape(shape),
+        'K': outcomes.reshape(shape + (len(outcome_cols),)),
+    }
+
+def _factorize(values: pd.Series) -> tuple:
+    codes, labels = pd.factorize(values, sort=True)
+    return list(labels), codes
+
+def _divide(numerator, denominator) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+
+def risk_measures(tensor: dict, min_n: int = DEFAULT_MIN_N, min_cell: int = DEFAULT_MIN_CELL) -> dict:
+    """
+    Every risk measure for every (year, LEA, group, outcome) cell.
+
+    All arrays have shape year x LEA x group x outcome. `status` indexes
+    STATUS: which rule applied and so which measure `ratio` holds.
+    """
+    N = tensor['N'][..., None]                      # (Y, L, G, 1)
+    K = tensor['K']                                 # (Y, L, G, O)
+
+    risk = _divide(K, N)
+
+    # Comparison group: all other children in the same LEA
+    other_n = N.sum(axis=2, keepdims=True) - N
+    other_k = K.sum(axis=2, keepdims=True) - K
+    comparison_risk = _divide(other_k, other_n)
+    risk_ratio = _divide(risk, comparison_risk)
+
+    # Alternate comparison group: all other children in the State
+    state_n = N.sum(axis=1, keepdims=True)
+    state_k = K.sum(axis=1, keepdims=True)
+    state_comparison_risk = _divide(state_k.sum(axis=2, keepdims=True) - state_k,
+                                    state_n.sum(axis=2, keepdims=True) - state_n)
+    alternate_risk_ratio = _divide(risk, np.broadcast_to(state_comparison_risk, risk.shape))
+
+    # Weighted: other groups' LEA risks weighted by their State enrollment share
+    share = _divide(state_n, state_n.sum(axis=2, keepdims=True))
+    present = N > 0
+    weight = np.where(present, np.broadcast_to(share, N.shape), 0.0)
+    weighted = np.where(present, weight * np.nan_to_num(risk), 0.0)
+    other_weight = weight.sum(axis=2, keepdims=True) - weight
+    weighted_comparison = _divide(weighted.sum(axis=2, keepdims=True) - weighted, other_weight)
+    weighted_risk_ratio = _divide(risk, weighted_comparison)
+
+    group_ok = np.broadcast_to(N >= min_n, K.shape)
+    cell_ok = K >= min_cell
+    comparison_ok = np.broadcast_to(other_n >= min_n, K.shape) & (other_k >= min_cell)
+    status = np.select([~group_ok, ~cell_ok, comparison_ok], [0, 1, 2], default=3)
+    ratio = np.select([status == 2, status == 3], [risk_ratio, alternate_risk_ratio], default=np.nan)
+
+    return {
+        'risk': risk, 'comparison_risk': comparison_risk, 'risk_ratio': risk_ratio,
+        'alternate_risk_ratio': alternate_risk_ratio, 'weighted_risk_ratio': weighted_risk_ratio,
+        'status': status, 'ratio': ratio,
+    }
+
+def rolling_measures(ratio: np.ndarray, window: int, threshold: float) -> tuple:
+    """
+    Rolling mean of the applicable ratio over the last `window` years, and
+    the number of consecutive years (ending in each year) over `threshold`.
+
+    Years without a ratio are skipped in the mean and break a run.
+    """
+    valid = ~np.isnan(ratio)
+    total = np.cumsum(np.where(valid, ratio, 0.0), axis=0)
+    count = np.cumsum(valid, axis=0)
+    lagged_total = np.zeros_like(total)
+    lagged_count = np.zeros_like(count)
+    lagged_total[window:] = total[:-window]
+    lagged_count[window:] = count[:-window]
+    rolling = _divide(total - lagged_total, count - lagged_count)
+
+    over = valid & (np.nan_to_num(ratio) > threshold)
+    consecutive = np.zeros(ratio.shape, dtype=int)
+    for year in range(ratio.shape[0]):
+        previous = consecutive[year - 1] if year else 0
+        consecutive[year] = np.where(over[year], previous + 1, 0)
+    return rolling, consecutive
+
+def measures_table(tensor: dict, measures: dict, rolling: np.ndarray, consecutive: np.ndarray,
+                   required_years: int) -> pd.DataFrame:
+    """Flatten the measure arrays to one row per enrolled (year, LEA, group, outcome) cell."""
+    shape = measures['risk'].shape
+    year, lea, group, outcome = np.indices(shape).reshape(4, -1)
+    population = np.broadcast_to(tensor['N'][..., None], shape).ravel()
+    keep = population > 0
+
+    table = pd.DataFrame({
+        'year': np.asarray(tensor['years'], dtype=object)[year[keep]],
+        'lea': np.asarray(tensor['leas'], dtype=object)[lea[keep]],
+        'group': np.asarray(tensor['groups'], dtype=object)[group[keep]],
+        'outcome': np.asarray(tensor['outcomes'], dtype=object)[outcome[keep]],
+        'population_n': population[keep].astype(np.int64),
+        'outcome_n': _whole(tensor['K'].ravel()[keep]),
+        'risk': measures['risk'].ravel()[keep].round(4),
+        'comparison_risk': measures['comparison_risk'].ravel()[keep].round(4),
+    })
+    for name in ('risk_ratio', 'alternate_risk_ratio', 'weighted_risk_ratio', 'ratio'):
+        table[name] = measures[name].ravel()[keep].round(2)
+    table['measure'] = np.asarray(STATUS, dtype=object)[measures['status'].ravel()[keep]]
+    table['rolling_ratio'] = rolling.ravel()[keep].round(2)
+    table['years_over'] = consecutive.ravel()[keep]
+    table['identified'] = table['years_over'] >= required_years
+    if tensor['years'] == [None]:
+        table = table.drop(columns='year')
+    return table
+
+def _whole(values: np.ndarray) -> np.ndarray:
+    return values.astype(np.int64) if np.array_equal(values, np.floor(values)) else values
+
+def print_summary(table: pd.DataFrame, tensor: dict, threshold: float, window: int,
+                  required_years: int, top: int = 25):
+    """Print coverage by rule and the LEAs identified in the latest year."""
+    latest = tensor['years'][-1]
+    current = table if latest is None else table[table['year'] == latest]
+
+    print(f"\n{'='*80}")
+    print(f"RISK MEASURES: {len(tensor['leas']):,} LEAs x {len(tensor['groups'])} groups x "
+          f"{len(tensor['outcomes'])} outcomes" + (f" x {len(tensor['years'])} years" if latest is not None else ""))
+    print(f"Threshold: {threshold:.1f}   Rolling window: {window} years   "
+          f"Consecutive years required: {required_years}")
+    print(f"{'='*80}\n")
+
+    print(f"{'Measure applied' + (f' ({latest})' if latest is not None else ''):<40} {'Cells':>10}")
+    print("-" * 52)
+    for status, cells in current['measure'].value_counts().reindex(STATUS, fill_value=0).items():
+        print(f"{status:<40} {cells:>10,}")
+
+    identified = current[current['identified']].sort_values('rolling_ratio', ascending=False)
+    print(f"\nIDENTIFIED ({len(identified):,} LEA/group/outcome combinations, "
+          f"{identified['lea'].nunique():,} LEAs)")
+    if len(identified):
+        print(f"{'LEA':<20} {'Group':<25} {'Outcome':<16} {'Ratio':>7} {'Rolling':>8} {'WRR':>7}  Measure")
+        print("-" * 100)
+        for row in identified.head(top).itertuples(index=False):
+            print(f"{str(row.lea)[:20]:<20} {str(row.group)[:25]:<25} {str(row.outcome)[:16]:<16} "
+                  f"{row.ratio:>6.2f}x {row.rolling_ratio:>7.2f}x {row.weighted_risk_ratio:>6.2f}x  {row.measure}")
+        if len(identified) > top:
+            print(f"... and {len(identified) - top:,} more (see --output)")
+    print()
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description='Compute IDEA significant-disproportionality risk measures for every LEA',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  Student-level file, one year:
+    python risk_measures.py --data students.csv --lea district --group race --outcome suspended
+
+  Several years and outcomes, identified after 3 consecutive years over 3.0:
+    python risk_measures.py --data discipline.csv --year school_year --lea district --group race \\
+        --outcome suspended,expelled --threshold 3.0 --consecutive 3 --output measures.csv
+
+  Pre-aggregated State counts (one row per year, LEA and group):
+    python risk_measures.py --counts counts.csv --year year --lea lea_id --group race \\
+        --population enrollment --outcome removals,suspensions
+        """
+    )
+
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', help='Student-level CSV file (one row per student)')
+    source.add_argument('--counts', help='Pre-aggregated CSV (one row per year, LEA and group)')
+    parser.add_argument('--lea', required=True, help='Column identifying the LEA (district)')
+    parser.add_argument('--group', required=True, help='Column for racial/ethnic group')
+    parser.add_argument('--outcome', required=True,
+                        help='Comma-separated outcome columns (0/1 or boolean; per-group counts with --counts)')
+    parser.add_argument('--count-outcomes', metavar='COLUMNS',
+                        help='Comma-separated --outcome columns of a --data file holding counts such as '
+                             'days removed, summed instead of counting students with 1')
+    parser.add_argument('--year', help='Column identifying the school year (enables rolling measures)')
+    parser.add_argument('--population', default='population_n',
+                        help='Enrollment column for --counts (default population_n)')
+    parser.add_argument('--min-n', type=int, default=DEFAULT_MIN_N,
+                        help=f'Minimum group enrollment for a ratio (default {DEFAULT_MIN_N})')
+    parser.add_argument('--min-cell', type=int, default=DEFAULT_MIN_CELL,
+                        help=f'Minimum outcome count for a ratio (default {DEFAULT_MIN_CELL})')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Ratio above which a year counts as over (default {DEFAULT_THRESHOLD})')
+    parser.add_argument('--window', type=int, default=3, help='Years in the rolling average (default 3)')
+    parser.add_argument('--consecutive', type=int, default=1,
+                        help='Consecutive years over the threshold before identification (default 1, max 3)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse the CSV directly without the on-disk parse cache')
+    parser.add_argument('--output', help='Save every cell with all measures to CSV')
+    parser.add_argument('--timings', metavar='FILE',
+                        help='Write per-phase timings and peak memory to FILE as JSON')
+
+    args = parser.parse_args(argv)
+
+    if args.timings:
+        timings.start(args.timings)
+
+    if not 1 <= args.consecutive <= 3:
+        parser.error('--consecutive must be between 1 and 3')
+    if args.window < 1:
+        parser.error('--window must be at least 1')
+
+    path = args.data or args.counts
+    outcomes = list(dict.fromkeys(col.strip() for col in args.outcome.split(',')))
+    count_cols = list(dict.fromkeys(col.strip() for col in args.count_outcomes.split(','))) \
+        if args.count_outcomes else []
+    if any(col not in outcomes for col in count_cols):
+        parser.error('--count-outcomes must name --outcome columns')
+    keys = [col for col in (args.year, args.lea, args.group) if col]
+    needed = keys + outcomes + ([args.population] if args.counts else [])
+
+    try:
+        columns = read_columns(path)
+    except FileNotFoundError:
+        print(f"Error: File '{path}' not found")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        sys.exit(1)
+
+    missing = [col for col in needed if col not in columns]
+    if missing:
+        print(f"Error: Columns not found: {', '.join(missing)}")
+        print(f"Available columns: {', '.join(columns)}")
+        sys.exit(1)
+
+    try:
+        df = load_csv(path, columns=list(dict.fromkeys(needed)),
+                      categorical=keys if args.data else [], outcomes=outcomes if args.data else [],
+                      use_cache=not args.no_cache)
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        sys.exit(1)
+
+    if args.data:
+        counts = student_counts(df, keys, outcomes, count_cols)
+        population_col = 'population_n'
+        print(f"\nLoaded {len(df):,} student records from {path}")
+    else:
+        counts, population_col = df, args.population
+        print(f"\nLoaded {len(df):,} count rows from {path}")
+    timings.lap('load')
+
+    tensor = count_tensor(counts, args.year, args.lea, args.group, population_col, outcomes)
+    measures = risk_measures(tensor, args.min_n, args.min_cell)
+    rolling, consecutive = rolling_measures(measures['ratio'], args.window, args.threshold)
+    table = measures_table(tensor, measures, rolling, consecutive, args.consecutive)
+    timings.lap('measures')
+
+    print_summary(table, tensor, args.threshold, args.window, args.consecutive)
+    timings.lap('render')
+
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Results saved to: {args.output}")
+        timings.lap('output')
+
+    return table
+
+if __name__ == '__main__':
+    main()
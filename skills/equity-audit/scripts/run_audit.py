@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Audit Spec Runner
+Runs every analysis of an equity audit from one spec and one read of the data
+
+An audit usually asks for many disaggregations, risk ratios and IDEA risk
+measures of the same file. Run one by one, every script parses the file
+and groups it again. This runner reads a YAML or JSON spec listing the
+analyses, and works out what each one needs: one grouped aggregation per
+value column (metric, outcome indicator or outcome count) and key set. A
+key set contained in another one is never aggregated separately; it is
+rolled up from the finer cell table (see aggregates.cube). So the plan is
+the minimal set of grouped passes.
+
+The data is read once. Only the referenced columns are parsed, through
+the parse cache, or the file is streamed in chunks with `chunksize`. The
+planned aggregations then run in parallel worker processes. The analyses
+also run in parallel, each from its cell tables. Reports and result
+tables are written together to the output directory, with:
+
+    report.txt      every report, in spec order
+    manifest.json   the plan, and per-stage and per-phase timings
+
+Spec (YAML needs PyYAML; JSON always works):
+
+    data: students.csv            # relative paths are relative to the spec
+    output_dir: audit_reports
+    analyses:
+      - name: gpa
+        type: disaggregate
+        by: [race_ethnicity, gender, ell]
+        metric: [gpa, attendance_rate]
+        intersect: true
+        gaps: true                # optional: gap_effect, gap_min_n, fdr
+      - name: suspension
+        type: disproportionality
+        group: race_ethnicity
+        outcome: suspended
+        ci: 0.95
+      - name: suspension-by-school
+        type: disproportionality
+        group: race_ethnicity
+        outcome: suspended
+        by_site: school
+      - name: idea
+        type: risk_measures
+        lea: district
+        group: race_ethnicity
+        outcome: [suspended, expelled, days_suspended]
+        count_outcomes: [days_suspended]   # summed, not counted as 0/1
+
+Usage:
+    python run_audit.py audit.yaml
+    python run_audit.py audit.json --output-dir reports/ --workers 4
+    python run_audit.py audit.yaml --dry-run
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import yaml
+except ImportError:  # JSON specs only
+    yaml = None
+
+import risk_measures as measures
+from aggregates import QUANTILE_MODES, cube, group_stats, merge_stats, read_columns, read_csv_chunks, rollup
+from disaggregate import (GAP_EFFECT_SIZE, GAP_FDR, GAP_MIN_N, intersection_groups, print_header,
+                          report_tables, save_results)
+from disproportionality import (DEFAULT_CI_LEVEL, DEFAULT_RESAMPLES, matrix_risk_ratios, matrix_table,
+                                outcome_indicator, outcome_values, print_interval_report, print_matrix_report,
+                                print_report, report_sites, risk_ratio_table, risk_ratios_from_counts,
+                                site_results_from_counts, site_table)
+from parse_cache import load_csv, read_schema
+from timings import peak_rss_mb
+
+ANALYSES = ('disaggregate', 'disproportionality', 'risk_measures')
+
+# The loaded (or streamed) frame, shared with aggregation workers
+_frame = None
+
+def read_spec(path: str) -> dict:
+    """Read a YAML (.yaml/.yml) or JSON audit spec."""
+    with open(path) as f:
+        text = f.read()
+    if Path(path).suffix.lower() in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ValueError("YAML specs need PyYAML (pip install pyyaml); use a .json spec instead")
+        spec = yaml.safe_load(text)
+    else:
+        spec = json.loads(text)
+    if not isinstance(spec, dict) or not isinstance(spec.get('analyses'), list) or not spec.get('data'):
+        raise ValueError("the spec needs 'data' and a list of 'analyses'")
+    return spec
+
+def listed(value) -> list:
+    """A spec field given as a list or a comma-separated string."""
+    if value is None:
+        return []
+    items = value.split(',') if isinstance(value, str) else value
+    return list(dict.fromkeys(str(item).strip() for item in items if str(item).strip()))
+
+def normalize(entry: dict, index: int) -> dict:
+    """Check one analysis entry and fill in its defaults."""
+    if not isinstance(entry, dict):
+        raise ValueError(f"analysis {index + 1} is not a mapping")
+    kind = entry.get('type')
+    name = str(entry.get('name') or f"{kind}-{index + 1}")
+    if kind not in ANALYSES:
+        raise ValueError(f"analysis '{name}': type must be one of {', '.join(ANALYSES)}")
+
+    analysis = dict(entry, name=name, type=kind)
+    if kind == 'disaggregate':
+        analysis['by'] = listed(entry.get('by'))
+        analysis['metric'] = listed(entry.get('metric'))
+        analysis['quantiles'] = entry.get('quantiles', 'off')
+        if not analysis['by']:
+            raise ValueError(f"analysis '{name}': disaggregate needs 'by'")
+        if analysis['quantiles'] not in list(QUANTILE_MODES) + ['off']:
+            raise ValueError(f"analysis '{name}': quantiles must be sketch, exact or off")
+        return analysis
+
+    analysis['outcome'] = listed(entry.get('outcome'))
+    analysis['count_outcomes'] = listed(entry.get('count_outcomes'))
+    if not entry.get('group') or not analysis['outcome']:
+        raise ValueError(f"analysis '{name}': {kind} needs 'group' and 'outcome'")
+    if any(outcome not in analysis['outcome'] for outcome in analysis['count_outcomes']):
+        raise ValueError(f"analysis '{name}': count_outcomes must name outcomes")
+    if kind == 'disproportionality':
+        ci = entry.get('ci') or entry.get('permutation')
+        if (len(analysis['outcome']) > 1 or analysis['count_outcomes']) and (entry.get('by_site') or ci):
+            raise ValueError(f"analysis '{name}': several outcomes or count_outcomes cannot be combined "
+                             f"with by_site or ci")
+        if ci:
+            level = entry.get('ci')
+            level = DEFAULT_CI_LEVEL if level is True or not level else float(level)
+            if not 0 < level < 1:
+                raise ValueError(f"analysis '{name}': ci must be between 0 and 1 (e.g. 0.95)")
+            analysis['ci'] = {'level': level, 'resamples': int(entry.get('resamples', DEFAULT_RESAMPLES)),
+                              'permutation': bool(entry.get('permutation')), 'seed': entry.get('seed')}
+        return analysis
+
+    if not entry.get('lea'):
+        raise ValueError(f"analysis '{name}': risk_measures needs 'lea'")
+    if not 1 <= int(entry.get('consecutive', 1)) <= 3 or int(entry.get('window', 3)) < 1:
+        raise ValueError(f"analysis '{name}': consecutive must be 1-3 and window at least 1")
+    return analysis
+
+def requirements(analysis: dict) -> list:
+    """
+    The grouped aggregations an analysis reads: (input, value column, keys,
+    quantiles) tuples. Value columns are metrics, 'is:<outcome>' (rows
+    counted as having the outcome) or 'value:<outcome>' (summed values of
+    an outcome listed in count_outcomes); None needs row counts only.
+    """
+    kind = analysis['type']
+    if kind == 'disaggregate':
+        quantiles = None if analysis['quantiles'] == 'off' else analysis['quantiles']
+        return [(metric, metric, analysis['by'], quantiles if metric else None)
+                for metric in analysis['metric'] or [None]]
+    counted = analysis['count_outcomes']
+    if kind == 'disproportionality':
+        sites = [analysis['by_site']] if analysis.get('by_site') else []
+        keys = sites + [analysis['group']]
+    else:
+        keys = [col for col in (analysis.get('year'), analysis['lea'], analysis['group']) if col]
+    return [(outcome, f"{'value' if outcome in counted else 'is'}:{outcome}", keys, None)
+            for outcome in analysis['outcome']]
+
+def serves(job: dict, column: str, keys: list, quantiles: str) -> bool:
+    """Whether a job's cell table can be rolled up to this requirement."""
+    return ((column is None or job['column'] == column)
+            and (quantiles is None or job['quantiles'] == quantiles)
+            and set(keys) <= set(job['keys']))
+
+def plan(analyses: list) -> tuple:
+    """
+    The minimal set of grouped aggregations for every analysis.
+
+    Requirements are placed richest first (quantile sketches, then larger
+    key sets); each one reuses a planned job whose keys contain its own and
+    whose value column matches (row counts come from any job), and starts
+    a new job otherwise. Returns (jobs, assignments) where assignments maps
+    each analysis name to {input: job index}.
+    """
+    needed = [(analysis['name'], *requirement) for analysis in analyses for requirement in requirements(analysis)]
+    needed.sort(key=lambda need: (need[2] is None, need[4] is None, -len(need[3])))
+
+    jobs, assignments = [], {analysis['name']: {} for analysis in analyses}
+    for name, source, column, keys, quantiles in needed:
+        index = next((i for i, job in enumerate(jobs) if serves(job, column, keys, quantiles)), None)
+        if index is None:
+            index = len(jobs)
+            jobs.append({'column': column, 'keys': list(keys), 'quantiles': quantiles, 'analyses': []})
+        if name not in jobs[index]['analyses']:
+            jobs[index]['analyses'].append(name)
+        assignments[name][source] = index
+    return jobs, assignments
+
+def input_table(cells: pd.DataFrame, column: str, quantiles: str) -> pd.DataFrame:
+    """A job's cells restricted to what one requirement asked for."""
+    if column is None:
+        return cells[['rows']]
+    return cells if quantiles or 'sketch' not in cells.columns else cells.drop(columns='sketch')
+
+def prepare(frame: pd.DataFrame, jobs: list) -> pd.DataFrame:
+    """Add the derived outcome columns ('is:' and 'value:') the jobs aggregate."""
+    derived = {}
+    for column in dict.fromkeys(job['column'] for job in jobs if job['column']):
+        prefix, _, outcome = column.partition(':')
+        if prefix == 'is' and outcome:
+            derived[column] = outcome_indicator(frame, outcome).astype('int64')
+        elif prefix == 'value' and outcome:
+            derived[column] = outcome_values(frame, outcome, count=True)
+    return frame.assign(**derived) if derived else frame
+
+def _share(frame: pd.DataFrame):
+    global _frame
+    _frame = frame
+
+def aggregate(job: dict) -> tuple:
+    """Run one planned aggregation on the shared frame; returns (cells, seconds)."""
+    start = time.perf_counter()
+    cells = group_stats(_frame, job['keys'], job['column'], job['quantiles'])
+    return cells, time.perf_counter() - start
+
+def run_parallel(function, tasks: list, workers: int, initializer=None, initargs: tuple = ()) -> list:
+    """Map `function` over tasks in worker processes (in this process for one worker or task)."""
+    if workers <= 1 or len(tasks) <= 1:
+        if initializer:
+            initializer(*initargs)
+        return [function(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=initializer,
+                             initargs=initargs) as pool:
+        return list(pool.map(function, tasks))
+
+def stream_jobs(path: str, jobs: list, usecols: list, chunksize: int, schema: dict = None) -> tuple:
+    """Fold a CSV chunk by chunk into every job's cell table in one pass; returns (cells, seconds, records)."""
+    cells = [None] * len(jobs)
+    seconds = [0.0] * len(jobs)
+    records = 0
+    for chunk in read_csv_chunks(path, chunksize, usecols=usecols, dtype=schema):
+        chunk = prepare(chunk, jobs)
+        records += len(chunk)
+        for i, job in enumerate(jobs):
+            start = time.perf_counter()
+            part = group_stats(chunk, job['keys'], job['column'], job['quantiles'])
+            cells[i] = part if cells[i] is None else merge_stats(cells[i], part)
+            seconds[i] += time.perf_counter() - start
+    return cells, seconds, records
+
+def ordered_counts(cells: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """
+    Rows and value sums per group of `keys` (missing keys dropped), in
+    first-appearance order like groupby(sort=False) on the rows.
+    """
+    order = cells.index.to_frame(index=False)[keys].dropna().drop_duplicates()
+    index = pd.MultiIndex.from_frame(order) if len(keys) > 1 else pd.Index(order[keys[0]])
+    grouped = rollup(cells, keys)
+    return pd.DataFrame({'population_n': grouped['rows'], 'outcome_n': grouped['sum']}).reindex(index)
+
+def disaggregate_report(analysis: dict, inputs: dict, records: int, source: str) -> dict:
+    """Print a disaggregation; the single-column tables are saved."""
+    by_cols = analysis['by']
+    intersections = intersection_groups(by_cols) if analysis.get('intersect') else []
+    groupings = [(col,) for col in by_cols] + [tuple(cols) for cols in intersections]
+    tables = {metric: cube(cells, groupings) for metric, cells in inputs.items()}
+
+    print_header(source, records)
+    gap_settings = {'min_n': int(analysis.get('gap_min_n', GAP_MIN_N)),
+                    'effect_size': float(analysis.get('gap_effect', GAP_EFFECT_SIZE)),
+                    'fdr': float(analysis.get('fdr', GAP_FDR))}
+    results = report_tables(tables, by_cols, intersections, analysis['metric'], bool(analysis.get('gaps')),
+                            gap_settings=gap_settings)
+    return {'sections': results['single'], 'intersections': results['intersections'],
+            'metrics': analysis['metric'],
+            'summary': {'gaps': sum(len(gaps) for gaps in results['gaps'].values())}}
+
+def disproportionality_report(analysis: dict, inputs: dict, records: int, source: str) -> dict:
+    """Print risk ratios (single outcome, per site, or an outcome matrix)."""
+    group, outcomes, ci = analysis['group'], analysis['outcome'], analysis.get('ci')
+    print(f"\nLoaded {records:,} records from {source}")
+
+    if len(outcomes) > 1 or analysis['count_outcomes']:
+        counts = pd.DataFrame({'population_n': ordered_counts(inputs[outcomes[0]], [group])['population_n']})
+        totals = {'population_n': records}
+        for outcome in outcomes:
+            counts[outcome] = ordered_counts(inputs[outcome], [group])['outcome_n']
+            totals[outcome] = rollup(inputs[outcome], []).iloc[0]['sum']
+        results = matrix_risk_ratios(counts, pd.Series(totals), outcomes, analysis['count_outcomes'])
+        print_matrix_report(results, group)
+        return {'table': matrix_table(results, group), 'index': False, 'summary': {'groups': len(counts)}}
+
+    cells = inputs[outcomes[0]]
+    site = analysis.get('by_site')
+    if site:
+        site_results = site_results_from_counts(ordered_counts(cells, [site, group]),
+                                                ordered_counts(cells, [site]), ci)
+        report_sites(site_results, outcomes[0], ci=ci)
+        return {'table': site_table(site_results), 'index': False, 'summary': {'sites': len(site_results)}}
+
+    overall = rollup(cells, []).iloc[0]
+    results = risk_ratios_from_counts(ordered_counts(cells, [group]), int(overall['rows']), int(overall['sum']), ci)
+    print_report(results, outcomes[0])
+    if ci:
+        print_interval_report(results, ci, float(analysis.get('threshold', 2.0)))
+    return {'table': risk_ratio_table(results, group), 'index': True, 'summary': {'groups': len(results)}}
+
+def risk_measures_report(analysis: dict, inputs: dict, records: int, source: str) -> dict:
+    """Print IDEA risk measures from per (year,) LEA and group counts."""
+    keys = [col for col in (analysis.get('year'), analysis['lea'], analysis['group']) if col]
+    outcomes = analysis['outcome']
+    counts = rollup(inputs[outcomes[0]], keys)[['rows']].rename(columns={'rows': 'population_n'})
+    for outcome in outcomes:
+        counts[outcome] = rollup(inputs[outcome], keys)['sum']
+    print(f"\nLoaded {records:,} student records from {source}")
+
+    tensor = measures.count_tensor(counts.reset_index(), analysis.get('year'), analysis['lea'],
+                                   analysis['group'], 'population_n', outcomes)
+    threshold = float(analysis.get('threshold', measures.DEFAULT_THRESHOLD))
+    window, consecutive = int(analysis.get('window', 3)), int(analysis.get('consecutive', 1))
+    result = measures.risk_measures(tensor, int(analysis.get('min_n', measures.DEFAULT_MIN_N)),
+                                    int(analysis.get('min_cell', measures.DEFAULT_MIN_CELL)))
+    rolling, years_over = measures.rolling_measures(result['ratio'], window, threshold)
+    table = measures.measures_table(tensor, result, rolling, years_over, consecutive)
+    measures.print_summary(table, tensor, threshold, window, consecutive)
+    return {'table': table, 'index': False, 'summary': {'identified': int(table['identified'].sum())}}
+
+REPORTS = {
+    'disaggregate': disaggregate_report,
+    'disproportionality': disproportionality_report,
+    'risk_measures': risk_measures_report,
+}
+
+def run_analysis(task: tuple) -> dict:
+    """Run one analysis from its cell tables, capturing its printed report."""
+    analysis, inputs, records, source = task
+    start = time.perf_counter()
+    report = io.StringIO()
+    with redirect_stdout(report):
+        result = REPORTS[analysis['type']](analysis, inputs, records, source)
+    return dict(result, report=report.getvalue(), seconds=time.perf_counter() - start)
+
+def save_output(result: dict, path: Path):
+    """Write an analysis's results in the format its script's --output would."""
+    if 'sections' in result:
+        save_results(result['sections'], str(path), result['intersections'], result['metrics'])
+    else:
+        result['table'].to_csv(path, index=result['index'])
+
+def print_plan(jobs: list, assignments: dict):
+    """Print the planned aggregations and which analyses read each one."""
+    print(f"\n{'='*80}")
+    print(f"AUDIT PLAN: {len(assignments)} analyses from {len(jobs)} grouped aggregations")
+    print(f"{'='*80}\n")
+    for i, job in enumerate(jobs, start=1):
+        value = job['column'] or 'row counts'
+        if job['quantiles']:
+            value += f" ({job['quantiles']} quantiles)"
+        print(f"{i:>3}. {value:<40} by {', '.join(job['keys'])}")
+        print(f"     used by: {', '.join(job['analyses'])}")
+    print()
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description='Run every analysis of an audit spec from one read of the data',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  Run a spec (reports, result tables and manifest.json in the output directory):
+    python run_audit.py audit.yaml
+
+  Show the planned aggregations without reading the data:
+    python run_audit.py audit.yaml --dry-run
+
+  Stream a large file once for every analysis:
+    python run_audit.py audit.json --chunksize 500000 --output-dir reports/
+        """
+    )
+    parser.add_argument('spec', help='Audit spec (.yaml/.yml needs PyYAML, or .json)')
+    parser.add_argument('--output-dir', help="Directory for reports (default: the spec's output_dir, "
+                                             "or audit_reports)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for aggregations and analyses (default: CPU count)')
+    parser.add_argument('--chunksize', type=int,
+                        help="Stream the CSV in chunks of this many rows (overrides the spec's chunksize)")
+    parser.add_argument('--dry-run', action='store_true', help='Print the plan and exit')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse the CSV directly without the on-disk parse cache')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='Re-parse the CSV and replace its parse cache entry')
+
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+
+    try:
+        spec = read_spec(args.spec)
+        analyses = [normalize(entry, i) for i, entry in enumerate(spec['analyses'])]
+    except FileNotFoundError:
+        print(f"Error: Spec '{args.spec}' not found")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"Error reading spec: {e}")
+        sys.exit(1)
+
+    names = [analysis['name'] for analysis in analyses]
+    repeated = sorted({name for name in names if names.count(name) > 1})
+    if repeated:
+        print(f"Error: Analysis names must be unique: {', '.join(repeated)}")
+        sys.exit(1)
+
+    # Relative paths in the spec are relative to the spec file
+    base = Path(args.spec).resolve().parent
+    data = str(base / spec['data'])
+    output_dir = Path(args.output_dir or base / spec.get('output_dir', 'audit_reports'))
+    chunksize = args.chunksize or spec.get('chunksize')
+
+    schema = None
+    if spec.get('schema'):
+        try:
+            schema = read_schema(str(base / spec['schema']))
+        except (OSError, ValueError) as e:
+            print(f"Error reading schema: {e}")
+            sys.exit(1)
+
+    jobs, assignments = plan(analyses)
+    print_plan(jobs, assignments)
+    if args.dry_run:
+        return {'jobs': jobs, 'assignments': assignments}
+
+    try:
+        columns = read_columns(data)
+    except FileNotFoundError:
+        print(f"Error: File '{data}' not found")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        sys.exit(1)
+
+    values = [job['column'].partition(':')[2] if ':' in (job['column'] or '') else job['column'] for job in jobs]
+    keys = list(dict.fromkeys(key for job in jobs for key in job['keys']))
+    needed = list(dict.fromkeys(keys + [value for value in values if value]))
+    for analysis in analyses:
+        referenced = [col for source, _, cols, _ in requirements(analysis) for col in cols + [source]]
+        missing = [col for col in referenced if col and col not in columns]
+        if missing:
+            print(f"Error: Analysis '{analysis['name']}': columns not found: {', '.join(dict.fromkeys(missing))}")
+            print(f"Available columns: {', '.join(columns)}")
+            sys.exit(1)
+
+    # One read of the data for every analysis
+    phases = {}
+    try:
+        if chunksize:
+            cells, seconds, records = stream_jobs(data, jobs, needed, chunksize, schema)
+            phases['load_and_aggregate'] = time.perf_counter() - started
+        else:
+            outcomes = [value for job, value in zip(jobs, values) if ':' in (job['column'] or '')]
+            frame = load_csv(data, columns=needed, categorical=[col for col in keys if col not in values],
+                             outcomes=list(dict.fromkeys(outcomes)), schema=schema,
+                             use_cache=not args.no_cache, rebuild=args.rebuild_cache)
+            frame = prepare(frame, jobs)
+            records = len(frame)
+            phases['load'] = time.perf_counter() - started
+            mark = time.perf_counter()
+            cells, seconds = zip(*run_parallel(aggregate, jobs, args.workers, _share, (frame,))) if jobs else ((), ())
+            phases['aggregate'] = time.perf_counter() - mark
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        sys.exit(1)
+
+    # Analyses are independent once their cell tables exist
+    mark = time.perf_counter()
+    tasks = []
+    for analysis in analyses:
+        inputs = {}
+        for source, column, _, quantiles in requirements(analysis):
+            inputs[source] = input_table(cells[assignments[analysis['name']][source]], column, quantiles)
+        tasks.append((analysis, inputs, records, data))
+    results = run_parallel(run_analysis, tasks, args.workers)
+    phases['analyze'] = time.perf_counter() - mark
+
+    # Write every report together
+    mark = time.perf_counter()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stages = []
+    for analysis, result in zip(analyses, results):
+        report_path = output_dir / f"{analysis['name']}.txt"
+        report_path.write_text(result['report'])
+        table_path = output_dir / (analysis.get('output') or f"{analysis['name']}.csv")
+        save_output(result, table_path)
+        stages.append({'name': analysis['name'], 'type': analysis['type'],
+                       'seconds': round(result['seconds'], 4),
+                       'outputs': [report_path.name, table_path.name], **result['summary']})
+    (output_dir / 'report.txt').write_text(''.join(result['report'] for result in results))
+    phases['write'] = time.perf_counter() - mark
+
+    manifest = {
+        'spec': str(Path(args.spec).resolve()),
+        'data': data,
+        'records': records,
+        'workers': args.workers,
+        'chunksize': chunksize,
+        'plan': [{'keys': job['keys'], 'column': job['column'], 'quantiles': job['quantiles'],
+                  'cells': len(table), 'seconds': round(job_seconds, 4), 'analyses': job['analyses']}
+                 for job, table, job_seconds in zip(jobs, cells, seconds)],
+        'stages': stages,
+        'phases': {name: round(value, 4) for name, value in phases.items()},
+        'total_seconds': round(time.perf_counter() - started, 4),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    with open(output_dir / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Ran {len(analyses)} analyses on {records:,} records in {manifest['total_seconds']:.2f}s")
+    for stage in stages:
+        print(f"  {stage['name']:<30} {stage['seconds']:>8.3f}s  {', '.join(stage['outputs'])}")
+    print(f"Reports saved to: {output_dir}")
+    return manifest
+
+if __name__ == '__main__':
+    main()
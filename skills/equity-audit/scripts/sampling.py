@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Stratified Preview Sampling
+Approximate counts, means and risk ratios with error bars from a sample
+
+For exploratory work on very large files, `--sample` answers from a
+stratified sample instead of every row. Each stratum (one combination of
+the grouping columns, missing values included) keeps the rows with the
+smallest random keys: a uniform sample without replacement. Every
+stratum gets the same reservoir size, so small groups are
+over-represented (a group smaller than its reservoir is kept whole and
+is exact) and large groups are cut down.
+
+The referenced columns are read through the parse cache, as in exact
+mode, and the sample is drawn in one vectorized pass, so a preview never
+costs more than the exact run. With a chunk size the file is streamed
+instead: each chunk is first cut down to its own smallest keys per
+stratum and only those rows are merged into the reservoirs, whose size
+starts at the whole budget and shrinks as strata appear, so memory stays
+near the budget.
+
+Stratum sizes are counted exactly during the pass, so group row counts
+and population shares are exact. Means, metric value counts and outcome
+rates are stratified estimates weighted by stratum size, each with a
+normal-approximation margin of error (95% by default, with the finite
+population correction). Risk ratio intervals use the delta method on
+the log ratio.
+
+Every estimate should be confirmed by rerunning the same command without
+--sample (with --chunksize for files larger than memory).
+
+Usage:
+    from sampling import estimate_groups, parse_sample, stratified_sample, stratum_table
+
+    sample, sizes = stratified_sample('students.csv', ['race', 'ell'], ['race', 'ell', 'gpa'],
+                                      parse_sample('50k'), seed=7)
+    strata = stratum_table(sample, sizes, ['race', 'ell'], 'gpa')
+    by_race = estimate_groups(strata, ['race'])
+"""
+
+import os
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from aggregates import group_codes, read_csv_chunks
+from parse_cache import load_csv
+
+# Every stratum keeps at least this many rows, whatever the budget
+MIN_STRATUM_ROWS = 50
+
+# Confidence level of the reported margins of error
+SAMPLE_LEVEL = 0.95
+
+# Bytes read from the start of the file to estimate its row count
+ROW_ESTIMATE_BYTES = 1024 * 1024
+
+def parse_sample(text: str):
+    """
+    Parse a --sample value: a fraction of the rows (0 < f < 1, e.g. 0.01)
+    or a row count (e.g. 50000, 50k, 1m).
+    """
+    value = str(text).strip().lower().replace('_', '').replace(',', '')
+    scale = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    number = float(value.rstrip('km')) * scale
+    if 0 < number < 1 and scale == 1:
+        return number
+    if number >= 1 and number == int(number):
+        return int(number)
+    raise ValueError(f"--sample must be a fraction between 0 and 1 or a row count, got '{text}'")
+
+def estimate_rows(path: str) -> int:
+    """Estimate a CSV file's data rows from the line length of its first megabyte."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        head = f.read(ROW_ESTIMATE_BYTES)
+    lines = max(head.count(b'\n'), 1)
+    return max(int(size / (len(head) / lines)) - 1, 1)
+
+def stratum_sizes(frame: pd.DataFrame, strata: list, codes: np.ndarray) -> pd.Series:
+    """
+    Rows per stratum, indexed as groupby(strata, dropna=False, sort=False),
+    from the frame's group codes (see aggregates.group_codes).
+    """
+    first = np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1))
+    labels = frame[strata].iloc[first].assign(rows=np.bincount(codes, minlength=len(first)))
+    return labels.groupby(strata, dropna=False, sort=False, observed=True)['rows'].sum()
+
+def smallest_keys(codes: np.ndarray, keys: np.ndarray, capacity: int) -> np.ndarray:
+    """
+    Mask of the rows holding the `capacity` smallest keys (in [0, 1)) of
+    their stratum (`codes`, numbered from 0).
+    """
+    sizes = np.bincount(codes)
+    # Only keys below a cutoff a few deviations past capacity / size are
+    # sorted; a stratum with too few keys below it is sorted in full
+    below = keys < ((capacity + 6 * np.sqrt(capacity) + 10) / sizes)[codes]
+    short = np.bincount(codes[below], minlength=len(sizes)) < np.minimum(sizes, capacity)
+    rows = np.flatnonzero(below | short[codes]) if short.any() else np.flatnonzero(below)
+
+    # One sort by stratum, then key: keys / 2 can never round up into the next stratum
+    order = rows[np.argsort(codes[rows] + keys[rows] / 2)]
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.append(starts, len(order))))
+    mask = np.zeros(len(codes), dtype=bool)
+    mask[order[rank < capacity]] = True
+    return mask
+
+def stratified_sample(path: str, strata: list, usecols: list, sample, chunksize: int = None,
+                      dtype: dict = None, seed: int = None, use_cache: bool = True,
+                      rebuild: bool = False) -> tuple:
+    """
+    A per-stratum reservoir of at most about `sample` rows in total (a row
+    count, or a fraction of the rows), read through the parse cache, or
+    in one streaming pass over chunks of `chunksize` rows.
+
+    Returns (sampled rows of `usecols`, exact rows per stratum as a Series
+    indexed by the strata, missing values kept as their own stratum).
+    """
+    rng = np.random.default_rng(seed)
+    categorical = [col for col in strata if col not in usecols]
+    usecols = list(dict.fromkeys(strata + usecols))
+
+    if not chunksize:
+        df = load_csv(path, columns=usecols, categorical=categorical, schema=dtype,
+                      use_cache=use_cache, rebuild=rebuild)
+        codes = group_codes(df, strata)
+        sizes = stratum_sizes(df, strata, codes)
+        budget = sample if isinstance(sample, int) else max(int(sample * len(df)), 1)
+        capacity = max(MIN_STRATUM_ROWS, budget // max(len(sizes), 1))
+        kept = df[smallest_keys(codes, rng.random(len(df)), capacity)]
+        return kept.reset_index(drop=True), sizes
+
+    budget = sample if isinstance(sample, int) else max(int(sample * estimate_rows(path)), 1)
+    kept, sizes = None, None
+    for chunk in read_csv_chunks(path, chunksize, usecols=usecols, dtype=dtype):
+        codes = group_codes(chunk, strata)
+        part = stratum_sizes(chunk, strata, codes)
+        sizes = part if sizes is None else sizes.add(part, fill_value=0).astype(np.int64)
+        capacity = max(MIN_STRATUM_ROWS, budget // len(sizes))
+
+        # Only a chunk's own smallest keys can make a stratum's reservoir
+        keys = rng.random(len(chunk))
+        mask = smallest_keys(codes, keys, capacity)
+        chunk = chunk[mask].assign(_key=keys[mask])
+        kept = chunk if kept is None else pd.concat([kept, chunk], ignore_index=True)
+        kept = kept[smallest_keys(group_codes(kept, strata), kept['_key'].to_numpy(), capacity)]
+
+    if kept is None:
+        return pd.DataFrame(columns=usecols), pd.Series(dtype=np.int64)
+    return kept.drop(columns='_key').reset_index(drop=True), sizes
+
+def stratum_table(sample: pd.DataFrame, sizes: pd.Series, strata: list, value_col: str = None,
+                  values: pd.Series = None) -> pd.DataFrame:
+    """
+    Per-stratum rows (exact), sampled rows, sampled values, and the mean
+    and variance of the values: `value_col` of the sample, or `values`
+    aligned with it (e.g. an outcome indicator).
+    """
+    if values is None:
+        values = sample[value_col] if value_col else pd.Series(0.0, index=sample.index)
+    grouped = pd.to_numeric(values, errors='coerce').astype(float).groupby(
+        [sample[col] for col in strata], dropna=False, sort=False)
+    table = grouped.agg(['size', 'count', 'mean', 'var'])
+    table.columns = ['sampled', 'values', 'mean', 'var']
+    table['rows'] = sizes.reindex(table.index).to_numpy()
+    return table
+
+def _margin_factor(level: float) -> float:
+    """Standard normal quantile for a two-sided interval at `level`."""
+    return NormalDist().inv_cdf(0.5 + level / 2)
+
+def stratum_variances(table: pd.DataFrame) -> tuple:
+    """
+    Per stratum: (estimated value count, its variance, variance of the
+    mean). A stratum kept whole has no sampling error.
+    """
+    rows, sampled, values = table['rows'], table['sampled'], table['values']
+    fpc = (1 - sampled / rows).clip(lower=0.0)
+    share = values / sampled
+    count = rows * share
+    count_var = rows ** 2 * share * (1 - share) / sampled * fpc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_var = (table['var'] / values * fpc).where(fpc > 0, 0.0)
+    return count, count_var, mean_var
+
+def estimate_groups(table: pd.DataFrame, keys: list, level: float = SAMPLE_LEVEL) -> pd.DataFrame:
+    """
+    Roll a stratum table up to the groups of `keys` (rows with a missing
+    key dropped): exact rows, estimated value count and mean, and their
+    margins of error at `level`.
+    """
+    count, count_var, mean_var = stratum_variances(table)
+    parts = pd.DataFrame({
+        'rows': table['rows'], 'sampled': table['values'], 'count': count, 'count_var': count_var,
+        'weighted': count * table['mean'].fillna(0.0), 'mean_var': count ** 2 * mean_var.fillna(0.0),
+    })
+    names = list(table.index.names)
+    grouped = parts.groupby([table.index.get_level_values(names.index(key)) for key in keys],
+                            dropna=True, sort=True, observed=True).sum()
+    z = _margin_factor(level)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = grouped['weighted'] / grouped['count']
+        mean_margin = z * np.sqrt(grouped['mean_var']) / grouped['count']
+    grouped.index.names = keys
+    return pd.DataFrame({
+        'rows': grouped['rows'].astype(np.int64),
+        'sampled': grouped['sampled'].astype(np.int64),
+        'count': grouped['count'],
+        'count_margin': z * np.sqrt(grouped['count_var']),
+        'mean': mean,
+        'mean_margin': mean_margin,
+    })
+
+def estimate_risk_ratios(table: pd.DataFrame, level: float = SAMPLE_LEVEL) -> pd.DataFrame:
+    """
+    Risk ratios (group outcome rate over the overall rate) from a stratum
+    table of a 0/1 outcome indicator with one stratum per group (missing
+    group included in the overall rate), with delta-method intervals.
+    """
+    rows = table['rows'].to_numpy(dtype=float)
+    rate = table['mean'].fillna(0.0).to_numpy()
+    rate_var = np.nan_to_num(table['var'].fillna(0.0).to_numpy() / table['values'].to_numpy()
+                             * (1 - table['sampled'].to_numpy() / rows).clip(min=0.0))
+    weight = rows / rows.sum()
+    overall = (weight * rate).sum()
+
+    # d log(rate_g / overall) / d rate_h, for every group g and stratum h
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gradient = -np.tile(weight / overall, (len(rate), 1))
+        gradient[np.diag_indices(len(rate))] += 1 / rate
+        log_sd = np.sqrt((gradient ** 2 * rate_var).sum(axis=1))
+        ratio = np.where(overall > 0, rate / overall, 0.0)
+    z = _margin_factor(level)
+    low = np.where(rate > 0, ratio * np.exp(-z * log_sd), 0.0)
+    high = np.where(rate > 0, ratio * np.exp(z * log_sd), np.nan)
+
+    result = pd.DataFrame({
+        'population_n': table['rows'].astype(np.int64), 'sampled_n': table['sampled'].astype(np.int64),
+        'outcome_n': rows * rate, 'outcome_rate': rate, 'risk_ratio': ratio,
+        'ci_low': low, 'ci_high': high,
+    }, index=table.index)
+    result.attrs['overall_rate'] = overall
+    return result
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+SQLite Source
+Pushes equity-audit aggregations down into a SQLite database
+
+Instead of dumping a table to CSV and loading it into pandas, the
+per-group counts, sums, sums of squares, minima and maxima are computed by
+SQLite with one GROUP BY, so only the small aggregate result crosses into
+Python. A 20M-row table is audited without ever being held in memory.
+
+The source is a table name or any SELECT query. The database is opened
+read-only.
+
+Usage:
+    from sqlite_source import sqlite_cells, sqlite_counts, table_source
+
+    cells, records = sqlite_cells('sis.db', table_source(table='students'), ['race', 'gender'], 'gpa')
+    counts = sqlite_counts('sis.db', table_source(query='SELECT * FROM discipline WHERE year = 2024'),
+                           ['race'], 'suspended')
+"""
+
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+
+from aggregates import METRIC_STATS, QUANTILE_MODES, group_codes
+from sketches import group_sketches, merge_sketches
+
+# Rows per batch when values have to leave the database (quantile sketches)
+SKETCH_CHUNKSIZE = 500_000
+
+# Values counted as "has the outcome", matching outcome_indicator on parsed CSVs
+TRUE_VALUES = ('1', '1.0', 'True', 'true', 'TRUE')
+
+def quote(name: str) -> str:
+    """Quote an SQL identifier."""
+    return '"' + name.replace('"', '""') + '"'
+
+def table_source(table: str = None, query: str = None) -> str:
+    """The FROM clause for a table name or a SELECT query."""
+    if query:
+        return f"({query.strip().rstrip(';')})"
+    return quote(table)
+
+def connect(db: str) -> sqlite3.Connection:
+    """Open the database read-only (fails if it does not exist)."""
+    return sqlite3.connect(Path(db).resolve().as_uri() + '?mode=ro', uri=True)
+
+def sqlite_columns(db: str, source: str) -> list:
+    """Column names of a table or query, without reading any rows."""
+    with closing(connect(db)) as conn:
+        cursor = conn.execute(f"SELECT * FROM {source} LIMIT 0")
+        return [column[0] for column in cursor.description]
+
+def sqlite_cells(db: str, source: str, keys: list, metric_col: str = None) -> tuple:
+    """
+    Per-group partial aggregates (see aggregates.group_stats), computed in SQL.
+
+    Rows with missing keys are kept as their own groups, as in group_stats.
+    Sums of squares are taken around a shift value (the first non-missing
+    metric value) so the centered m2 does not lose precision to cancellation.
+    Returns (cells, total_records).
+    """
+    key_sql = ', '.join(quote(col) for col in keys)
+    select = ["COUNT(*)"]
+
+    with closing(connect(db)) as conn:
+        if metric_col:
+            metric = quote(metric_col)
+            row = conn.execute(f"SELECT {metric} FROM {source} WHERE {metric} IS NOT NULL LIMIT 1").fetchone()
+            shift = float(row[0]) if row else 0.0
+            select += [f"COUNT({metric})", f"SUM({metric} - ?)", f"SUM(({metric} - ?) * ({metric} - ?))",
+                       f"MIN({metric})", f"MAX({metric})"]
+            params = (shift, shift, shift)
+        else:
+            params = ()
+        sql = f"SELECT {key_sql}, {', '.join(select)} FROM {source} GROUP BY {key_sql}"
+        result = conn.execute(sql, params).fetchall()
+
+    names = keys + ['rows'] + (['count', 'shifted_sum', 'shifted_sumsq', 'min', 'max'] if metric_col else [])
+    cells = pd.DataFrame.from_records(result, columns=names).set_index(keys)
+    cells = cells.astype({'rows': 'int64'})
+
+    if metric_col:
+        count = cells['count'].astype('int64')
+        shifted_sum = cells['shifted_sum'].astype(float).fillna(0.0)
+        shifted_sumsq = cells['shifted_sumsq'].astype(float).fillna(0.0)
+        cells['count'] = count
+        cells['sum'] = shifted_sum + count * shift
+        cells['m2'] = (shifted_sumsq - shifted_sum ** 2 / count.where(count > 0)).fillna(0.0).clip(lower=0.0)
+        cells = cells[['rows'] + METRIC_STATS].astype({'min': float, 'max': float})
+
+    return cells, int(cells['rows'].sum())
+
+def sqlite_sketches(db: str, source: str, keys: list, metric_cols: list, quantiles: str) -> dict:
+    """
+    Per-group quantile sketches of each metric (see sketches.py).
+
+    SQL has no mergeable quantile aggregate, so unlike the other queries
+    here this reads every row: the key and metric columns are streamed out
+    once in batches and folded into sketches (the counts and sums come
+    from sqlite_cells). Memory stays at one batch plus the sketches.
+    Returns {metric: sketches}, each Series indexed like sqlite_cells.
+    """
+    columns = ', '.join(quote(col) for col in dict.fromkeys(keys + metric_cols))
+    sketches = {}
+    with closing(connect(db)) as conn:
+        for chunk in pd.read_sql_query(f"SELECT {columns} FROM {source}", conn, chunksize=SKETCH_CHUNKSIZE):
+            groups = chunk.groupby(keys, dropna=False, observed=True, sort=False).size().index
+            codes = group_codes(chunk, keys)
+            for metric in metric_cols:
+                values = pd.to_numeric(chunk[metric], errors='coerce').to_numpy(dtype=float, na_value=float('nan'))
+                part = pd.Series(group_sketches(values, codes, len(groups), QUANTILE_MODES[quantiles]),
+                                 index=groups, dtype=object)
+                if metric in sketches:
+                    part = pd.concat([sketches[metric], part]).groupby(
+                        level=keys, dropna=False, observed=True, sort=False).agg(merge_sketches)
+                sketches[metric] = part
+    return sketches
+
+def sqlite_counts(db: str, source: str, keys: list, outcome_col: str) -> pd.DataFrame:
+    """
+    Population and outcome counts per key combination, computed in SQL.
+
+    Rows with missing keys are kept (index value None) so callers can
+    still take totals over every row. Groups of a table come back in
+    first-appearance order, like count_outcomes on the CSV.
+    """
+    key_sql = ', '.join(quote(col) for col in keys)
+    outcome = quote(outcome_col)
+    values = ', '.join(f"'{value}'" for value in TRUE_VALUES)
+    sql = (f"SELECT {key_sql}, COUNT(*), "
+           f"SUM(CASE WHEN {outcome} = 1 OR CAST({outcome} AS TEXT) IN ({values}) THEN 1 ELSE 0 END) "
+           f"FROM {source} GROUP BY {key_sql}")
+
+    result = grouped_rows(db, source, sql)
+    counts = pd.DataFrame.from_records(result, columns=keys + ['population_n', 'outcome_n'])
+    return counts.set_index(keys).astype('int64')
+
+def sqlite_outcome_matrix(db: str, source: str, group_col: str, outcome_cols: list, count_cols: list = ()) -> tuple:
+    """
+    Counts for several outcomes in one GROUP BY (see count_outcome_matrix).
+
+    Outcomes count rows with the outcome as in sqlite_counts; outcomes in
+    `count_cols` sum their numeric values instead. Returns (counts, totals)
+    with totals taken over every row.
+    """
+    values = ', '.join(f"'{value}'" for value in TRUE_VALUES)
+    true_values = ', '.join(f"'{value}'" for value in TRUE_VALUES[2:])
+    select = []
+    for col in outcome_cols:
+        if col in count_cols:
+            value = (f"CASE WHEN CAST({quote(col)} AS TEXT) IN ({true_values}) THEN 1 "
+                     f"WHEN typeof({quote(col)}) IN ('integer', 'real') THEN {quote(col)} ELSE 0 END")
+        else:
+            value = f"CASE WHEN {quote(col)} = 1 OR CAST({quote(col)} AS TEXT) IN ({values}) THEN 1 ELSE 0 END"
+        select.append(f"SUM({value})")
+    sql = (f"SELECT {quote(group_col)}, COUNT(*), {', '.join(select)} "
+           f"FROM {source} GROUP BY {quote(group_col)}")
+
+    names = [group_col, 'population_n'] + outcome_cols
+    frame = pd.DataFrame.from_records(grouped_rows(db, source, sql), columns=names).set_index(group_col)
+    counts = frame.loc[frame.index.notna()]
+    return counts, frame.sum()
+
+def grouped_rows(db: str, source: str, sql: str) -> list:
+    """
+    Run a GROUP BY query; groups of a table come back in first-appearance
+    order, groups of a query in SQLite's order.
+    """
+    with closing(connect(db)) as conn:
+        try:
+            if source.startswith('('):
+                raise sqlite3.OperationalError('queries have no rowid')
+            return conn.execute(f"{sql} ORDER BY MIN(rowid)").fetchall()
+        except sqlite3.OperationalError:  # a query, or a WITHOUT ROWID table
+            return conn.execute(sql).fetchall()
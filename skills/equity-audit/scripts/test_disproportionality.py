@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Parity test for calculate_risk_ratios
+
+The grouped calculation in disproportionality.py replaced a loop that
+filtered the frame once per group. This test keeps that loop as the
+reference and checks that both give the same results, in the same group
+order, on randomized frames: boolean, 0/1/2, float with NaN and string
+outcomes, with and without missing groups.
+
+Usage:
+    python -m pytest test_disproportionality.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from disproportionality import calculate_risk_ratios
+
+GROUPS = ['Black', 'White', 'Hispanic/Latino', 'Asian', 'Multiracial', 'Native American']
+
+
+def reference_risk_ratios(df: pd.DataFrame, group_col: str, outcome_col: str) -> dict:
+    """The per-group loop calculate_risk_ratios used before the grouped pass."""
+    results = {}
+
+    total_population = len(df)
+
+    # Handle boolean or numeric outcome column
+    if df[outcome_col].dtype == bool:
+        total_with_outcome = df[outcome_col].sum()
+    else:
+        total_with_outcome = len(df[df[outcome_col] == 1])
+
+    for group in df[group_col].unique():
+        if pd.isna(group):
+            continue
+
+        group_mask = df[group_col] == group
+        group_population = group_mask.sum()
+
+        if df[outcome_col].dtype == bool:
+            group_with_outcome = df[group_mask & df[outcome_col]].shape[0]
+        else:
+            group_with_outcome = df[group_mask & (df[outcome_col] == 1)].shape[0]
+
+        # Percentage of group in population
+        pop_pct = (group_population / total_population) * 100 if total_population > 0 else 0
+
+        # Percentage of group in outcome
+        if total_with_outcome > 0:
+            outcome_pct = (group_with_outcome / total_with_outcome) * 100
+        else:
+            outcome_pct = 0
+
+        # Risk ratio
+        if pop_pct > 0:
+            risk_ratio = outcome_pct / pop_pct
+        else:
+            risk_ratio = 0
+
+        # Composition index (alternative measure)
+        if group_population > 0:
+            group_outcome_rate = (group_with_outcome / group_population) * 100
+        else:
+            group_outcome_rate = 0
+
+        results[str(group)] = {
+            'population_n': int(group_population),
+            'population_pct': round(pop_pct, 1),
+            'outcome_n': int(group_with_outcome),
+            'outcome_pct': round(outcome_pct, 1),
+            'outcome_rate': round(group_outcome_rate, 1),
+            'risk_ratio': round(risk_ratio, 2)
+        }
+
+    return results
+
+
+def random_outcome(kind: str, rows: int, rng: np.random.Generator) -> pd.Series:
+    """An outcome column of the given kind."""
+    if kind == 'bool':
+        return pd.Series(rng.random(rows) < rng.random())
+    if kind == 'codes':
+        return pd.Series(rng.choice([0, 1, 2], size=rows, p=[0.6, 0.3, 0.1]))
+    if kind == 'nan':
+        values = rng.choice([0.0, 1.0], size=rows)
+        values[rng.random(rows) < 0.2] = np.nan
+        return pd.Series(values)
+    return pd.Series(rng.choice(['1', '0', 'yes', 'no'], size=rows))
+
+
+def random_frame(kind: str, missing_groups: bool, rng: np.random.Generator) -> pd.DataFrame:
+    """A frame of random size and group mix, optionally with missing group values."""
+    rows = int(rng.integers(0, 400))
+    groups = rng.choice(GROUPS[:int(rng.integers(1, len(GROUPS) + 1))], size=rows).astype(object)
+    if missing_groups and rows:
+        groups[rng.random(rows) < 0.15] = None
+    return pd.DataFrame({'race': groups, 'outcome': random_outcome(kind, rows, rng)})
+
+
+@pytest.mark.parametrize('kind', ['bool', 'codes', 'nan', 'string'])
+@pytest.mark.parametrize('missing_groups', [False, True])
+def test_matches_reference_loop(kind, missing_groups):
+    rng = np.random.default_rng([len(kind), missing_groups])
+    for _ in range(40):
+        df = random_frame(kind, missing_groups, rng)
+        expected = reference_risk_ratios(df, 'race', 'outcome')
+        result = calculate_risk_ratios(df, 'race', 'outcome')
+        assert list(result) == list(expected)
+        assert result == expected
+
+
+def test_all_groups_missing():
+    df = pd.DataFrame({'race': [None, None], 'outcome': [1, 0]})
+    assert calculate_risk_ratios(df, 'race', 'outcome') == reference_risk_ratios(df, 'race', 'outcome') == {}
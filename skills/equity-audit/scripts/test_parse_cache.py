@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Role regression test for the parse cache
+
+The cache stores each column as it was first parsed. A column first
+loaded as a grouping key is cached as `category`, so its True/False
+values are text; loaded later as an outcome it must still count the same
+rows as a fresh parse.
+
+Usage:
+    python -m pytest test_parse_cache.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import parse_cache
+from disproportionality import calculate_risk_ratios
+
+
+@pytest.fixture
+def roster(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, 'CACHE_DIR', tmp_path / 'cache')
+    rng = np.random.default_rng(5)
+    rows = 500
+    path = tmp_path / 'students.csv'
+    pd.DataFrame({
+        'race': rng.choice(['Black', 'White', 'Asian'], size=rows),
+        'ell': rng.random(rows) < 0.2,
+        'sped': rng.choice([0, 1], size=rows),
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize('outcome', ['ell', 'sped'])
+def test_grouping_key_then_outcome(roster, outcome):
+    columns = ['race', outcome]
+    parse_cache.load_csv(roster, columns, categorical=columns)
+    cached = parse_cache.load_csv(roster, columns, categorical=['race'], outcomes=[outcome])
+    fresh = parse_cache.load_csv(roster, columns, categorical=['race'], outcomes=[outcome], use_cache=False)
+
+    assert cached[outcome].tolist() == fresh[outcome].tolist()
+    expected = calculate_risk_ratios(fresh, 'race', outcome)
+    assert calculate_risk_ratios(cached, 'race', outcome) == expected
+    assert sum(group['outcome_n'] for group in expected.values()) > 0
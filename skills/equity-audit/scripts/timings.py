@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Phase Timings
+Per-phase wall time and peak memory for the equity-audit scripts
+
+The scripts call `lap(phase)` at the end of each phase (load, group,
+gaps, render, output); the time since the previous lap is charged to that
+phase, so phases that interleave (rendering one table, then finding its
+gaps) accumulate correctly. Nothing is recorded unless `start` was
+called, which the scripts do when given --timings FILE; the JSON is
+written by `stop` or when the process exits.
+
+Usage:
+    import timings
+
+    timings.start('timings.json')
+    df = load_csv(path)
+    timings.lap('load')
+"""
+
+import atexit
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_state = {'path': None, 'last': None, 'phases': {}, 'peak_rss_mb': {}}
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in megabytes."""
+    # Linux: VmHWM is reset on exec, unlike ru_maxrss which can carry over
+    # a parent's peak into a child started with fork + exec
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def start(path: str):
+    """Begin recording phases; results are written to `path` at exit (or by `stop`)."""
+    if _state['path'] is None:
+        atexit.register(stop)
+    _state.update(path=path, last=time.perf_counter(), phases={}, peak_rss_mb={})
+
+def lap(phase: str):
+    """Charge the time since the previous lap to `phase`."""
+    if _state['path'] is None:
+        return
+    now = time.perf_counter()
+    _state['phases'][phase] = _state['phases'].get(phase, 0.0) + now - _state['last']
+    _state['peak_rss_mb'][phase] = peak_rss_mb()
+    _state['last'] = now
+
+def results() -> dict:
+    """Recorded phases (seconds), the peak RSS after each, and the overall peak."""
+    return {
+        'phases': {name: round(seconds, 4) for name, seconds in _state['phases'].items()},
+        'peak_rss_mb_after': dict(_state['peak_rss_mb']),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def stop():
+    """Write the recorded timings as JSON and stop recording."""
+    if _state['path'] is None:
+        return
+    with open(_state['path'], 'w') as f:
+        json.dump(results(), f, indent=2)
+    _state['path'] = None
+    atexit.unregister(stop)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Audit Watcher
+Reruns audit specs whose input files changed, and only those
+
+Refreshed CSVs land in a shared folder through the week. This watcher
+polls the audit specs it is given (run_audit.py specs, or directories of
+them) and every file they read: the spec itself, its data file and its
+schema. A file counts as changed only when its content hash (SHA-256)
+changes; the hash is recomputed only when the size or modification time
+moved, so an unchanged folder costs one stat per file. A spec reruns when
+the fingerprint of its inputs differs from its last successful run, so
+audits of untouched files keep their outputs, and the parse cache
+still serves the columns of unchanged files to the audits that do rerun.
+
+Files modified within the last --settle seconds are left for the next
+cycle, so a CSV still being copied is never read half-written. Each rerun
+writes a complete run directory under .<output_dir>.versions next to the
+output directory, and the output directory is a symlink switched to the
+new run with one atomic rename. Readers see the previous run or the new
+one, never a mix of the two. The replaced runs are then deleted, with
+the outputs of analyses removed from the spec. An output directory that
+is still a plain directory (written by run_audit.py itself) is moved
+into the versions directory on its first publish.
+
+Each cycle logs what changed, what ran and how long each step took, and
+with --log appends the same record as one JSON line. The fingerprints
+are kept in a state file (default .audit-watch.json in the current
+directory), so a restarted watcher only reruns what changed while it was
+stopped.
+
+Usage:
+    python watch_audits.py audits/                      # every spec in audits/
+    python watch_audits.py weekly.yaml board.json --interval 60 --log watch.jsonl
+    python watch_audits.py audits/ --once               # one cycle (e.g. from cron)
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+import run_audit
+
+SPEC_SUFFIXES = ('.yaml', '.yml', '.json')
+DEFAULT_INTERVAL = 10.0
+DEFAULT_SETTLE = 2.0
+DEFAULT_STATE = '.audit-watch.json'
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+def find_specs(paths: list) -> list:
+    """Spec files given directly or found (non-recursively) in the given directories."""
+    specs = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            specs += sorted(child for child in path.iterdir()
+                            if child.suffix.lower() in SPEC_SUFFIXES and not child.name.startswith('.'))
+        else:
+            specs.append(path)
+    return list(dict.fromkeys(spec.resolve() for spec in specs))
+
+def spec_inputs(spec_path: Path) -> tuple:
+    """The files a spec reads (spec, data, schema) and its output directory."""
+    spec = run_audit.read_spec(str(spec_path))
+    base = spec_path.parent
+    inputs = [spec_path, (base / spec['data']).resolve()]
+    if spec.get('schema'):
+        inputs.append((base / spec['schema']).resolve())
+    # Not resolved: the output directory is a symlink to the current run
+    return inputs, Path(os.path.abspath(base / spec.get('output_dir', 'audit_reports')))
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def check_file(path: Path, known: dict, settle: float) -> tuple:
+    """
+    (digest, rehashed) for a file, reusing the known digest while its size
+    and modification time are unchanged. The digest is None when the file
+    is missing or was modified less than `settle` seconds ago.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None, False
+    if time.time() - stat.st_mtime < settle:
+        return None, False
+    entry = known.get(str(path))
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256'], False
+    digest = file_digest(path)
+    known[str(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+    return digest, True
+
+def read_state(path: Path) -> dict:
+    """The saved file digests and last-run fingerprints (empty on first run)."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        state = {}
+    return {'files': state.get('files', {}), 'runs': state.get('runs', {})}
+
+def write_atomic(path: Path, text: str):
+    """Write a file through a temporary sibling and an atomic rename."""
+    temp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    temp.write_text(text)
+    os.replace(temp, path)
+
+def versions_dir(output_dir: Path) -> Path:
+    """Where the runs an output directory links to are kept."""
+    return output_dir.with_name(f".{output_dir.name}.versions")
+
+def publish(staging: Path, output_dir: Path) -> list:
+    """
+    Switch the output directory (a symlink) to a finished run in one atomic
+    rename, then delete the runs it replaced.
+    """
+    names = sorted(child.name for child in staging.iterdir())
+    link = output_dir.with_name(f".{output_dir.name}.link-{os.getpid()}")
+    link.unlink(missing_ok=True)
+    link.symlink_to(os.path.relpath(staging, output_dir.parent), target_is_directory=True)
+    if output_dir.is_dir() and not output_dir.is_symlink():
+        output_dir.rename(staging.with_name(f"original-{os.getpid()}"))
+    os.replace(link, output_dir)
+    for old in staging.parent.iterdir():
+        if old != staging:
+            shutil.rmtree(old, ignore_errors=True)
+    return names
+
+def run_spec(spec_path: Path, output_dir: Path, options: list) -> dict:
+    """
+    Run one spec into a new run directory and publish it.
+
+    Returns the run record: seconds, records and outputs, or the error and
+    the tail of the report when run_audit failed.
+    """
+    staging = versions_dir(output_dir) / f"run-{time.time_ns()}-{os.getpid()}"
+    start = time.perf_counter()
+    report = io.StringIO()
+    try:
+        with redirect_stdout(report):
+            manifest = run_audit.main([str(spec_path), '--output-dir', str(staging)] + options)
+        outputs = publish(staging, output_dir)
+    except (SystemExit, Exception) as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        lines = report.getvalue().strip().splitlines()
+        error = str(e) if not isinstance(e, SystemExit) else lines[-1] if lines else 'run_audit exited'
+        return {'ok': False, 'seconds': round(time.perf_counter() - start, 4), 'error': error}
+    return {'ok': True, 'seconds': round(time.perf_counter() - start, 4), 'records': manifest['records'],
+            'phases': manifest['phases'], 'outputs': len(outputs)}
+
+def cycle(paths: list, state: dict, settle: float, options: list) -> dict:
+    """One poll: hash what moved, rerun specs whose input fingerprint changed."""
+    record = {'time': datetime.now().isoformat(timespec='seconds'), 'changed': [], 'ran': {},
+              'unchanged': [], 'waiting': [], 'errors': {}}
+    start = time.perf_counter()
+    checked, hashed = set(), set()
+
+    plans = []
+    for spec_path in find_specs(paths):
+        name = str(spec_path)
+        try:
+            inputs, output_dir = spec_inputs(spec_path)
+        except (OSError, ValueError) as e:
+            record['errors'][name] = f"spec: {e}"
+            continue
+        digests = []
+        for path in inputs:
+            digest, rehashed = check_file(path, state['files'], settle)
+            checked.add(str(path))
+            if rehashed:
+                hashed.add(str(path))
+            digests.append(digest)
+        if None in digests:
+            record['waiting'].append(name)
+            continue
+        fingerprint = hashlib.sha256('|'.join(digests).encode()).hexdigest()
+        # A run that failed on these exact inputs is not retried until one changes
+        last = state['runs'].get(name, {})
+        if fingerprint in (last.get('fingerprint'), last.get('failed')):
+            record['unchanged'].append(name)
+            continue
+        previous = last.get('inputs', {})
+        record['changed'] += [str(path) for path, digest in zip(inputs, digests)
+                              if previous.get(str(path)) != digest]
+        plans.append((spec_path, output_dir, fingerprint, dict(zip(map(str, inputs), digests))))
+    record['check_seconds'] = round(time.perf_counter() - start, 4)
+    record['files_checked'], record['files_hashed'] = len(checked), len(hashed)
+    record['changed'] = list(dict.fromkeys(record['changed']))
+
+    for spec_path, output_dir, fingerprint, inputs in plans:
+        name = str(spec_path)
+        result = run_spec(spec_path, output_dir, options)
+        if result['ok']:
+            state['runs'][name] = {'fingerprint': fingerprint, 'inputs': inputs, 'time': record['time']}
+            record['ran'][name] = result
+        else:
+            state['runs'].setdefault(name, {})['failed'] = fingerprint
+            record['errors'][name] = result['error']
+    record['total_seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+def print_cycle(record: dict):
+    """One summary line per cycle, plus one per rerun or error."""
+    print(f"[{record['time']}] checked {record['files_checked']} files ({record['files_hashed']} hashed) "
+          f"in {record['check_seconds']:.2f}s; {len(record['ran'])} rerun, {len(record['unchanged'])} unchanged"
+          + (f", {len(record['waiting'])} waiting for missing or settling files" if record['waiting'] else '')
+          + f"; {record['total_seconds']:.2f}s", flush=True)
+    for path in record['changed']:
+        print(f"  changed  {path}")
+    for name, result in record['ran'].items():
+        phases = ', '.join(f"{phase} {seconds:.2f}s" for phase, seconds in result['phases'].items())
+        print(f"  reran    {Path(name).name}: {result['records']:,} records in {result['seconds']:.2f}s ({phases})")
+    for name, error in record['errors'].items():
+        print(f"  error    {Path(name).name}: {error}")
+    sys.stdout.flush()
+
+def watch(paths: list, state_path: Path, interval: float, settle: float, options: list,
+          log: str = None, once: bool = False):
+    """Poll until Ctrl-C (or for one cycle with `once`)."""
+    state = read_state(state_path)
+    print(f"Watching {len(find_specs(paths))} audit specs every {interval:g}s (state: {state_path})", flush=True)
+    try:
+        while True:
+            record = cycle(paths, state, settle, options)
+            write_atomic(state_path, json.dumps(state, indent=2))
+            if log:
+                with open(log, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+            if record['ran'] or record['errors'] or once:
+                print_cycle(record)
+            if once:
+                return record
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Audit watcher stopped")
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description='Rerun audit specs whenever their input files change',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  Watch every spec in a folder (specs point their data at the shared drop folder):
+    python watch_audits.py audits/
+
+  Poll once a minute, streaming large files, with a JSON-lines cycle log:
+    python watch_audits.py audits/ --interval 60 --chunksize 500000 --log watch.jsonl
+
+  One cycle, e.g. from cron:
+    python watch_audits.py audits/ --once
+        """
+    )
+    parser.add_argument('specs', nargs='+', help='Audit spec files, or directories of .yaml/.yml/.json specs')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'Seconds between polls (default {DEFAULT_INTERVAL:g})')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help=f'Leave files modified this recently for the next poll (default {DEFAULT_SETTLE:g})')
+    parser.add_argument('--state', default=DEFAULT_STATE,
+                        help=f'File keeping input hashes and last runs (default {DEFAULT_STATE})')
+    parser.add_argument('--log', metavar='FILE', help='Append one JSON line per cycle to FILE')
+    parser.add_argument('--once', action='store_true', help='Run one cycle and exit')
+    parser.add_argument('--workers', type=int, help='Worker processes per audit (default: CPU count)')
+    parser.add_argument('--chunksize', type=int, help='Stream CSVs in chunks of this many rows')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse CSVs directly without the on-disk parse cache')
+
+    args = parser.parse_args(argv)
+    if args.interval <= 0 or args.settle < 0:
+        parser.error('--interval must be positive and --settle not negative')
+
+    options = []
+    if args.workers:
+        options += ['--workers', str(args.workers)]
+    if args.chunksize:
+        options += ['--chunksize', str(args.chunksize)]
+    if args.no_cache:
+        options.append('--no-cache')
+
+    missing = [path for path in args.specs if not os.path.exists(path)]
+    if missing:
+        print(f"Error: Not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    return watch(args.specs, Path(args.state).resolve(), args.interval, args.settle, options, args.log, args.once)
+
+if __name__ == '__main__':
+    main()